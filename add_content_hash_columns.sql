@@ -0,0 +1,5 @@
+-- Hash of each row's business fields, used by the sync to skip unchanged rows
+ALTER TABLE candidates ADD COLUMN IF NOT EXISTS content_hash TEXT;
+ALTER TABLE job_postings ADD COLUMN IF NOT EXISTS content_hash TEXT;
+ALTER TABLE applications ADD COLUMN IF NOT EXISTS content_hash TEXT;
+ALTER TABLE interviews ADD COLUMN IF NOT EXISTS content_hash TEXT;
@@ -2,13 +2,16 @@
 import os
 import logging
 import json
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from dotenv import load_dotenv
 import traceback
 
 # Load environment variables
 load_dotenv()
 
+from http_client import pool_stats
+from metrics import CONTENT_TYPE, is_authorized, render_metrics
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -72,10 +75,24 @@ def health_check():
             "/sync/applications",
             "/sync/candidates",
             "/sync/jobs",
-            "/sync/job_postings"
-        ]
+            "/sync/job_postings",
+            "/sync/all",
+            "/sync/batch",
+            "/metrics"
+        ],
+        "http_pool": pool_stats()
     })
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics, for the METRICS_TOKEN bearer or loopback callers"""
+    if not is_authorized(request.headers.get('Authorization'), request.remote_addr):
+        return jsonify({
+            "status": "error",
+            "message": "Not authorized to read metrics"
+        }), 403
+    return Response(render_metrics(), content_type=CONTENT_TYPE)
+
 # Only include these routes if the blueprint registration failed
 if 'sync_bp' not in globals():
     logger.warning("Using fallback routes since blueprint registration failed")
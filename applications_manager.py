@@ -7,11 +7,23 @@ import argparse
 from datetime import datetime
 import pandas as pd
 import requests
-from supabase import create_client, Client
+from supabase import Client
 from dotenv import load_dotenv
-from typing import Dict, List, Any, Optional, Union
+from typing import Callable, Dict, Iterator, List, Any, Optional, Tuple, Union
 import pathlib
 
+from supabase_client import get_supabase_client
+from merge_client import MERGE_EXPAND_RELATIONS, MergePage, expanded_id, iter_merge_pages, with_query_params
+from token_service import token_service
+from bulk_upsert import bulk_upsert, fetch_existing_ids
+from id_cache import id_cache
+from metrics import RESOLVER_LOOKUP_SECONDS, TRANSFORM_SECONDS
+from csv_import import import_csv_in_chunks
+from csv_transforms import (
+    fill_missing, frame_to_records, key_column, normalize_upper, optional_column, text_column, uuid5_column,
+    with_id_column
+)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -32,6 +44,12 @@ CANDIDATES_TABLE = "candidates"
 JOB_POSTINGS_TABLE = "job_postings"
 MERGE_BASE_URL = "https://api.merge.dev/api/ats/v1"
 
+# Business fields hashed to detect applications that have not changed since the last sync
+APPLICATION_HASH_FIELDS = ["organization_id", "candidate_id", "job_posting_id", "status", "applied_at"]
+
+# CSV columns that ids are derived from, read as text so every chunk formats them the same way
+CSV_KEY_DTYPES = {column: str for column in ("id", "candidate_id", "job_posting_id", "status")}
+
 # Valid application status values
 VALID_STATUSES = ["APPLIED", "INTERVIEWING", "OFFER", "HIRED", "REJECTED", "OTHER"]
 
@@ -39,11 +57,15 @@ class ApplicationsManager:
     """Manager for handling applications data in Supabase."""
     
     def __init__(self):
-        """Initialize the ApplicationsManager with Supabase client."""
+        """Initialize the ApplicationsManager with the shared Supabase client."""
         if not SUPABASE_URL or not SUPABASE_KEY:
             raise ValueError("Missing Supabase configuration. Check your environment variables.")
             
-        self.supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+        # Borrow the worker's shared client instead of building a new one per request
+        self.supabase: Client = get_supabase_client(SUPABASE_URL, SUPABASE_KEY)
+        
+        # Resolved ids; a full-tenant sync swaps in one cache shared by every stage
+        self.id_cache = id_cache
         
     def check_table_exists(self) -> bool:
         """Check if the applications table exists."""
@@ -74,7 +96,8 @@ class ApplicationsManager:
                 job_posting_id UUID REFERENCES {JOB_POSTINGS_TABLE}(id),
                 status TEXT NOT NULL,
                 applied_at TIMESTAMP WITH TIME ZONE,
-                last_updated TIMESTAMP WITH TIME ZONE
+                last_updated TIMESTAMP WITH TIME ZONE,
+                content_hash TEXT
             );
             """
             
@@ -98,47 +121,90 @@ class ApplicationsManager:
             logger.error(f"Error creating table schema: {str(e)}")
             return False
     
-    def get_merge_token(self, test_mode=False) -> str:
+    def get_merge_token(self, test_mode=False, org_id: Optional[str] = None, refresh: bool = False) -> str:
         """Get a Merge token securely using Supabase functions.
         This eliminates the need to handle tokens directly in the client code.
         
         Args:
             test_mode: If True, return a dummy token for testing
+            org_id: The organization whose token the RPC returns; it is cached per
+                    organization and only fetched again once it expires
+            refresh: If True, drop the cached token first, e.g. after Merge rejected it
         """
         if test_mode:
             # For testing only - in production, always use the Supabase function
             logger.info("TEST MODE: Using dummy token")
             return "test_merge_token"
             
-        try:
+        def exchange():
             # Call the Supabase function that generates/exchanges Merge tokens
             response = self.supabase.rpc(
                 "get_merge_token",  # Replace with your actual function name
-                {}  # Add any parameters your function needs
+                {"organization_id": org_id}  # The organization whose Merge account token is returned
             ).execute()
             
             if not response.data:
                 raise ValueError("Failed to get Merge token: No data returned")
                 
             # The structure will depend on your function's return format
-            token = response.data.get("token")
-            if not token:
+            if not response.data.get("token"):
                 raise ValueError("Failed to get Merge token: No token in response")
                 
             logger.info("Successfully obtained Merge token")
-            return token
+            return response.data
+            
+        try:
+            if refresh:
+                token_service.invalidate(f"org:{org_id}")
+            return token_service.get_cached_token(f"org:{org_id}", exchange)
         except Exception as e:
             logger.error(f"Error getting Merge token: {str(e)}")
             raise
 
-    def fetch_merge_applications(self, user_id: str, org_id: str, test_mode=False) -> List[Dict[str, Any]]:
+    def fetch_merge_applications(self, user_id: str, org_id: str, test_mode=False, user_token: Optional[str] = None,
+                                 modified_after: Optional[str] = None, expand: Optional[bool] = None) -> List[Dict[str, Any]]:
         """Fetch applications from Merge.dev API using a secure token exchange.
         
         Args:
             user_id: The UUID of the user associated with this data
             org_id: The UUID of the organization associated with this data
             test_mode: If True, use a dummy token for testing
+            user_token: Optional user JWT or Merge account token from the request,
+                        exchanged through the token service instead of the RPC
+            modified_after: Optional ISO timestamp; only records modified after it are fetched
+            expand: Embed candidates and jobs in each page (defaults to MERGE_EXPAND_RELATIONS)
+        """
+        applications = []
+        for page in self.iter_merge_applications(user_id, org_id, test_mode=test_mode, user_token=user_token,
+                                                 modified_after=modified_after, expand=expand):
+            applications.extend(page)
+        return applications
+    
+    def iter_merge_applications(self, user_id: str, org_id: str, test_mode=False, user_token: Optional[str] = None,
+                                modified_after: Optional[str] = None, cursor: Optional[str] = None,
+                                expand: Optional[bool] = None) -> Iterator[List[Dict[str, Any]]]:
+        """Yield transformed applications from Merge.dev one page at a time.
+        
+        Each list holds one Merge page, so callers can write it before the next
+        page is consumed instead of holding the whole collection in memory.
+        Pages are MergePage lists whose ``next_url`` is the cursor of the page
+        after them.
+        
+        Args:
+            user_id: The UUID of the user associated with this data
+            org_id: The UUID of the organization associated with this data
+            test_mode: If True, use a dummy token for testing
+            user_token: Optional user JWT or Merge account token from the request,
+                        exchanged through the token service instead of the RPC
+            modified_after: Optional ISO timestamp; only records modified after it are fetched
+            cursor: Optional Merge page URL to resume from, e.g. a saved checkpoint
+            expand: If True, ask Merge to embed each application's candidate and
+                    job, which are written when missing instead of looked up
+                    (defaults to MERGE_EXPAND_RELATIONS)
         """
+        if expand is None:
+            expand = MERGE_EXPAND_RELATIONS
+        
         # For test mode, return sample data without making API calls
         if test_mode:
             logger.info("TEST MODE: Using sample application data")
@@ -167,11 +233,17 @@ class ApplicationsManager:
                 transformed_applications.append(application_data)
                 
             logger.info(f"TEST MODE: Generated {len(transformed_applications)} sample applications")
-            return transformed_applications
+            yield transformed_applications
+            return
             
         # Normal mode - get a secure token from Supabase function and make API calls
         try:
-            account_token = self.get_merge_token(test_mode=test_mode)
+            def get_account_token(refresh: bool = False) -> str:
+                if user_token:
+                    return token_service.get_merge_token(user_token=user_token, refresh=refresh)
+                return self.get_merge_token(test_mode=test_mode, org_id=org_id, refresh=refresh)
+
+            account_token = get_account_token()
             
             if not MERGE_API_KEY:
                 raise ValueError("Missing Merge API Key. Check your environment variables.")
@@ -181,34 +253,50 @@ class ApplicationsManager:
                 "X-Account-Token": account_token
             }
             
-            applications = []
-            next_page_url = f"{MERGE_BASE_URL}/applications"
+            fetched = 0
             
-            while next_page_url:
-                try:
-                    response = requests.get(next_page_url, headers=headers)
-                    response.raise_for_status()
-                    data = response.json()
+            # Pages are downloaded in the background while the current one is transformed
+            url = cursor or with_query_params(f"{MERGE_BASE_URL}/applications", {
+                "modified_after": modified_after,
+                "expand": "candidate,job" if expand else None
+            })
+            for data in iter_merge_pages(url, headers, label="applications",
+                                         refresh_token=lambda: get_account_token(refresh=True)):
+                applications = []
+                page = data.get("results", [])
+                    
+                if expand:
+                    # Use the embedded candidates and jobs, writing the ones we don't have yet
+                    page, resolved = self.resolve_expanded_references(page, user_id, org_id)
+                else:
+                    # Resolve every candidate and job reference on the page in bulk
+                    resolved = self.resolve_page_references(page)
                     
-                    for application in data.get("results", []):
-                        application_data = self.transform_merge_application(application, user_id, org_id)
+                with TRANSFORM_SECONDS.labels(entity="applications", source="merge").time():
+                    for application in page:
+                        application_data = self.transform_merge_application(application, user_id, org_id, resolved=resolved)
                         if application_data:  # Only add if transformed successfully
                             applications.append(application_data)
-                    
-                    next_page_url = data.get("next")
-                except requests.RequestException as e:
-                    logger.error(f"Error fetching applications from Merge API: {str(e)}")
-                    break
-                    
-            logger.info(f"Fetched {len(applications)} applications from Merge API")
-            return applications
+                fetched += len(applications)
+                yield MergePage(applications, next_url=data.get("next"))
+            
+            logger.info(f"Fetched {fetched} applications from Merge API")
         except Exception as e:
-            logger.error(f"Error in fetch_merge_applications: {str(e)}")
+            logger.error(f"Error in iter_merge_applications: {str(e)}")
             raise
     
-    def transform_merge_application(self, merge_data: Dict[str, Any], user_id: str, org_id: str) -> Dict[str, Any]:
+    def transform_merge_application(self, merge_data: Dict[str, Any], user_id: str, org_id: str,
+                                    resolved: Optional[Dict[str, Dict[str, Optional[str]]]] = None) -> Dict[str, Any]:
         """Transform application data from Merge API to match our schema.
         
+        Args:
+            merge_data: The application as returned by Merge
+            user_id: The UUID of the user associated with this data
+            org_id: The UUID of the organization associated with this data
+            resolved: Optional output of resolve_page_references for the page this
+                      application belongs to. When omitted, references are resolved
+                      one by one.
+        
         Returns None if either candidate or job posting cannot be found.
         """
         # Generate a UUID from the Merge ID to ensure consistency
@@ -220,8 +308,12 @@ class ApplicationsManager:
         merge_job_id = merge_data.get("job", "")
         
         # Try to resolve candidate and job IDs to our database IDs
-        candidate_id = self.resolve_candidate_id(merge_candidate_id)
-        job_posting_id = self.resolve_job_posting_id(merge_job_id)
+        if resolved is not None:
+            candidate_id = resolved["candidates"].get(merge_candidate_id)
+            job_posting_id = resolved["job_postings"].get(merge_job_id)
+        else:
+            candidate_id = self.resolve_candidate_id(merge_candidate_id)
+            job_posting_id = self.resolve_job_posting_id(merge_job_id)
         
         # If we can't find both the candidate and job posting, log a warning
         if not candidate_id or not job_posting_id:
@@ -252,6 +344,112 @@ class ApplicationsManager:
             "last_updated": last_updated
         }
     
+    def resolve_page_references(self, merge_applications: List[Dict[str, Any]]) -> Dict[str, Dict[str, Optional[str]]]:
+        """Resolve the candidate and job references of a whole page of Merge applications.
+        
+        Computes the deterministic UUIDs for every referenced candidate and job and
+        checks them with one ``in_`` query per table instead of two queries per row.
+        
+        Returns:
+            Dict with "candidates" and "job_postings" maps from Merge ID to our
+            database ID, or None when the row does not exist
+        """
+        candidate_ids = {}
+        job_posting_ids = {}
+        for application in merge_applications:
+            merge_candidate_id = application.get("candidate")
+            if merge_candidate_id:
+                candidate_ids[merge_candidate_id] = str(uuid.uuid5(uuid.NAMESPACE_DNS, f"merge-{merge_candidate_id}"))
+            merge_job_id = application.get("job")
+            if merge_job_id:
+                job_posting_ids[merge_job_id] = str(uuid.uuid5(uuid.NAMESPACE_DNS, f"merge-job-{merge_job_id}"))
+        
+        resolved = {"candidates": {}, "job_postings": {}}
+        for key, table, id_map in (("candidates", CANDIDATES_TABLE, candidate_ids),
+                                   ("job_postings", JOB_POSTINGS_TABLE, job_posting_ids)):
+            if not id_map:
+                continue
+            
+            # Only ids that are not already known to exist need a lookup
+            cached, missing = self.id_cache.lookup_many(table, id_map.values())
+            existing = set(cached)
+            if missing:
+                try:
+                    with RESOLVER_LOOKUP_SECONDS.labels(entity=table).time():
+                        found = fetch_existing_ids(self.supabase, table, missing)
+                    self.id_cache.set_many(table, found)
+                    existing.update(found)
+                except Exception as e:
+                    logger.error(f"Error resolving {key} IDs: {str(e)}")
+            
+            for merge_id, db_id in id_map.items():
+                if db_id in existing:
+                    resolved[key][merge_id] = db_id
+                else:
+                    logger.warning(f"{table} row with ID {db_id} (from Merge ID {merge_id}) not found in database")
+                    resolved[key][merge_id] = None
+        
+        return resolved
+    
+    def resolve_expanded_references(self, merge_applications: List[Dict[str, Any]], user_id: str,
+                                    org_id: str) -> Tuple[List[Dict[str, Any]], Dict[str, Dict[str, Optional[str]]]]:
+        """Resolve a page of applications fetched with ``expand=candidate,job``.
+        
+        Embedded candidates and jobs that are not in the id cache are upserted
+        through their managers, so the references resolve to rows that exist
+        without a lookup per table. References Merge left as bare ids fall back
+        to resolve_page_references.
+        
+        Returns:
+            Tuple of (the applications with their references reduced to Merge ids,
+            the same maps resolve_page_references returns)
+        """
+        from candidates_manager import CandidatesManager
+        from job_postings_manager import JobPostingsManager
+        
+        embedded = {"candidates": {}, "job_postings": {}}
+        flattened = []
+        for application in merge_applications:
+            for field, key in (("candidate", "candidates"), ("job", "job_postings")):
+                related = application.get(field)
+                if isinstance(related, dict) and related.get("id"):
+                    embedded[key][related["id"]] = related
+            flattened.append({**application,
+                              "candidate": expanded_id(application.get("candidate")),
+                              "job": expanded_id(application.get("job"))})
+        
+        resolved = {"candidates": {}, "job_postings": {}}
+        for key, table, manager_class, transform_name, upsert_name in (
+                ("candidates", CANDIDATES_TABLE, CandidatesManager, "transform_merge_candidate", "upsert_candidates"),
+                ("job_postings", JOB_POSTINGS_TABLE, JobPostingsManager, "transform_merge_job_posting", "upsert_job_postings")):
+            if not embedded[key]:
+                continue
+            
+            manager = manager_class()
+            manager.id_cache = self.id_cache
+            records = {merge_id: getattr(manager, transform_name)(related, user_id, org_id)
+                       for merge_id, related in embedded[key].items()}
+            
+            _, missing = self.id_cache.lookup_many(table, (record["id"] for record in records.values()))
+            if missing:
+                missing = set(missing)
+                getattr(manager, upsert_name)([record for record in records.values() if record["id"] in missing])
+            
+            # Rows that failed to write stay unresolved, as they would after a lookup
+            for merge_id, record in records.items():
+                resolved[key][merge_id] = record["id"] if self.id_cache.get(table, record["id"]) else None
+        
+        bare = [application for application in flattened
+                if (application.get("candidate") and application["candidate"] not in embedded["candidates"])
+                or (application.get("job") and application["job"] not in embedded["job_postings"])]
+        if bare:
+            fallback = self.resolve_page_references(bare)
+            for key in resolved:
+                for merge_id, db_id in fallback[key].items():
+                    resolved[key].setdefault(merge_id, db_id)
+        
+        return flattened, resolved
+    
     def resolve_candidate_id(self, merge_candidate_id: str) -> Optional[str]:
         """Resolve a Merge candidate ID to our database candidate ID."""
         if not merge_candidate_id:
@@ -261,13 +459,19 @@ class ApplicationsManager:
             # Generate the deterministic UUID we use in our database
             candidate_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, f"merge-{merge_candidate_id}"))
             
+            # Candidates written or resolved recently are known to exist
+            if self.id_cache.get(CANDIDATES_TABLE, candidate_id):
+                return candidate_id
+            
             # Check if this candidate exists in our database
-            response = self.supabase.table(CANDIDATES_TABLE) \
-                .select("id") \
-                .eq("id", candidate_id) \
-                .execute()
+            with RESOLVER_LOOKUP_SECONDS.labels(entity=CANDIDATES_TABLE).time():
+                response = self.supabase.table(CANDIDATES_TABLE) \
+                    .select("id") \
+                    .eq("id", candidate_id) \
+                    .execute()
                 
             if response.data and len(response.data) > 0:
+                self.id_cache.set(CANDIDATES_TABLE, candidate_id)
                 return candidate_id
             else:
                 logger.warning(f"Candidate with ID {candidate_id} (from Merge ID {merge_candidate_id}) not found in database")
@@ -285,13 +489,19 @@ class ApplicationsManager:
             # Generate the deterministic UUID we use in our database
             job_posting_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, f"merge-job-{merge_job_id}"))
             
+            # Job postings written or resolved recently are known to exist
+            if self.id_cache.get(JOB_POSTINGS_TABLE, job_posting_id):
+                return job_posting_id
+            
             # Check if this job posting exists in our database
-            response = self.supabase.table(JOB_POSTINGS_TABLE) \
-                .select("id") \
-                .eq("id", job_posting_id) \
-                .execute()
+            with RESOLVER_LOOKUP_SECONDS.labels(entity=JOB_POSTINGS_TABLE).time():
+                response = self.supabase.table(JOB_POSTINGS_TABLE) \
+                    .select("id") \
+                    .eq("id", job_posting_id) \
+                    .execute()
                 
             if response.data and len(response.data) > 0:
+                self.id_cache.set(JOB_POSTINGS_TABLE, job_posting_id)
                 return job_posting_id
             else:
                 logger.warning(f"Job posting with ID {job_posting_id} (from Merge ID {merge_job_id}) not found in database")
@@ -300,113 +510,90 @@ class ApplicationsManager:
             logger.error(f"Error resolving job posting ID: {str(e)}")
             return None
     
-    def upsert_applications(self, applications: List[Dict[str, Any]]) -> Dict[str, int]:
-        """Insert or update applications in Supabase."""
+    def upsert_applications(self, applications: List[Dict[str, Any]], batch_size: Optional[int] = None) -> Dict[str, int]:
+        """Insert or update applications in Supabase using batched upserts."""
         if not applications:
             logger.info("No applications to upsert")
-            return {"inserted": 0, "updated": 0}
-            
-        inserted = 0
-        updated = 0
+            return {"inserted": 0, "updated": 0, "unchanged": 0}
         
         for application in applications:
-            try:
-                # Check if the application already exists by ID
-                existing_response = self.supabase.table(APPLICATIONS_TABLE) \
-                    .select("id") \
-                    .eq("id", application["id"]) \
-                    .execute()
-                
-                existing = existing_response.data
-                
-                if existing and len(existing) > 0:
-                    # Update existing record
-                    application["last_updated"] = datetime.now().isoformat()
-                    
-                    # Log the update
-                    logger.info(f"Updating application {application['id']} (Status: {application['status']})")
-                    
-                    self.supabase.table(APPLICATIONS_TABLE) \
-                        .update(application) \
-                        .eq("id", application["id"]) \
-                        .execute()
-                    updated += 1
-                else:
-                    # Insert new record
-                    if not application.get("applied_at"):
-                        application["applied_at"] = datetime.now().isoformat()
-                    if not application.get("last_updated"):
-                        application["last_updated"] = datetime.now().isoformat()
-                    
-                    # Generate ID if not provided
-                    if not application.get("id"):
-                        application["id"] = str(uuid.uuid4())
-                    
-                    # Log the insert
-                    logger.info(f"Inserting new application {application['id']} (Status: {application['status']})")
-                    
-                    self.supabase.table(APPLICATIONS_TABLE) \
-                        .insert(application) \
-                        .execute()
-                    inserted += 1
-            except Exception as e:
-                logger.error(f"Error upserting application {application.get('id')}: {str(e)}")
-        
-        logger.info(f"Upsert complete. Inserted: {inserted}, Updated: {updated}")
-        return {"inserted": inserted, "updated": updated}
+            # Generate ID if not provided
+            if not application.get("id"):
+                application["id"] = str(uuid.uuid4())
+        
+        def prepare(application: Dict[str, Any], exists: bool) -> None:
+            now = datetime.now().isoformat()
+            if exists:
+                application["last_updated"] = now
+            else:
+                if not application.get("applied_at"):
+                    application["applied_at"] = now
+                if not application.get("last_updated"):
+                    application["last_updated"] = now
+        
+        results = bulk_upsert(
+            self.supabase,
+            APPLICATIONS_TABLE,
+            applications,
+            batch_size=batch_size,
+            prepare=prepare,
+            # Interviews resolve their candidate and job through the application
+            cache_fields=["candidate_id", "job_posting_id"],
+            cache=self.id_cache,
+            hash_fields=APPLICATION_HASH_FIELDS
+        )
+        
+        logger.info(f"Upsert complete. Inserted: {results['inserted']}, Updated: {results['updated']}, "
+                    f"Unchanged: {results['unchanged']}")
+        return results
+    
+    def transform_csv_frame(self, df: pd.DataFrame, user_id: str, org_id: str) -> List[Dict[str, Any]]:
+        """Transform a frame of CSV rows into application records, column by column."""
+        now = datetime.now().isoformat()
+        
+        # Validate status values
+        statuses = normalize_upper(text_column(df, "status"), VALID_STATUSES)
+        
+        # Create a deterministic UUID based on candidate and job
+        unique_ids = key_column(df, "candidate_id") + "-" + key_column(df, "job_posting_id") + "-" + statuses
+        application_ids = with_id_column(df, uuid5_column("csv-app-", unique_ids))
+        
+        # Transform to match our schema
+        frame = pd.DataFrame({
+            "id": application_ids,
+            "organization_id": org_id,
+            "user_id": user_id,
+            "created_by": user_id,  # User who initiated the import
+            "candidate_id": optional_column(df, "candidate_id"),
+            "job_posting_id": optional_column(df, "job_posting_id"),
+            "status": statuses,
+            "applied_at": fill_missing(df, "applied_at", now),
+            "last_updated": fill_missing(df, "last_updated", now)
+        }, index=df.index)
+        return frame_to_records(frame)
     
-    def import_from_csv(self, csv_path: str, user_id: str, org_id: str) -> Dict[str, int]:
-        """Import applications from a CSV file."""
+    def import_from_csv(self, csv_path: str, user_id: str, org_id: str, chunk_size: Optional[int] = None,
+                        progress: Optional[Callable[..., None]] = None) -> Dict[str, int]:
+        """Import applications from a CSV file, one chunk of rows at a time.
+        
+        Args:
+            csv_path: Path or file-like object to read the CSV from
+            user_id: The UUID of the user associated with this data
+            org_id: The UUID of the organization associated with this data
+            chunk_size: Rows transformed and upserted at a time (defaults to CSV_CHUNK_SIZE)
+            progress: Optional callback receiving progress counters per chunk
+        """
         try:
-            df = pd.read_csv(csv_path)
-            logger.info(f"Loaded CSV with {len(df)} rows")
-            
-            # Validate required columns
-            required_cols = ["status"]
-            missing_cols = [col for col in required_cols if col not in df.columns]
-            if missing_cols:
-                raise ValueError(f"Missing required columns in CSV: {', '.join(missing_cols)}")
-            
-            # Transform data to match our schema
-            applications = []
-            for _, row in df.iterrows():
-                row_dict = row.to_dict()
-                
-                # Validate status value
-                status = row_dict.get("status", "").upper()
-                if status not in VALID_STATUSES:
-                    logger.warning(f"Invalid status value '{status}' - defaulting to 'OTHER'")
-                    status = "OTHER"
-                
-                # Parse dates
-                applied_at = row_dict.get("applied_at", datetime.now().isoformat())
-                last_updated = row_dict.get("last_updated", datetime.now().isoformat())
-                
-                # Check for candidate and job posting IDs
-                candidate_id = row_dict.get("candidate_id")
-                job_posting_id = row_dict.get("job_posting_id")
-                
-                # Create a deterministic UUID based on candidate and job
-                unique_id = f"{candidate_id}-{job_posting_id}-{status}"
-                application_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, f"csv-app-{unique_id}")) if unique_id else str(uuid.uuid4())
-                
-                # Transform to match our schema
-                application = {
-                    "id": row_dict.get("id", application_id),
-                    "organization_id": org_id,
-                    "user_id": user_id,
-                    "created_by": user_id,  # User who initiated the import
-                    "candidate_id": candidate_id,
-                    "job_posting_id": job_posting_id,
-                    "status": status,
-                    "applied_at": applied_at,
-                    "last_updated": last_updated
-                }
-                
-                applications.append(application)
-            
-            # Upsert applications
-            return self.upsert_applications(applications)
+            return import_csv_in_chunks(
+                csv_path,
+                lambda df: self.transform_csv_frame(df, user_id, org_id),
+                self.upsert_applications,
+                entity="applications",
+                required_cols=["status"],
+                chunk_size=chunk_size,
+                progress=progress,
+                dtype=CSV_KEY_DTYPES
+            )
         except Exception as e:
             logger.error(f"Error importing from CSV: {str(e)}")
             raise
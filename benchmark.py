@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Offline end-to-end benchmark of the sync and import paths.
+
+Starts a FakeMergeAPI and a FakePostgREST (see fake_services.py), points the
+managers at them and times every fetch_merge_*, upsert_* and import_from_csv
+path at each requested size. Fetches are timed twice: once with empty id and
+token caches, so every resolver lookup hits PostgREST, and once more with
+the caches that run filled. Upserts are timed twice: once into empty tables
+and once more with the same rows, which exercises the unchanged-row skip.
+Results are written as JSON so runs can be compared for regressions.
+
+Usage:
+    python benchmark.py
+    python benchmark.py --sizes 1000,10000 --merge-latency 0.05 --output report.json
+"""
+
+import os
+
+# Time our own code rather than the production Merge request budget
+os.environ.setdefault("MERGE_RATE_LIMIT_PER_SECOND", "0")
+
+import sys
+import json
+import time
+import uuid
+import logging
+import argparse
+import platform
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+import merge_client
+import merge_sync
+import candidates_manager
+import job_postings_manager
+import applications_manager
+import interviews_manager
+from id_cache import id_cache
+from token_service import token_service
+from supabase_client import reset_supabase_clients
+from fake_services import FakeMergeAPI, FakePostgREST
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+DEFAULT_OUTPUT = "benchmark_report.json"
+
+BENCHMARK_USER_ID = "00000000-0000-4000-8000-000000000001"
+BENCHMARK_ORG_ID = "00000000-0000-4000-8000-000000000002"
+
+# Not a JWT, so the token service uses it as the Merge account token directly
+BENCHMARK_ACCOUNT_TOKEN = "benchmark-merge-account-token"
+
+# Entity -> (manager module, manager class, Merge collection, fetch method, upsert method),
+# in dependency order so references resolve
+ENTITIES = [
+    ("candidates", candidates_manager, "CandidatesManager", "candidates",
+     "fetch_merge_candidates", "upsert_candidates"),
+    ("job_postings", job_postings_manager, "JobPostingsManager", "job-postings",
+     "fetch_merge_job_postings", "upsert_job_postings"),
+    ("applications", applications_manager, "ApplicationsManager", "applications",
+     "fetch_merge_applications", "upsert_applications"),
+    ("interviews", interviews_manager, "InterviewsManager", "interviews",
+     "fetch_merge_interviews", "upsert_interviews"),
+]
+
+
+def merge_counts(size: int) -> Dict[str, int]:
+    """Records per Merge collection for a benchmark size; jobs are far fewer than candidates."""
+    return {
+        "candidates": size,
+        "job-postings": max(1, size // 10),
+        "applications": size,
+        "interviews": size,
+    }
+
+
+@contextmanager
+def managers_pointed_at(supabase_url: str, merge_base_url: str) -> Iterator[None]:
+    """Send every manager's Supabase and Merge traffic to the given URLs for the ``with`` block."""
+    targets = [(module, "SUPABASE_URL", supabase_url) for _, module, _, _, _, _ in ENTITIES]
+    targets += [(module, "MERGE_BASE_URL", merge_base_url)
+                for module in [entry[1] for entry in ENTITIES] + [merge_client, merge_sync]]
+    targets += [(token_service, "supabase_url", supabase_url),
+                (token_service, "supabase_key", token_service.supabase_key or candidates_manager.SUPABASE_KEY)]
+    saved = [(target, name, getattr(target, name)) for target, name, _ in targets]
+
+    for target, name, value in targets:
+        setattr(target, name, value)
+    token_service.invalidate()
+    reset_supabase_clients()
+    id_cache.clear()
+    try:
+        yield
+    finally:
+        for target, name, value in saved:
+            setattr(target, name, value)
+        token_service.invalidate()
+        reset_supabase_clients()
+        id_cache.clear()
+
+
+def _merge_uuid(prefix: str, merge_ids: pd.Series) -> pd.Series:
+    return merge_ids.map(lambda merge_id: str(uuid.uuid5(uuid.NAMESPACE_DNS, f"{prefix}{merge_id}")))
+
+
+def csv_frame(entity: str, size: int) -> pd.DataFrame:
+    """Build ``size`` CSV rows for an entity, referencing the records synced from the fake Merge API."""
+    index = pd.Series(range(size))
+    counts = merge_counts(size)
+    if entity == "candidates":
+        return pd.DataFrame({
+            "first_name": "Imported",
+            "last_name": index.astype(str),
+            "email": "imported" + index.astype(str) + "@example.com",
+            "current_title": "Engineer",
+            "skills": "Python, SQL",
+            "years_experience": index % 20,
+        })
+    if entity == "job_postings":
+        return pd.DataFrame({
+            "name": "Imported Job " + index.astype(str),
+            "code": "CSV-" + index.astype(str),
+            "location": "Remote",
+            "remote": "TRUE",
+            "status": "OPEN",
+        })
+    if entity == "applications":
+        return pd.DataFrame({
+            "candidate_id": _merge_uuid("merge-", "cand-" + (index % counts["candidates"]).astype(str)),
+            "job_posting_id": _merge_uuid("merge-job-", "job-" + (index % counts["job-postings"]).astype(str)),
+            "status": "APPLIED",
+            "applied_at": "2024-01-01T09:00:00Z",
+        })
+    if entity == "interviews":
+        return pd.DataFrame({
+            "application_id": _merge_uuid("merge-app-", "app-" + (index % counts["applications"]).astype(str)),
+            "interviewer": "Benchmark Interviewer",
+            "interview_date": "2024-02-" + (index % 28 + 1).astype(str).str.zfill(2) + "T10:00:00Z",
+            "interview_type": "IMPORT-" + index.astype(str),
+            "result": "PASSED",
+            "feedback": "Imported interview",
+        })
+    raise ValueError(f"Unknown entity: {entity}")
+
+
+def _timed(fn: Callable[[], Any]) -> Tuple[Any, float]:
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def run_size(size: int, merge_latency: float = 0.0, postgrest_latency: float = 0.0,
+             page_size: int = 100, work_dir: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Time every path of every entity against fresh fake services.
+
+    Args:
+        size: Records per entity (job postings use a tenth of it)
+        merge_latency: Seconds added to every fake Merge response
+        postgrest_latency: Seconds added to every fake PostgREST response
+        page_size: Records per Merge page
+        work_dir: Directory for the generated CSV files
+
+    Returns:
+        One result dict per (entity, path)
+    """
+    results = []
+    with FakeMergeAPI(merge_counts(size), page_size=page_size, latency=merge_latency) as merge_api, \
+            FakePostgREST(latency=postgrest_latency) as postgrest, \
+            tempfile.TemporaryDirectory(dir=work_dir) as csv_dir, \
+            managers_pointed_at(postgrest.url, merge_api.base_url):
+
+        def measure(entity: str, path: str, fn: Callable[[], Any], rows: Callable[[Any], int]) -> Any:
+            merge_before, postgrest_before = merge_api.requests, postgrest.requests
+            outcome, seconds = _timed(fn)
+            count = rows(outcome)
+            result = {
+                "size": size,
+                "entity": entity,
+                "path": path,
+                "rows": count,
+                "seconds": round(seconds, 4),
+                "rows_per_second": round(count / seconds, 1) if seconds else None,
+                "merge_requests": merge_api.requests - merge_before,
+                "postgrest_requests": postgrest.requests - postgrest_before,
+            }
+            if isinstance(outcome, dict):
+                result["counts"] = outcome
+            logger.info(f"{size:>7} {entity:<13} {path:<34} {count:>7} rows in {seconds:8.3f}s")
+            results.append(result)
+            return outcome
+
+        for entity, module, class_name, _, fetch_name, upsert_name in ENTITIES:
+            manager = getattr(module, class_name)()
+            fetch = getattr(manager, fetch_name)
+            upsert = getattr(manager, upsert_name)
+
+            fetch_all = lambda: fetch(BENCHMARK_USER_ID, BENCHMARK_ORG_ID, user_token=BENCHMARK_ACCOUNT_TOKEN)
+            # Earlier upserts filled the caches; a cold fetch pays for every resolver lookup and token
+            id_cache.clear()
+            token_service.invalidate()
+            records = measure(entity, f"{fetch_name} (cold)", fetch_all, len)
+            measure(entity, f"{fetch_name} (warm)", fetch_all, len)
+            written = lambda counts: sum(counts.values())
+            measure(entity, f"{upsert_name} (insert)", lambda: upsert(records), written)
+            measure(entity, f"{upsert_name} (unchanged)", lambda: upsert(records), written)
+
+            csv_path = os.path.join(csv_dir, f"{entity}.csv")
+            csv_frame(entity, size).to_csv(csv_path, index=False)
+            measure(entity, "import_from_csv", lambda: manager.import_from_csv(
+                csv_path, BENCHMARK_USER_ID, BENCHMARK_ORG_ID), written)
+
+            if entity == "job_postings":
+                # Interviews resolve their job through the jobs table, which mirrors job postings
+                postgrest.tables["jobs"] = {row["id"]: {"id": row["id"]} for row in postgrest.rows("job_postings")}
+
+    return results
+
+
+def run_benchmark(sizes: List[int], merge_latency: float = 0.0, postgrest_latency: float = 0.0,
+                  page_size: int = 100) -> Dict[str, Any]:
+    """Run every size and return the report."""
+    results = []
+    for size in sizes:
+        results.extend(run_size(size, merge_latency, postgrest_latency, page_size))
+    return {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {
+            "sizes": sizes,
+            "merge_latency": merge_latency,
+            "postgrest_latency": postgrest_latency,
+            "page_size": page_size,
+            "merge_rate_limit_per_second": merge_client.MERGE_RATE_LIMIT_PER_SECOND,
+            "merge_prefetch_depth": merge_client.MERGE_PREFETCH_DEPTH,
+        },
+        "results": results,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the sync and import paths against local fakes")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in DEFAULT_SIZES),
+                        help="Comma-separated records per entity (default: %(default)s)")
+    parser.add_argument("--merge-latency", type=float, default=0.0, help="Seconds added to every Merge response")
+    parser.add_argument("--postgrest-latency", type=float, default=0.0, help="Seconds added to every PostgREST response")
+    parser.add_argument("--page-size", type=int, default=100, help="Records per Merge page")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Path of the JSON report (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    # The per-batch and per-row logs of the managers would dominate the output
+    for name in ("candidates_manager", "job_postings_manager", "applications_manager", "interviews_manager",
+                 "bulk_upsert", "csv_import", "merge_client", "httpx"):
+        logging.getLogger(name).setLevel(logging.ERROR)
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    report = run_benchmark(sizes, args.merge_latency, args.postgrest_latency, args.page_size)
+
+    with open(args.output, "w") as report_file:
+        json.dump(report, report_file, indent=2)
+    logger.info(f"Wrote benchmark report to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
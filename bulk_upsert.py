@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Bulk upsert helpers for Supabase tables.
+
+This module replaces the per-row select-then-insert/update pattern used by
+the managers with batched ``upsert(..., on_conflict="id")`` calls. Existing
+ids are pre-fetched with a single ``in_`` query per batch so the managers can
+still report accurate inserted/updated counts.
+
+When the caller names the business fields of a table, each record also
+carries a ``content_hash`` of those fields. The stored hashes are fetched
+with the existing ids, and rows whose hash has not changed are skipped
+instead of being rewritten on every sync.
+"""
+
+import os
+import json
+import hashlib
+import logging
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+from id_cache import IdCache, id_cache
+from metrics import UPSERT_BATCH_SECONDS, record_rows
+
+logger = logging.getLogger(__name__)
+
+# Number of records sent to PostgREST in a single upsert call
+DEFAULT_BATCH_SIZE = int(os.environ.get("UPSERT_BATCH_SIZE", "500"))
+
+# in_ filters travel in the query string, so lookups are split into smaller chunks
+LOOKUP_CHUNK_SIZE = int(os.environ.get("LOOKUP_CHUNK_SIZE", "200"))
+
+# Column holding the hash of a row's business fields
+HASH_COLUMN = "content_hash"
+
+# Tables found without a content_hash column; they are written without change detection
+_tables_without_hash: Set[str] = set()
+
+
+def chunked(items: List[Any], size: int) -> Iterator[List[Any]]:
+    """Yield successive slices of ``items`` with at most ``size`` elements."""
+    size = max(1, size)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def fetch_existing_ids(supabase, table: str, ids: Iterable[str], column: str = "id") -> Set[str]:
+    """Return the subset of ``ids`` already present in ``table``.
+
+    Args:
+        supabase: The Supabase client
+        table: The table to query
+        ids: Candidate values for ``column``
+        column: The column to match against (defaults to the primary key)
+    """
+    unique_ids = [value for value in dict.fromkeys(ids) if value]
+    existing = set()
+
+    for chunk in chunked(unique_ids, LOOKUP_CHUNK_SIZE):
+        response = supabase.table(table) \
+            .select(column) \
+            .in_(column, chunk) \
+            .execute()
+
+        for row in response.data or []:
+            if row.get(column):
+                existing.add(str(row[column]))
+
+    return existing
+
+
+def fetch_rows_by_id(supabase, table: str, ids: Iterable[str], columns: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Return the given columns of every row of ``table`` whose id is in ``ids``.
+
+    Args:
+        supabase: The Supabase client
+        table: The table to query
+        ids: Primary keys to look up
+        columns: Columns to return besides ``id``
+
+    Returns:
+        Dict from id to row, for the ids that exist
+    """
+    unique_ids = [value for value in dict.fromkeys(ids) if value]
+    rows = {}
+
+    for chunk in chunked(unique_ids, LOOKUP_CHUNK_SIZE):
+        response = supabase.table(table) \
+            .select(",".join(["id"] + columns)) \
+            .in_("id", chunk) \
+            .execute()
+
+        for row in response.data or []:
+            if row.get("id"):
+                rows[str(row["id"])] = row
+
+    return rows
+
+
+def content_hash(record: Dict[str, Any], fields: List[str]) -> str:
+    """Return a stable hash of the given fields of a record."""
+    payload = json.dumps({field: record.get(field) for field in fields}, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def fetch_existing_hashes(supabase, table: str, ids: Iterable[str]) -> Dict[str, Optional[str]]:
+    """Return the stored content hash of each id already present in ``table``."""
+    unique_ids = [value for value in dict.fromkeys(ids) if value]
+    hashes = {}
+
+    for chunk in chunked(unique_ids, LOOKUP_CHUNK_SIZE):
+        response = supabase.table(table) \
+            .select(f"id,{HASH_COLUMN}") \
+            .in_("id", chunk) \
+            .execute()
+
+        for row in response.data or []:
+            if row.get("id"):
+                hashes[str(row["id"])] = row.get(HASH_COLUMN)
+
+    return hashes
+
+
+def _match_existing_by_column(supabase, table: str, records: List[Dict[str, Any]], column: str) -> Set[str]:
+    """Adopt the id of existing rows that share ``column`` with a new record.
+
+    Returns the set of existing ids adopted by the records.
+    """
+    values = [record.get(column) for record in records if record.get(column)]
+    if not values:
+        return set()
+
+    matches = {}
+    for chunk in chunked(list(dict.fromkeys(values)), LOOKUP_CHUNK_SIZE):
+        response = supabase.table(table) \
+            .select(f"id,{column}") \
+            .in_(column, chunk) \
+            .execute()
+
+        for row in response.data or []:
+            # Keep the first match, as the per-row lookup used to do
+            matches.setdefault(row.get(column), row.get("id"))
+
+    adopted = set()
+    for record in records:
+        existing_id = matches.get(record.get(column))
+        if existing_id:
+            record["id"] = existing_id
+            adopted.add(existing_id)
+    return adopted
+
+
+def _upsert_rows(supabase, table: str, rows: List[Dict[str, Any]], on_conflict: str) -> None:
+    """Send rows to PostgREST, one call per distinct set of columns.
+
+    PostgREST rejects bulk payloads whose objects do not share the same keys,
+    and padding missing keys with null would overwrite existing values.
+    """
+    groups: Dict[frozenset, List[Dict[str, Any]]] = {}
+    for row in rows:
+        groups.setdefault(frozenset(row.keys()), []).append(row)
+
+    for group in groups.values():
+        supabase.table(table) \
+            .upsert(group, on_conflict=on_conflict) \
+            .execute()
+
+
+def _remember(cache: IdCache, table: str, rows: List[Dict[str, Any]], cache_fields: Optional[List[str]]) -> None:
+    """Record freshly written rows in the id cache."""
+    for row in rows:
+        if cache_fields:
+            cache.set(table, row["id"], {field: row.get(field) for field in cache_fields})
+        else:
+            cache.set(table, row["id"])
+
+
+def bulk_upsert(
+    supabase,
+    table: str,
+    records: List[Dict[str, Any]],
+    batch_size: Optional[int] = None,
+    on_conflict: str = "id",
+    prepare: Optional[Callable[[Dict[str, Any], bool], None]] = None,
+    match_column: Optional[str] = None,
+    cache_fields: Optional[List[str]] = None,
+    cache: Optional[IdCache] = None,
+    hash_fields: Optional[List[str]] = None,
+) -> Dict[str, int]:
+    """Insert or update records in batches using a single upsert per batch.
+
+    Args:
+        supabase: The Supabase client
+        table: The target table
+        records: Transformed records, each with an ``id``
+        batch_size: Records per upsert call (defaults to UPSERT_BATCH_SIZE)
+        on_conflict: The conflict target passed to PostgREST
+        prepare: Optional callback ``prepare(record, exists)`` used to apply
+            insert- or update-specific defaults before the record is sent
+        match_column: Optional natural key used to find existing rows for
+            records whose id is not yet in the table
+        cache_fields: Optional columns stored alongside each written id in
+            the shared id cache, for resolvers that need more than existence
+        cache: The id cache written rows are recorded in (defaults to the
+            worker-wide id_cache)
+        hash_fields: Optional business fields hashed into ``content_hash``;
+            existing rows whose hash is unchanged are not written again
+
+    Returns:
+        Dict with ``inserted``, ``updated``, ``unchanged`` and ``failed`` counts
+    """
+    batch_size = batch_size or DEFAULT_BATCH_SIZE
+    cache = cache or id_cache
+    inserted = 0
+    updated = 0
+    unchanged = 0
+    failed = 0
+
+    for batch in chunked(records, batch_size):
+        # Collapse duplicate ids within the batch, keeping the last occurrence.
+        # Postgres refuses to update the same row twice in one statement.
+        unique = {}
+        for record in batch:
+            unique[record["id"]] = record
+        batch = list(unique.values())
+
+        hashing = bool(hash_fields) and table not in _tables_without_hash
+        stored_hashes: Dict[str, Optional[str]] = {}
+        if hashing:
+            for record in batch:
+                record[HASH_COLUMN] = content_hash(record, hash_fields)
+
+        try:
+            if hashing:
+                try:
+                    stored_hashes = fetch_existing_hashes(supabase, table, unique.keys())
+                except Exception as e:
+                    # Most likely the column has not been added yet; fall back to plain ids
+                    logger.warning(f"Change detection disabled for {table}, run add_content_hash_columns.sql: {str(e)}")
+                    _tables_without_hash.add(table)
+                    hashing = False
+                    for record in batch:
+                        record.pop(HASH_COLUMN, None)
+            existing = set(stored_hashes) if hashing else fetch_existing_ids(supabase, table, unique.keys())
+
+            if match_column:
+                missing = [record for record in batch if record["id"] not in existing]
+                adopted = _match_existing_by_column(supabase, table, missing, match_column)
+                existing.update(adopted)
+                if hashing and adopted:
+                    # Compare the adopted rows against their own stored hashes, not the new ids'
+                    stored_hashes.update(fetch_existing_hashes(supabase, table, adopted))
+        except Exception as e:
+            logger.error(f"Error fetching existing ids from {table}: {str(e)}")
+            failed += len(batch)
+            continue
+
+        if match_column:
+            # Records that adopted the same existing id collapse like duplicates above
+            unique = {}
+            for record in batch:
+                unique[record["id"]] = record
+            batch = list(unique.values())
+
+        if hashing:
+            # Rows whose business fields are unchanged are left alone
+            same = [record for record in batch
+                    if record["id"] in stored_hashes and stored_hashes[record["id"]] == record[HASH_COLUMN]]
+            if same:
+                _remember(cache, table, same, cache_fields)
+                unchanged += len(same)
+                same_ids = {record["id"] for record in same}
+                batch = [record for record in batch if record["id"] not in same_ids]
+                if not batch:
+                    logger.info(f"Skipped batch of {len(same)} unchanged rows in {table}")
+                    continue
+
+        for record in batch:
+            if prepare:
+                prepare(record, record["id"] in existing)
+
+        batch_inserted = sum(1 for record in batch if record["id"] not in existing)
+        batch_updated = len(batch) - batch_inserted
+
+        try:
+            with UPSERT_BATCH_SECONDS.labels(entity=table).time():
+                _upsert_rows(supabase, table, batch, on_conflict)
+            _remember(cache, table, batch, cache_fields)
+            inserted += batch_inserted
+            updated += batch_updated
+            logger.info(f"Upserted batch of {len(batch)} rows into {table} "
+                        f"(Inserted: {batch_inserted}, Updated: {batch_updated}, Unchanged: {len(unique) - len(batch)})")
+        except Exception as e:
+            # Retry row by row so a single bad record does not drop the whole batch
+            logger.warning(f"Batch upsert into {table} failed, retrying row by row: {str(e)}")
+            for record in batch:
+                try:
+                    _upsert_rows(supabase, table, [record], on_conflict)
+                    _remember(cache, table, [record], cache_fields)
+                    if record["id"] in existing:
+                        updated += 1
+                    else:
+                        inserted += 1
+                except Exception as row_error:
+                    logger.error(f"Error upserting {table} row {record.get('id')}: {str(row_error)}")
+                    failed += 1
+
+    results = {"inserted": inserted, "updated": updated, "unchanged": unchanged, "failed": failed}
+    record_rows(table, results)
+    return results
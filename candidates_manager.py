@@ -7,11 +7,21 @@ import argparse
 from datetime import datetime
 import pandas as pd
 import requests
-from supabase import create_client, Client
+from supabase import Client
 from dotenv import load_dotenv
-from typing import Dict, List, Any, Optional, Union
+from typing import Callable, Dict, Iterator, List, Any, Optional, Union
 import pathlib
 
+from supabase_client import get_supabase_client
+from http_client import get_session
+from merge_client import MergePage, iter_merge_pages, with_query_params
+from token_service import token_service
+from bulk_upsert import bulk_upsert
+from id_cache import id_cache
+from metrics import TRANSFORM_SECONDS
+from csv_import import import_csv_in_chunks
+from csv_transforms import frame_to_records, list_column, numeric_column, text_column, uuid5_column, with_id_column
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -30,15 +40,25 @@ logger.info(f"SUPABASE_KEY: {SUPABASE_KEY[:10]}...")  # Print only first 10 char
 CANDIDATES_TABLE = "candidates"
 MERGE_BASE_URL = "https://api.merge.dev/api/ats/v1"
 
+# Business fields hashed to detect candidates that have not changed since the last sync
+CANDIDATE_HASH_FIELDS = ["organization_id", "name", "role", "skills", "experience", "previous_role", "status", "image_url"]
+
+# CSV columns that ids are derived from, read as text so every chunk formats them the same way
+CSV_KEY_DTYPES = {column: str for column in ("id", "email", "first_name", "last_name")}
+
 class CandidatesManager:
     """Manager for handling candidates data in Supabase."""
     
     def __init__(self):
-        """Initialize the CandidatesManager with Supabase client."""
+        """Initialize the CandidatesManager with the shared Supabase client."""
         if not SUPABASE_URL or not SUPABASE_KEY:
             raise ValueError("Missing Supabase configuration. Check your environment variables.")
             
-        self.supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+        # Borrow the worker's shared client instead of building a new one per request
+        self.supabase: Client = get_supabase_client(SUPABASE_URL, SUPABASE_KEY)
+        
+        # Resolved ids; a full-tenant sync swaps in one cache shared by every stage
+        self.id_cache = id_cache
         
     def check_table_exists(self) -> bool:
         """Check if the candidates table exists."""
@@ -51,46 +71,81 @@ class CandidatesManager:
             logger.error(f"Error checking table: {str(e)}")
             return False
     
-    def get_merge_token(self, test_mode=False) -> str:
+    def get_merge_token(self, test_mode=False, org_id: Optional[str] = None, refresh: bool = False) -> str:
         """Get a Merge token securely using Supabase functions.
         This eliminates the need to handle tokens directly in the client code.
         
         Args:
             test_mode: If True, return a dummy token for testing
+            org_id: The organization whose token the RPC returns; it is cached per
+                    organization and only fetched again once it expires
+            refresh: If True, drop the cached token first, e.g. after Merge rejected it
         """
         if test_mode:
             # For testing only - in production, always use the Supabase function
             logger.info("TEST MODE: Using dummy token")
             return "test_merge_token"
             
-        try:
+        def exchange():
             # Call the Supabase function that generates/exchanges Merge tokens
             response = self.supabase.rpc(
                 "get_merge_token",  # Replace with your actual function name
-                {}  # Add any parameters your function needs
+                {"organization_id": org_id}  # The organization whose Merge account token is returned
             ).execute()
             
             if not response.data:
                 raise ValueError("Failed to get Merge token: No data returned")
                 
             # The structure will depend on your function's return format
-            token = response.data.get("token")
-            if not token:
+            if not response.data.get("token"):
                 raise ValueError("Failed to get Merge token: No token in response")
                 
             logger.info("Successfully obtained Merge token")
-            return token
+            return response.data
+            
+        try:
+            if refresh:
+                token_service.invalidate(f"org:{org_id}")
+            return token_service.get_cached_token(f"org:{org_id}", exchange)
         except Exception as e:
             logger.error(f"Error getting Merge token: {str(e)}")
             raise
 
-    def fetch_merge_candidates(self, user_id: str, org_id: str, test_mode=False) -> List[Dict[str, Any]]:
+    def fetch_merge_candidates(self, user_id: str, org_id: str, test_mode=False, user_token: Optional[str] = None,
+                               modified_after: Optional[str] = None) -> List[Dict[str, Any]]:
         """Fetch candidates from Merge.dev API using a secure token exchange.
         
         Args:
             user_id: The UUID of the user associated with this data
             org_id: The UUID of the organization associated with this data
             test_mode: If True, use a dummy token for testing
+            user_token: Optional user JWT or Merge account token from the request,
+                        exchanged through the token service instead of the RPC
+            modified_after: Optional ISO timestamp; only records modified after it are fetched
+        """
+        candidates = []
+        for page in self.iter_merge_candidates(user_id, org_id, test_mode=test_mode, user_token=user_token,
+                                               modified_after=modified_after):
+            candidates.extend(page)
+        return candidates
+    
+    def iter_merge_candidates(self, user_id: str, org_id: str, test_mode=False, user_token: Optional[str] = None,
+                              modified_after: Optional[str] = None, cursor: Optional[str] = None) -> Iterator[List[Dict[str, Any]]]:
+        """Yield transformed candidates from Merge.dev one page at a time.
+        
+        Each list holds one Merge page, so callers can write it before the next
+        page is consumed instead of holding the whole collection in memory.
+        Pages are MergePage lists whose ``next_url`` is the cursor of the page
+        after them.
+        
+        Args:
+            user_id: The UUID of the user associated with this data
+            org_id: The UUID of the organization associated with this data
+            test_mode: If True, use a dummy token for testing
+            user_token: Optional user JWT or Merge account token from the request,
+                        exchanged through the token service instead of the RPC
+            modified_after: Optional ISO timestamp; only records modified after it are fetched
+            cursor: Optional Merge page URL to resume from, e.g. a saved checkpoint
         """
         # For test mode, return sample data without making API calls
         if test_mode:
@@ -130,11 +185,17 @@ class CandidatesManager:
                 transformed_candidates.append(candidate_data)
                 
             logger.info(f"TEST MODE: Generated {len(transformed_candidates)} sample candidates")
-            return transformed_candidates
+            yield transformed_candidates
+            return
             
         # Normal mode - get a secure token from Supabase function and make API calls
         try:
-            account_token = self.get_merge_token(test_mode=test_mode)
+            def get_account_token(refresh: bool = False) -> str:
+                if user_token:
+                    return token_service.get_merge_token(user_token=user_token, refresh=refresh)
+                return self.get_merge_token(test_mode=test_mode, org_id=org_id, refresh=refresh)
+
+            account_token = get_account_token()
             
             if not MERGE_API_KEY:
                 raise ValueError("Missing Merge API Key. Check your environment variables.")
@@ -144,28 +205,23 @@ class CandidatesManager:
                 "X-Account-Token": account_token
             }
             
-            candidates = []
-            next_page_url = f"{MERGE_BASE_URL}/candidates"
+            fetched = 0
             
-            while next_page_url:
-                try:
-                    response = requests.get(next_page_url, headers=headers)
-                    response.raise_for_status()
-                    data = response.json()
-                    
+            # Pages are downloaded in the background while the current one is transformed
+            url = cursor or with_query_params(f"{MERGE_BASE_URL}/candidates", {"modified_after": modified_after})
+            for data in iter_merge_pages(url, headers, label="candidates",
+                                         refresh_token=lambda: get_account_token(refresh=True)):
+                candidates = []
+                with TRANSFORM_SECONDS.labels(entity="candidates", source="merge").time():
                     for candidate in data.get("results", []):
                         candidate_data = self.transform_merge_candidate(candidate, user_id, org_id)
                         candidates.append(candidate_data)
-                    
-                    next_page_url = data.get("next")
-                except requests.RequestException as e:
-                    logger.error(f"Error fetching candidates from Merge API: {str(e)}")
-                    break
-                    
-            logger.info(f"Fetched {len(candidates)} candidates from Merge API")
-            return candidates
+                fetched += len(candidates)
+                yield MergePage(candidates, next_url=data.get("next"))
+            
+            logger.info(f"Fetched {fetched} candidates from Merge API")
         except Exception as e:
-            logger.error(f"Error in fetch_merge_candidates: {str(e)}")
+            logger.error(f"Error in iter_merge_candidates: {str(e)}")
             raise
     
     def transform_merge_candidate(self, merge_data: Dict[str, Any], user_id: str, org_id: str) -> Dict[str, Any]:
@@ -221,152 +277,99 @@ class CandidatesManager:
             "modified_at": datetime.now().isoformat()
         }
     
-    def upsert_candidates(self, candidates: List[Dict[str, Any]]) -> Dict[str, int]:
-        """Insert or update candidates in Supabase."""
+    def upsert_candidates(self, candidates: List[Dict[str, Any]], batch_size: Optional[int] = None) -> Dict[str, int]:
+        """Insert or update candidates in Supabase using batched upserts."""
         if not candidates:
             logger.info("No candidates to upsert")
-            return {"inserted": 0, "updated": 0}
-            
-        inserted = 0
-        updated = 0
+            return {"inserted": 0, "updated": 0, "unchanged": 0}
         
         for candidate in candidates:
-            try:
-                # Check if the candidate already exists by ID or name
-                existing = None
-                
-                if candidate.get("id"):
-                    # Try to find by ID first
-                    existing_response = self.supabase.table(CANDIDATES_TABLE) \
-                        .select("id") \
-                        .eq("id", candidate["id"]) \
-                        .execute()
-                    
-                    if existing_response.data:
-                        existing = existing_response.data
-                
-                # If we still haven't found a match, try by name as a last resort
-                if not existing and candidate.get("name"):
-                    existing_response = self.supabase.table(CANDIDATES_TABLE) \
-                        .select("id") \
-                        .eq("name", candidate["name"]) \
-                        .execute()
-                    
-                    if existing_response.data:
-                        existing = existing_response.data
-                        # Update the ID to match the existing record
-                        if existing and len(existing) > 0:
-                            candidate["id"] = existing[0]["id"]
-                
-                if existing and len(existing) > 0:
-                    # Update existing record
-                    candidate["modified_at"] = datetime.now().isoformat()
-                    
-                    # Remove fields that don't exist in the schema or might cause problems
-                    if "updated_at" in candidate:
-                        del candidate["updated_at"]
-                    
-                    # Log the update
-                    candidate_name = candidate.get("name", "")
-                    logger.info(f"Updating candidate {candidate['id']} ({candidate_name})")
-                    
-                    self.supabase.table(CANDIDATES_TABLE) \
-                        .update(candidate) \
-                        .eq("id", candidate["id"]) \
-                        .execute()
-                    updated += 1
-                else:
-                    # Insert new record
-                    candidate["created_at"] = datetime.now().isoformat()
-                    candidate["modified_at"] = datetime.now().isoformat()
-                    
-                    # Remove fields that don't exist in the schema or might cause problems
-                    if "updated_at" in candidate:
-                        del candidate["updated_at"]
-                    
-                    # Generate ID if not provided
-                    if not candidate.get("id"):
-                        candidate["id"] = str(uuid.uuid4())
-                    
-                    # Log the insert
-                    candidate_name = candidate.get("name", "")
-                    logger.info(f"Inserting new candidate {candidate['id']} ({candidate_name})")
-                    
-                    self.supabase.table(CANDIDATES_TABLE) \
-                        .insert(candidate) \
-                        .execute()
-                    inserted += 1
-            except Exception as e:
-                logger.error(f"Error upserting candidate {candidate.get('id')}: {str(e)}")
+            # Remove fields that don't exist in the schema or might cause problems
+            if "updated_at" in candidate:
+                del candidate["updated_at"]
+            
+            # Generate ID if not provided
+            if not candidate.get("id"):
+                candidate["id"] = str(uuid.uuid4())
+        
+        def prepare(candidate: Dict[str, Any], exists: bool) -> None:
+            now = datetime.now().isoformat()
+            candidate["modified_at"] = now
+            if not exists:
+                candidate["created_at"] = now
+        
+        # Rows whose ID is unknown are matched by name as a last resort
+        results = bulk_upsert(
+            self.supabase,
+            CANDIDATES_TABLE,
+            candidates,
+            batch_size=batch_size,
+            prepare=prepare,
+            match_column="name",
+            cache=self.id_cache,
+            hash_fields=CANDIDATE_HASH_FIELDS
+        )
         
-        logger.info(f"Upsert complete. Inserted: {inserted}, Updated: {updated}")
-        return {"inserted": inserted, "updated": updated}
+        logger.info(f"Upsert complete. Inserted: {results['inserted']}, Updated: {results['updated']}, "
+                    f"Unchanged: {results['unchanged']}")
+        return results
     
-    def import_from_csv(self, csv_path: str, user_id: str, org_id: str) -> Dict[str, int]:
-        """Import candidates from a CSV file."""
+    def transform_csv_frame(self, df: pd.DataFrame, user_id: str, org_id: str) -> List[Dict[str, Any]]:
+        """Transform a frame of CSV rows into candidate records, column by column."""
+        # Default image URL (required by current schema)
+        default_image_url = "https://images.unsplash.com/photo-1517841905240-472988babdf9?ixlib=rb-4.0.3&ixid=MnwxMjA3fDB8MHxzZWFyY2h8MTJ8fHByb2ZpbGUlMjBpbWFnZXxlbnwwfHwwfHw%3D&auto=format&fit=crop&w=500&q=60"
+        now = datetime.now().isoformat()
+        
+        full_names = (text_column(df, "first_name") + " " + text_column(df, "last_name")).str.strip()
+        
+        # Create a deterministic UUID based on email or name
+        emails = text_column(df, "email")
+        unique_ids = emails.where(emails != "", full_names)
+        candidate_ids = with_id_column(df, uuid5_column("csv-", unique_ids))
+        
+        # Parse skills and use the first past title as the previous role
+        past_titles = list_column(df, "past_titles")
+        previous_roles = past_titles.str[0].fillna("Previous Position")
+        
+        # Transform to match known schema fields only
+        frame = pd.DataFrame({
+            "id": candidate_ids,
+            "organization_id": org_id,
+            "created_by": user_id,
+            "name": full_names,
+            "role": text_column(df, "current_title"),
+            "skills": list_column(df, "skills"),
+            "experience": numeric_column(df, "years_experience"),
+            "previous_role": previous_roles,
+            "status": "available",
+            "image_url": default_image_url,
+            "created_at": now,
+            "modified_at": now
+        }, index=df.index)
+        return frame_to_records(frame)
+    
+    def import_from_csv(self, csv_path: str, user_id: str, org_id: str, chunk_size: Optional[int] = None,
+                        progress: Optional[Callable[..., None]] = None) -> Dict[str, int]:
+        """Import candidates from a CSV file, one chunk of rows at a time.
+        
+        Args:
+            csv_path: Path or file-like object to read the CSV from
+            user_id: The UUID of the user associated with this data
+            org_id: The UUID of the organization associated with this data
+            chunk_size: Rows transformed and upserted at a time (defaults to CSV_CHUNK_SIZE)
+            progress: Optional callback receiving progress counters per chunk
+        """
         try:
-            df = pd.read_csv(csv_path)
-            logger.info(f"Loaded CSV with {len(df)} rows")
-            
-            # Validate required columns
-            required_cols = ["first_name", "last_name"]
-            missing_cols = [col for col in required_cols if col not in df.columns]
-            if missing_cols:
-                raise ValueError(f"Missing required columns in CSV: {', '.join(missing_cols)}")
-            
-            # Default image URL (required by current schema)
-            default_image_url = "https://images.unsplash.com/photo-1517841905240-472988babdf9?ixlib=rb-4.0.3&ixid=MnwxMjA3fDB8MHxzZWFyY2h8MTJ8fHByb2ZpbGUlMjBpbWFnZXxlbnwwfHwwfHw%3D&auto=format&fit=crop&w=500&q=60"
-            
-            # Transform data to match our schema
-            candidates = []
-            for _, row in df.iterrows():
-                # Create a deterministic UUID based on email or name
-                row_dict = row.to_dict()
-                first_name = row_dict.get("first_name", "")
-                last_name = row_dict.get("last_name", "")
-                full_name = f"{first_name} {last_name}".strip()
-                
-                email = row_dict.get("email", "")
-                unique_id = email if email else full_name
-                candidate_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, f"csv-{unique_id}")) if unique_id else str(uuid.uuid4())
-                
-                # Parse skills
-                skills_text = row_dict.get("skills", "")
-                skills = []
-                if isinstance(skills_text, str) and skills_text:
-                    skills = [skill.strip() for skill in skills_text.split(",")]
-                
-                # Parse past_titles for previous_role
-                past_titles_text = row_dict.get("past_titles", "")
-                past_titles = []
-                if isinstance(past_titles_text, str) and past_titles_text:
-                    past_titles = [title.strip() for title in past_titles_text.split(",")]
-                
-                previous_role = past_titles[0] if past_titles else "Previous Position"
-                
-                # Current role and company
-                current_title = row_dict.get("current_title", "")
-                
-                # Transform to match known schema fields only
-                candidate = {
-                    "id": row_dict.get("id", candidate_id),
-                    "organization_id": org_id,
-                    "created_by": user_id,
-                    "name": full_name,
-                    "role": current_title,
-                    "skills": skills,
-                    "experience": row_dict.get("years_experience"),
-                    "previous_role": previous_role,
-                    "status": "available",
-                    "image_url": default_image_url,
-                    "created_at": datetime.now().isoformat(),
-                    "modified_at": datetime.now().isoformat()
-                }
-                
-                candidates.append(candidate)
-            
-            # Upsert candidates
-            return self.upsert_candidates(candidates)
+            return import_csv_in_chunks(
+                csv_path,
+                lambda df: self.transform_csv_frame(df, user_id, org_id),
+                self.upsert_candidates,
+                entity="candidates",
+                required_cols=["first_name", "last_name"],
+                chunk_size=chunk_size,
+                progress=progress,
+                dtype=CSV_KEY_DTYPES
+            )
         except Exception as e:
             logger.error(f"Error importing from CSV: {str(e)}")
             raise
@@ -384,7 +387,7 @@ class CandidatesManager:
         
         try:
             # Make a simple API call to check if the token is valid
-            response = requests.get(f"{MERGE_BASE_URL}/candidates?limit=1", headers=headers)
+            response = get_session().get(f"{MERGE_BASE_URL}/candidates?limit=1", headers=headers)
             response.raise_for_status()
             logger.info("Merge account token is valid.")
             return True
@@ -20,7 +20,8 @@ def setup_cors(app: Flask) -> None:
     cors_config = {
         "origins": allowed_origins,
         "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization", "X-Requested-With", "Accept", "Origin"],
+        "allow_headers": ["Content-Type", "Authorization", "X-Requested-With", "Accept", "Origin", "Idempotency-Key"],
+        "expose_headers": ["Idempotent-Replayed"],
         "supports_credentials": True
     }
     
@@ -7,5 +7,6 @@ CREATE TABLE IF NOT EXISTS applications (
     job_posting_id UUID REFERENCES job_postings(id),
     status TEXT NOT NULL,
     applied_at TIMESTAMP WITH TIME ZONE,
-    last_updated TIMESTAMP WITH TIME ZONE
+    last_updated TIMESTAMP WITH TIME ZONE,
+    content_hash TEXT
 ); 
\ No newline at end of file
@@ -10,5 +10,6 @@ CREATE TABLE IF NOT EXISTS interviews (
     result TEXT,
     feedback TEXT,
     remote_created_at TIMESTAMP WITH TIME ZONE,
-    remote_updated_at TIMESTAMP WITH TIME ZONE
+    remote_updated_at TIMESTAMP WITH TIME ZONE,
+    content_hash TEXT
 ); 
\ No newline at end of file
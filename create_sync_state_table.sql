@@ -0,0 +1,36 @@
+CREATE TABLE IF NOT EXISTS sync_state (
+    organization_id UUID NOT NULL,
+    entity TEXT NOT NULL,
+    modified_after TIMESTAMP WITH TIME ZONE,
+    -- Checkpoint of a sync in progress: the next Merge page URL, plus the start
+    -- time and modified_after value of the run it belongs to
+    cursor TEXT,
+    cursor_started_at TIMESTAMP WITH TIME ZONE,
+    cursor_modified_after TIMESTAMP WITH TIME ZONE,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (organization_id, entity)
+);
+
+-- For tables created before checkpoints were added
+ALTER TABLE sync_state ADD COLUMN IF NOT EXISTS cursor TEXT;
+ALTER TABLE sync_state ADD COLUMN IF NOT EXISTS cursor_started_at TIMESTAMP WITH TIME ZONE;
+ALTER TABLE sync_state ADD COLUMN IF NOT EXISTS cursor_modified_after TIMESTAMP WITH TIME ZONE;
+
+-- Status of background sync jobs, readable by every worker process
+CREATE TABLE IF NOT EXISTS sync_jobs (
+    job_id UUID PRIMARY KEY,
+    entity TEXT NOT NULL,
+    organization_id UUID NOT NULL,
+    source TEXT NOT NULL,
+    priority TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress JSONB NOT NULL DEFAULT '{}'::jsonb,
+    result JSONB,
+    error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    started_at TIMESTAMP WITH TIME ZONE,
+    finished_at TIMESTAMP WITH TIME ZONE,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS sync_jobs_organization_id_idx ON sync_jobs (organization_id, created_at);
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Chunked CSV import shared by the managers.
+
+Bulk migration files can be far larger than a worker's memory, so CSVs are
+read ``CSV_CHUNK_SIZE`` rows at a time. Each chunk is transformed and
+upserted before the next one is read, which keeps memory flat regardless of
+the file size.
+"""
+
+import os
+import logging
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+
+from metrics import TRANSFORM_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Rows read, transformed and upserted at a time
+CSV_CHUNK_SIZE = int(os.environ.get("CSV_CHUNK_SIZE", "10000"))
+
+
+def _check_required_columns(columns: Any, required_cols: List[str]) -> None:
+    missing_cols = [col for col in required_cols if col not in columns]
+    if missing_cols:
+        raise ValueError(f"Missing required columns in CSV: {', '.join(missing_cols)}")
+
+
+def import_csv_in_chunks(source: Any, transform: Callable[[pd.DataFrame], List[Dict[str, Any]]],
+                         upsert: Callable[[List[Dict[str, Any]]], Dict[str, int]], entity: str = "records",
+                         required_cols: Optional[List[str]] = None, chunk_size: Optional[int] = None,
+                         progress: Optional[Callable[..., None]] = None,
+                         dtype: Optional[Dict[str, Any]] = None) -> Dict[str, int]:
+    """Read a CSV in chunks and upsert each chunk before reading the next.
+
+    Args:
+        source: A file path or a readable file-like object
+        transform: Turns a chunk of rows into records
+        upsert: Writes a list of records and returns its counts
+        entity: Name of the imported entity, used to label metrics
+        required_cols: Columns the CSV must contain
+        chunk_size: Rows per chunk (defaults to CSV_CHUNK_SIZE)
+        progress: Optional callback receiving progress counters as keyword arguments
+        dtype: Column types passed to pandas, so every chunk parses a column the same way
+
+    Returns:
+        The summed upsert counts
+    """
+    chunk_size = chunk_size or CSV_CHUNK_SIZE
+    report = progress or (lambda **counters: None)
+
+    results = {"inserted": 0, "updated": 0, "unchanged": 0, "failed": 0}
+    rows = 0
+    chunks = 0
+
+    try:
+        reader = pd.read_csv(source, chunksize=chunk_size, dtype=dtype)
+    except pd.errors.EmptyDataError:
+        # A completely empty file has no header to read
+        reader = nullcontext(())
+
+    with reader as frames:
+        for df in frames:
+            # Validate required columns against the header, which even a file without rows has
+            if chunks == 0 and required_cols:
+                _check_required_columns(df.columns, required_cols)
+
+            with TRANSFORM_SECONDS.labels(entity=entity, source="csv").time():
+                records = transform(df)
+            counts = upsert(records)
+            for key, value in counts.items():
+                results[key] = results.get(key, 0) + value
+
+            rows += len(df)
+            chunks += 1
+            logger.info(f"Imported CSV chunk {chunks} ({rows} rows so far)")
+            report(stage="importing", chunks=chunks, rows=rows, **results)
+
+    if chunks == 0 and required_cols:
+        # No chunk at all means the file had no header either
+        _check_required_columns([], required_cols)
+
+    report(stage="done", chunks=chunks, rows=rows, **results)
+    logger.info(f"Loaded CSV with {rows} rows in {chunks} chunks")
+    return results
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Column-wise helpers for the managers' CSV imports.
+
+The import_from_csv methods transform whole pandas columns with these helpers
+instead of walking the frame with ``iterrows``, which is orders of magnitude
+slower on large files.
+"""
+
+import uuid
+import logging
+from typing import Any, Dict, List
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+TRUE_VALUES = ["true", "yes", "1", "y"]
+
+
+def raw_column(df: pd.DataFrame, name: str, default: Any = None) -> pd.Series:
+    """Return a column as-is, or a column of ``default`` when it is missing."""
+    if name in df.columns:
+        return df[name]
+    return pd.Series([default] * len(df), index=df.index, dtype=object)
+
+
+def text_column(df: pd.DataFrame, name: str, default: str = "") -> pd.Series:
+    """Return a column as strings with missing cells set to ``default``."""
+    column = raw_column(df, name)
+    return column.where(column.notna(), default).astype(str)
+
+
+def key_column(df: pd.DataFrame, name: str, default: str = "None") -> pd.Series:
+    """Return a column formatted the way an f-string formats the raw cell value.
+
+    Deterministic ids are derived from these strings, so missing cells must
+    format exactly as they always have ("nan") for re-imports to keep matching
+    the rows they created.
+    """
+    if name in df.columns:
+        return df[name].astype(str)
+    return pd.Series([default] * len(df), index=df.index, dtype=object)
+
+
+def optional_column(df: pd.DataFrame, name: str) -> pd.Series:
+    """Return a column with missing cells as None."""
+    column = raw_column(df, name).astype(object)
+    return column.where(column.notna(), None)
+
+
+def numeric_column(df: pd.DataFrame, name: str) -> pd.Series:
+    """Return a numeric column, using integers when every value is whole."""
+    column = pd.to_numeric(raw_column(df, name), errors="coerce")
+    present = column.dropna()
+    if len(present) and (present % 1 == 0).all():
+        column = column.astype("Int64")
+    return column
+
+
+def bool_column(df: pd.DataFrame, name: str) -> pd.Series:
+    """Parse a boolean column, accepting true/yes/1/y strings."""
+    column = raw_column(df, name, False)
+    if column.dtype == bool:
+        return column
+    if pd.api.types.is_numeric_dtype(column):
+        return column.fillna(0) != 0
+    return column.astype(str).str.strip().str.lower().isin(TRUE_VALUES)
+
+
+def list_column(df: pd.DataFrame, name: str) -> pd.Series:
+    """Split a comma separated column into lists of stripped strings."""
+    text = text_column(df, name)
+    return pd.Series(
+        [[item.strip() for item in value.split(",")] if value else [] for value in text],
+        index=df.index,
+        dtype=object
+    )
+
+
+def normalize_upper(column: pd.Series, valid: List[str], default: str = "OTHER",
+                    label: str = "status") -> pd.Series:
+    """Uppercase a column and replace values outside ``valid`` with ``default``."""
+    upper = column.str.upper()
+    invalid = ~upper.isin(valid)
+    if invalid.any():
+        examples = ", ".join(sorted(upper[invalid].unique())[:5])
+        logger.warning(f"{int(invalid.sum())} rows with invalid {label} values ({examples}) - defaulting to '{default}'")
+    return upper.where(~invalid, default)
+
+
+def time_column(column: pd.Series) -> pd.Series:
+    """Extract HH:MM from ISO datetime strings; date-only values map to 00:00."""
+    text = column.astype(object).where(column.notna(), "").astype(str)
+    times = text.str.extract(r"^\d{4}-\d{2}-\d{2}[T ](\d{2}:\d{2})", expand=False)
+    midnight = text.str.fullmatch(r"\d{4}-\d{2}-\d{2}")
+    times = times.where(~midnight, "00:00")
+    return times.astype(object).where(times.notna(), None)
+
+
+def uuid5_column(prefix: str, keys: pd.Series) -> pd.Series:
+    """Derive deterministic UUIDs from ``prefix`` and each key, or random ones for empty keys."""
+    namespace = uuid.NAMESPACE_DNS
+    return pd.Series(
+        [str(uuid.uuid5(namespace, f"{prefix}{key}")) if key else str(uuid.uuid4()) for key in keys],
+        index=keys.index,
+        dtype=object
+    )
+
+
+def with_id_column(df: pd.DataFrame, derived_ids: pd.Series) -> pd.Series:
+    """Prefer ids provided in the CSV and fall back to the derived ones."""
+    if "id" not in df.columns:
+        return derived_ids
+    return df["id"].astype(object).where(df["id"].notna(), derived_ids)
+
+
+def fill_missing(df: pd.DataFrame, name: str, default: Any) -> pd.Series:
+    """Return a column with missing cells (or a missing column) set to ``default``."""
+    column = raw_column(df, name, default).astype(object)
+    return column.where(column.notna(), default)
+
+
+def frame_to_records(frame: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Convert a transformed frame to JSON-safe dicts, mapping NaN/NA to None."""
+    frame = frame.astype(object)
+    return frame.where(frame.notna(), None).to_dict("records")
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for the Merge ATS API and Supabase PostgREST.
+
+``FakeMergeAPI`` serves synthetic, paginated ``/api/ats/v1/*`` collections
+and ``FakePostgREST`` keeps tables in memory behind the subset of the
+PostgREST protocol the managers use (select with filters, upsert, insert,
+update, delete and rpc). Both run on a background thread on 127.0.0.1, with
+an optional per-request latency, so syncs and imports can be exercised and
+timed offline by the benchmark harness and the tests.
+"""
+
+import csv
+import json
+import time
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+logger = logging.getLogger(__name__)
+
+MERGE_API_PATH = "/api/ats/v1"
+
+# Merge's own maximum page size
+MERGE_MAX_PAGE_SIZE = 100
+
+# Merge collections served by FakeMergeAPI
+MERGE_COLLECTIONS = ("candidates", "job-postings", "applications", "interviews")
+
+INTERVIEW_STATUSES = ("SCHEDULED", "COMPLETE", "CANCELLED")
+APPLICATION_STATUSES = ("APPLIED", "INTERVIEWING", "OFFERED", "HIRED", "REJECTED")
+
+# Reference field -> the Merge collection ``expand`` embeds it from
+EXPANDABLE = {"candidate": "candidates", "job": "job-postings", "application": "applications"}
+
+
+class _FakeServer:
+    """A threaded HTTP server whose requests are answered by ``handle``."""
+
+    def __init__(self, latency: float = 0.0):
+        """Initialize the server.
+
+        Args:
+            latency: Seconds added to every response
+        """
+        self.latency = latency
+        self.requests = 0
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def root_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def handle(self, method: str, path: str, params: List[Tuple[str, str]], headers: Dict[str, str],
+               body: Any) -> Tuple[int, Any, Dict[str, str]]:
+        """Answer one request with (status, JSON body, extra headers)."""
+        raise NotImplementedError
+
+    def start(self) -> "_FakeServer":
+        """Start serving on a free local port."""
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately; don't let Nagle hold the body back
+            disable_nagle_algorithm = True
+
+            def _dispatch(self):
+                with fake._lock:
+                    fake.requests += 1
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                body = json.loads(raw) if raw else None
+                parts = urlsplit(self.path)
+                if fake.latency:
+                    time.sleep(fake.latency)
+                try:
+                    status, payload, extra = fake.handle(self.command, parts.path, parse_qsl(parts.query),
+                                                         dict(self.headers), body)
+                except Exception as e:
+                    logger.error(f"Fake server error for {self.command} {self.path}: {str(e)}")
+                    status, payload, extra = 500, {"message": str(e)}, {}
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in extra.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_PATCH = do_DELETE = _dispatch
+
+            def do_HEAD(self):
+                self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and release the port."""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def merge_record(collection: str, index: int, counts: Dict[str, int]) -> Dict[str, Any]:
+    """Build the synthetic Merge record at ``index`` of a collection.
+
+    References point at records of the other collections, so applications
+    resolve to generated candidates and job postings, and interviews to
+    generated applications.
+    """
+    modified_at = f"2024-01-{index % 28 + 1:02d}T{index % 24:02d}:00:00Z"
+    if collection == "candidates":
+        return {
+            "id": f"cand-{index}",
+            "remote_id": f"cand-{index}",
+            "first_name": "Candidate",
+            "last_name": str(index),
+            "emails": [{"type": "primary", "value": f"candidate{index}@example.com"}],
+            "current_title": "Engineer",
+            "current_company": "Example Corp",
+            "skills": ["Python", "SQL"],
+            "years_experience": index % 20,
+            "past_titles": ["Intern"],
+            "modified_at": modified_at
+        }
+    if collection == "job-postings":
+        return {
+            "id": f"job-{index}",
+            "name": f"Job {index}",
+            "description": "Synthetic job posting",
+            "code": f"JOB-{index}",
+            "location": "Remote",
+            "remote": True,
+            "status": "OPEN",
+            "created_at": modified_at,
+            "modified_at": modified_at
+        }
+    if collection == "applications":
+        return {
+            "id": f"app-{index}",
+            "candidate": f"cand-{index % max(1, counts.get('candidates', 1))}",
+            "job": f"job-{index % max(1, counts.get('job-postings', 1))}",
+            "status": APPLICATION_STATUSES[index % len(APPLICATION_STATUSES)],
+            "applied_at": modified_at,
+            "modified_at": modified_at
+        }
+    if collection == "interviews":
+        return {
+            "id": f"interview-{index}",
+            "application": f"app-{index % max(1, counts.get('applications', 1))}",
+            "status": INTERVIEW_STATUSES[index % len(INTERVIEW_STATUSES)],
+            "start_time": modified_at,
+            "feedback": "Synthetic interview",
+            "modified_at": modified_at
+        }
+    raise ValueError(f"Unknown Merge collection: {collection}")
+
+
+class FakeMergeAPI(_FakeServer):
+    """Synthetic Merge ATS collections paginated with ``next`` cursors."""
+
+    def __init__(self, counts: Dict[str, int], page_size: int = MERGE_MAX_PAGE_SIZE, latency: float = 0.0):
+        """Initialize the fake API.
+
+        Args:
+            counts: Number of records per collection, keyed by Merge path
+                    (e.g. "candidates", "job-postings")
+            page_size: Records per page unless the request asks for fewer
+            latency: Seconds added to every response
+        """
+        super().__init__(latency)
+        self.counts = counts
+        self.page_size = page_size
+
+    @property
+    def base_url(self) -> str:
+        """The URL to use in place of MERGE_BASE_URL."""
+        return f"{self.root_url}{MERGE_API_PATH}"
+
+    def handle(self, method, path, params, headers, body):
+        collection = path[len(MERGE_API_PATH):].strip("/")
+        if not path.startswith(MERGE_API_PATH) or collection not in MERGE_COLLECTIONS:
+            return 404, {"detail": "Not found."}, {}
+        if not headers.get("X-Account-Token"):
+            return 401, {"detail": "Missing account token."}, {}
+
+        query = dict(params)
+        total = self.counts.get(collection, 0)
+        start = int(query.get("cursor") or 0)
+        size = min(int(query.get("page_size") or self.page_size), MERGE_MAX_PAGE_SIZE)
+        end = min(start + size, total)
+
+        results = [merge_record(collection, index, self.counts) for index in range(start, end)]
+        for field in filter(None, (query.get("expand") or "").split(",")):
+            for record in results:
+                if field in EXPANDABLE and isinstance(record.get(field), str):
+                    related_collection = EXPANDABLE[field]
+                    related_index = int(record[field].rsplit("-", 1)[1])
+                    record[field] = merge_record(related_collection, related_index, self.counts)
+        next_url = None
+        if end < total:
+            next_url = f"{self.base_url}/{collection}?{urlencode({**query, 'cursor': end})}"
+        return 200, {"next": next_url, "previous": None, "results": results}, {}
+
+
+def _parse_list(criteria: str) -> List[str]:
+    """Split ``(a,b,"c,d")`` into its values."""
+    inner = criteria[1:-1] if criteria.startswith("(") and criteria.endswith(")") else criteria
+    return next(csv.reader([inner])) if inner else []
+
+
+def _compile_filter(operator: str, criteria: str) -> Callable[[Any], bool]:
+    """Build a predicate for one ``column=operator.criteria`` filter."""
+    if operator == "is":
+        expected = {"null": None, "true": True, "false": False}.get(criteria.lower())
+        return lambda value: value is expected
+    if operator == "in":
+        allowed = set(_parse_list(criteria))
+        return lambda value: value is not None and _as_text(value) in allowed
+    compare = {
+        "eq": lambda text: text == criteria,
+        "neq": lambda text: text != criteria,
+        "gt": lambda text: text > criteria,
+        "gte": lambda text: text >= criteria,
+        "lt": lambda text: text < criteria,
+        "lte": lambda text: text <= criteria,
+    }.get(operator)
+    if compare is None:
+        raise ValueError(f"Unsupported filter operator: {operator}")
+    return lambda value: value is not None and compare(_as_text(value))
+
+
+def _as_text(value: Any) -> str:
+    """Render a stored value the way it appears in a query string."""
+    return str(value).lower() if isinstance(value, bool) else str(value)
+
+
+class FakePostgREST(_FakeServer):
+    """In-memory tables behind a PostgREST-compatible HTTP API."""
+
+    # Query parameters that are not column filters
+    RESERVED_PARAMS = ("select", "limit", "offset", "order", "on_conflict", "columns")
+
+    def __init__(self, latency: float = 0.0, functions: Optional[Dict[str, Callable[[Dict[str, Any]], Any]]] = None):
+        """Initialize empty tables.
+
+        Args:
+            latency: Seconds added to every response
+            functions: rpc functions by name; ``get_merge_token`` is provided by default
+        """
+        super().__init__(latency)
+        # Rows per table keyed by id, or by insertion order for rows without one
+        self.tables: Dict[str, Dict[Any, Dict[str, Any]]] = {}
+        self.functions = {"get_merge_token": lambda params: {"token": "fake_merge_account_token", "expires_at": None}}
+        self.functions.update(functions or {})
+        self._data_lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        """The URL to use in place of SUPABASE_URL."""
+        return self.root_url
+
+    def rows(self, table: str) -> List[Dict[str, Any]]:
+        """Return a copy of every row in a table."""
+        with self._data_lock:
+            return [dict(row) for row in self.tables.get(table, {}).values()]
+
+    def _select(self, table: str, filters: List[Tuple[str, str, str]]) -> List[Dict[str, Any]]:
+        rows = self.tables.get(table, {})
+        # Primary-key filters are answered from the index instead of a scan
+        for column, operator, criteria in filters:
+            if column == "id" and operator in ("eq", "in"):
+                keys = [criteria] if operator == "eq" else _parse_list(criteria)
+                candidates = [rows[key] for key in dict.fromkeys(keys) if key in rows]
+                break
+        else:
+            candidates = list(rows.values())
+        predicates = [(column, _compile_filter(operator, criteria)) for column, operator, criteria in filters]
+        return [row for row in candidates if all(predicate(row.get(column)) for column, predicate in predicates)]
+
+    def _upsert(self, table: str, rows: List[Dict[str, Any]], on_conflict: Optional[str], merge: bool) -> List[Dict[str, Any]]:
+        stored = self.tables.setdefault(table, {})
+        conflict = [column.strip() for column in on_conflict.split(",")] if on_conflict else ["id"]
+        written = []
+        for row in rows:
+            if conflict == ["id"] and "id" in row:
+                key = row["id"]
+            else:
+                match = next((k for k, existing in stored.items()
+                              if all(existing.get(column) == row.get(column) for column in conflict)), None)
+                key = match if match is not None else row.get("id", f"row-{len(stored)}")
+            if key in stored:
+                if not merge:
+                    raise ValueError(f"duplicate key value violates unique constraint on {table}")
+                stored[key].update(row)
+            else:
+                stored[key] = dict(row)
+            written.append(dict(stored[key]))
+        return written
+
+    def handle(self, method, path, params, headers, body):
+        if not path.startswith("/rest/v1/"):
+            return 404, {"message": "Not found"}, {}
+        resource = path[len("/rest/v1/"):]
+
+        if resource.startswith("rpc/"):
+            function = self.functions.get(resource[len("rpc/"):])
+            if function is None:
+                return 404, {"message": f"Could not find the function {resource}"}, {}
+            return 200, function(body or {}), {}
+
+        query = dict(params)
+        filters = []
+        for column, value in params:
+            if column not in self.RESERVED_PARAMS and "." in value:
+                operator, criteria = value.split(".", 1)
+                filters.append((column, operator, criteria))
+
+        with self._data_lock:
+            if method == "GET":
+                rows = self._select(resource, filters)
+                if query.get("order"):
+                    column, _, direction = query["order"].partition(".")
+                    rows.sort(key=lambda row: (row.get(column) is None, str(row.get(column))),
+                              reverse=direction.startswith("desc"))
+                offset = int(query.get("offset") or 0)
+                if query.get("limit"):
+                    rows = rows[offset:offset + int(query["limit"])]
+                columns = [column.strip() for column in query.get("select", "*").split(",")]
+                if "*" not in columns:
+                    rows = [{column: row.get(column) for column in columns} for row in rows]
+                return 200, [dict(row) for row in rows], {}
+
+            if method == "POST":
+                rows = body if isinstance(body, list) else [body]
+                prefer = headers.get("Prefer", "")
+                try:
+                    written = self._upsert(resource, rows, query.get("on_conflict"),
+                                           merge="resolution=merge-duplicates" in prefer)
+                except ValueError as e:
+                    return 409, {"code": "23505", "message": str(e)}, {}
+                return 201, written, {}
+
+            if method == "PATCH":
+                rows = self._select(resource, filters)
+                for row in rows:
+                    row.update(body or {})
+                return 200, [dict(row) for row in rows], {}
+
+            if method == "DELETE":
+                rows = self._select(resource, filters)
+                stored = self.tables.get(resource, {})
+                for key in [key for key, row in stored.items() if any(row is match for match in rows)]:
+                    del stored[key]
+                return 200, rows, {}
+
+        return 405, {"message": f"Method {method} not allowed"}, {}
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Dependency-aware sync of every entity for one organization.
+
+Applications reference candidates and job postings, and interviews reference
+applications, so a full-tenant sync runs in stages: candidates and job
+postings in parallel, then applications, then interviews. All managers of a
+run share one id cache, so the ids written by a stage are resolved from
+memory by the stages after it instead of being looked up in Supabase again.
+"""
+
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from id_cache import IdCache, id_cache
+from merge_sync import in_flight_syncs, run_merge_sync, sync_key
+from candidates_manager import CandidatesManager
+from job_postings_manager import JobPostingsManager
+from applications_manager import ApplicationsManager
+from interviews_manager import InterviewsManager
+
+logger = logging.getLogger(__name__)
+
+# Entities in each stage only depend on entities from earlier stages
+SYNC_STAGES = [
+    ["candidates", "job_postings"],
+    ["applications"],
+    ["interviews"],
+]
+
+ENTITY_MANAGERS = {
+    "candidates": CandidatesManager,
+    "job_postings": JobPostingsManager,
+    "applications": ApplicationsManager,
+    "interviews": InterviewsManager,
+}
+
+# Ids kept for the duration of one full sync; large tenants need room for every row
+FULL_SYNC_ID_CACHE_MAX_SIZE = int(os.environ.get("FULL_SYNC_ID_CACHE_MAX_SIZE", "1000000"))
+
+
+def run_full_sync(user_id: str, org_id: str, user_token: Optional[str] = None, test_mode: bool = False,
+                  full_resync: bool = False, progress: Optional[Callable[..., None]] = None) -> Dict[str, Any]:
+    """Sync every entity for an organization in dependency order.
+
+    Args:
+        user_id: The UUID of the user associated with this data
+        org_id: The UUID of the organization associated with this data
+        user_token: Optional user JWT or Merge account token from the request
+        test_mode: If True, use sample data and leave the watermarks untouched
+        full_resync: If True, ignore the stored watermarks and fetch everything
+        progress: Optional callback receiving each entity's progress counters,
+                  keyed by entity name
+
+    Returns:
+        Dict with the results of each entity, the entities that failed with
+        their error, and the entities skipped because a dependency failed
+    """
+    report = progress or (lambda **counters: None)
+
+    # Entries outlive the run's slowest stage and fall back to the worker-wide cache
+    run_cache = IdCache(max_size=FULL_SYNC_ID_CACHE_MAX_SIZE, ttl_seconds=24 * 60 * 60, parent=id_cache)
+
+    results: Dict[str, Any] = {}
+    errors: Dict[str, str] = {}
+    skipped: List[str] = []
+
+    def sync_entity(entity: str) -> Dict[str, Any]:
+        manager = ENTITY_MANAGERS[entity]()
+        manager.id_cache = run_cache
+        return run_merge_sync(
+            manager,
+            entity,
+            user_id,
+            org_id,
+            user_token=user_token,
+            test_mode=test_mode,
+            full_resync=full_resync,
+            progress=lambda **counters: report(**{entity: counters})
+        )
+
+    for stage in SYNC_STAGES:
+        if errors:
+            # Later stages would reference rows that were never written
+            skipped.extend(stage)
+            continue
+
+        logger.info(f"Full sync for organization {org_id}: running {', '.join(stage)}")
+        with ThreadPoolExecutor(max_workers=len(stage), thread_name_prefix="full-sync") as executor:
+            futures = {entity: executor.submit(sync_entity, entity) for entity in stage}
+            for entity, future in futures.items():
+                try:
+                    results[entity] = future.result()
+                except Exception as e:
+                    logger.error(f"Full sync of {entity} for organization {org_id} failed: {str(e)}")
+                    errors[entity] = str(e)
+
+    if skipped:
+        logger.warning(f"Skipped {', '.join(skipped)} for organization {org_id} after failed dependencies")
+
+    logger.info(f"Full sync for organization {org_id} finished: {run_cache.stats()}")
+    return {"results": results, "errors": errors, "skipped": skipped}
+
+
+def run_coalesced_full_sync(user_id: str, org_id: str, user_token: Optional[str] = None, test_mode: bool = False,
+                            full_resync: bool = False, progress: Optional[Callable[..., None]] = None) -> Dict[str, Any]:
+    """Run run_full_sync, or wait for an identical full sync already in flight and return its summary."""
+    def run() -> Dict[str, Any]:
+        return run_full_sync(user_id, org_id, user_token=user_token, test_mode=test_mode,
+                             full_resync=full_resync, progress=progress)
+
+    return in_flight_syncs.do(sync_key("all", org_id, test_mode=test_mode, full_resync=full_resync), run)
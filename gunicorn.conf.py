@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Gunicorn settings, read automatically from the working directory.
+
+When PROMETHEUS_MULTIPROC_DIR is set, the workers share their metrics through
+files in that directory (see metrics.py). The files of a previous run are
+removed when the master starts, and those of a worker that exits are marked
+dead so its gauges stop counting.
+"""
+
+import os
+import glob
+
+PROMETHEUS_MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR", "")
+
+
+def on_starting(server):
+    """Clear the metric files left by a previous run."""
+    if PROMETHEUS_MULTIPROC_DIR:
+        os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+        for path in glob.glob(os.path.join(PROMETHEUS_MULTIPROC_DIR, "*.db")):
+            os.remove(path)
+
+
+def child_exit(server, worker):
+    """Drop the live gauges of a worker that exited."""
+    if PROMETHEUS_MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
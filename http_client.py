@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP client for outbound API calls.
+
+All Merge API and Edge Function requests go through one pooled
+``requests.Session`` per worker process, so connections are kept alive and
+reused instead of paying a TCP+TLS handshake for every page.
+"""
+
+import os
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Number of distinct hosts kept in the pool manager
+HTTP_POOL_CONNECTIONS = int(os.environ.get("HTTP_POOL_CONNECTIONS", "10"))
+
+# Keep-alive connections kept per host; size this to the threads per worker
+HTTP_POOL_MAXSIZE = int(os.environ.get("HTTP_POOL_MAXSIZE", "32"))
+
+_session: Optional[requests.Session] = None
+_adapter: Optional[HTTPAdapter] = None
+_session_pid: Optional[int] = None
+_lock = threading.Lock()
+
+
+def _create_session() -> requests.Session:
+    """Create a session with a connection pool sized for the worker."""
+    global _adapter
+
+    session = requests.Session()
+    _adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_CONNECTIONS,
+        pool_maxsize=HTTP_POOL_MAXSIZE
+    )
+    session.mount("https://", _adapter)
+    session.mount("http://", _adapter)
+    session.headers.update({
+        "Accept-Encoding": "gzip, deflate",
+        "Connection": "keep-alive"
+    })
+    logger.info(f"Created HTTP session (pool_connections={HTTP_POOL_CONNECTIONS}, pool_maxsize={HTTP_POOL_MAXSIZE})")
+    return session
+
+
+def get_session() -> requests.Session:
+    """Return the pooled session for the current process.
+
+    The session is created lazily and recreated after a fork, since pooled
+    sockets must not be shared between gunicorn workers.
+    """
+    global _session, _session_pid
+
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _lock:
+            if _session is None or _session_pid != pid:
+                _session = _create_session()
+                _session_pid = pid
+    return _session
+
+
+def pool_stats() -> Dict[str, Any]:
+    """Return connection pool statistics for the current process.
+
+    ``connections_opened`` counts new connections and ``requests`` counts
+    requests sent per host pool; a high requests-to-connections ratio
+    confirms keep-alive reuse.
+    """
+    pools: List[Dict[str, Any]] = []
+    if _adapter is not None and _session_pid == os.getpid():
+        container = _adapter.poolmanager.pools
+        for key in list(container.keys()):
+            pool = container.get(key)
+            if pool is None:
+                continue
+            pools.append({
+                "host": f"{pool.scheme}://{pool.host}:{pool.port}",
+                "connections_opened": pool.num_connections,
+                "requests": pool.num_requests,
+                "idle_connections": pool.pool.qsize() if pool.pool else 0
+            })
+
+    return {
+        "pool_connections": HTTP_POOL_CONNECTIONS,
+        "pool_maxsize": HTTP_POOL_MAXSIZE,
+        "connections_opened": sum(pool["connections_opened"] for pool in pools),
+        "requests": sum(pool["requests"] for pool in pools),
+        "pools": pools
+    }
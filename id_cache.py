@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Process-wide cache of resolved entity ids.
+
+The managers derive our database ids from Merge ids with uuid5, so resolving a
+reference only needs to confirm that the row exists. This module keeps a
+bounded, TTL-evicting LRU of ids known to exist, keyed by (table, id), so
+back-to-back syncs in the same worker do not re-query rows they just wrote.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of ids kept per worker process
+ID_CACHE_MAX_SIZE = int(os.environ.get("ID_CACHE_MAX_SIZE", "100000"))
+
+# Seconds before a cached id must be confirmed against Supabase again
+ID_CACHE_TTL_SECONDS = float(os.environ.get("ID_CACHE_TTL_SECONDS", "900"))
+
+
+class IdCache:
+    """Bounded LRU cache with per-entry TTL for ids known to exist."""
+
+    def __init__(self, max_size: int = ID_CACHE_MAX_SIZE, ttl_seconds: float = ID_CACHE_TTL_SECONDS,
+                 parent: Optional["IdCache"] = None):
+        """Initialize the cache.
+
+        Args:
+            max_size: Maximum number of entries before the least recently used is evicted
+            ttl_seconds: Lifetime of an entry in seconds
+            parent: Optional cache consulted on a miss and updated on every set,
+                    so a short-lived cache still shares what the worker knows
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.parent = parent
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, table: str, entity_id: str) -> Optional[Any]:
+        """Return the cached value for an id, or None if it is unknown or expired."""
+        key = (table, str(entity_id))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at >= time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        value = self.parent.get(table, entity_id) if self.parent else None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        self._store(key, value)
+        return value
+
+    def lookup_many(self, table: str, entity_ids: Iterable[str]) -> Tuple[Dict[str, Any], List[str]]:
+        """Split ids into cached values and ids that still need a lookup.
+
+        Returns:
+            Tuple of (cached values by id, ids missing from the cache)
+        """
+        cached = {}
+        missing = []
+        for entity_id in dict.fromkeys(entity_ids):
+            value = self.get(table, entity_id)
+            if value is None:
+                missing.append(entity_id)
+            else:
+                cached[entity_id] = value
+        return cached, missing
+
+    def set(self, table: str, entity_id: str, value: Any = True) -> None:
+        """Record that an id exists, optionally with resolved details."""
+        self._store((table, str(entity_id)), value)
+        if self.parent:
+            self.parent.set(table, entity_id, value)
+
+    def _store(self, key: Tuple[str, str], value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def set_many(self, table: str, entity_ids: Iterable[str]) -> None:
+        """Record that all of the given ids exist."""
+        for entity_id in entity_ids:
+            self.set(table, entity_id)
+
+    def invalidate(self, table: str, entity_id: str) -> None:
+        """Forget a single id."""
+        with self._lock:
+            self._entries.pop((table, str(entity_id)), None)
+        if self.parent:
+            self.parent.invalidate(table, entity_id)
+
+    def clear(self) -> None:
+        """Drop every entry and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds
+            }
+
+
+# Singleton instance shared by all managers in the worker
+id_cache = IdCache()
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Idempotency keys for the sync endpoints.
+
+Clients that retry ``POST /sync/*`` after a timeout send the same
+``Idempotency-Key`` header. The first successful response (200, or 202 for
+a queued job) is stored for IDEMPOTENCY_TTL_SECONDS and replayed for every
+repeat, without touching Merge or Supabase. Keys are scoped to the endpoint,
+the organization and the caller, so two tenants that happen to pick the same
+key never see each other's responses. A fingerprint of the request is stored
+with the response, and reusing a key for a different request is rejected
+with 422. Errors are not stored, so a retry after a failure runs the sync
+again. Requests with the same key that arrive while the first is still
+running wait for its response.
+
+Responses are kept in a bounded in-memory LRU per worker process. Setting
+IDEMPOTENCY_SQLITE_PATH also persists 200 responses to a SQLite file, so they
+survive restarts and are shared by the workers of one host. 202 responses
+stay in memory: their status_url points at a job that only this worker
+process knows about.
+"""
+
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+import functools
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from flask import Response, make_response, request, jsonify
+
+from single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+# Set on responses served from the store
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+# Seconds a stored response is replayed for
+IDEMPOTENCY_TTL_SECONDS = float(os.environ.get("IDEMPOTENCY_TTL_SECONDS", "86400"))
+
+# Maximum number of responses kept in memory per worker process
+IDEMPOTENCY_MAX_SIZE = int(os.environ.get("IDEMPOTENCY_MAX_SIZE", "10000"))
+
+# Optional SQLite file the responses are also written to
+IDEMPOTENCY_SQLITE_PATH = os.environ.get("IDEMPOTENCY_SQLITE_PATH", "")
+
+# Longest key accepted
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+# Status codes whose responses are stored
+STORED_STATUS_CODES = (200, 202)
+
+# Status codes whose responses are also written to SQLite. A 202 refers to a
+# job held in the memory of one worker process, which other workers and a
+# restarted process would answer with 404.
+PERSISTED_STATUS_CODES = (200,)
+
+# Expired SQLite rows are deleted every this many writes
+_PRUNE_EVERY = 100
+
+# Bytes read at a time when hashing an uploaded file
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class IdempotencyStore:
+    """Bounded TTL store of responses by idempotency key, optionally backed by SQLite."""
+
+    def __init__(self, max_size: int = IDEMPOTENCY_MAX_SIZE, ttl_seconds: float = IDEMPOTENCY_TTL_SECONDS,
+                 sqlite_path: Optional[str] = IDEMPOTENCY_SQLITE_PATH):
+        """Initialize the store.
+
+        Args:
+            max_size: Maximum number of responses kept in memory
+            ttl_seconds: Seconds a response is replayed for
+            sqlite_path: Optional SQLite file the responses are persisted to
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.sqlite_path = sqlite_path or None
+        # Key -> (stored at, status code, body, request fingerprint)
+        self._entries: "OrderedDict[str, Tuple[float, int, str, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._connection_pid: Optional[int] = None
+        self._writes = 0
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """Return the SQLite connection of this process. Called with the lock held."""
+        # Connections must not be shared across a fork
+        pid = os.getpid()
+        if self._connection is None or self._connection_pid != pid:
+            self._connection = sqlite3.connect(self.sqlite_path, timeout=10, check_same_thread=False)
+            columns = {row[1] for row in self._connection.execute("PRAGMA table_info(idempotency_keys)")}
+            if columns and "fingerprint" not in columns:
+                # Responses stored without a fingerprint cannot be checked against a retry
+                self._connection.execute("DROP TABLE idempotency_keys")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS idempotency_keys ("
+                "key TEXT PRIMARY KEY, status INTEGER NOT NULL, body TEXT NOT NULL, "
+                "fingerprint TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+            self._connection.commit()
+            self._connection_pid = pid
+        return self._connection
+
+    def _remember(self, key: str, entry: Tuple[float, int, str, str]) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Tuple[int, str, str]]:
+        """Return the stored (status code, body, fingerprint) for a key, or None if unknown or expired."""
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] >= cutoff:
+                    self._entries.move_to_end(key)
+                    return entry[1:]
+                del self._entries[key]
+
+            if not self.sqlite_path:
+                return None
+            try:
+                row = self._get_connection().execute(
+                    "SELECT stored_at, status, body, fingerprint FROM idempotency_keys "
+                    "WHERE key = ? AND stored_at >= ?",
+                    (key, cutoff)
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.error(f"Error reading idempotency key from SQLite: {str(e)}")
+                return None
+            if row is None:
+                return None
+            self._remember(key, tuple(row))
+            return row[1], row[2], row[3]
+
+    def put(self, key: str, status: int, body: str, fingerprint: str = "") -> None:
+        """Store the response for a key, with the fingerprint of the request that produced it."""
+        entry = (time.time(), status, body, fingerprint)
+        with self._lock:
+            self._remember(key, entry)
+            if not self.sqlite_path or status not in PERSISTED_STATUS_CODES:
+                return
+            try:
+                connection = self._get_connection()
+                connection.execute(
+                    "INSERT OR REPLACE INTO idempotency_keys (key, status, body, fingerprint, stored_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, status, body, fingerprint, entry[0])
+                )
+                self._writes += 1
+                if self._writes % _PRUNE_EVERY == 0:
+                    connection.execute("DELETE FROM idempotency_keys WHERE stored_at < ?",
+                                       (entry[0] - self.ttl_seconds,))
+                connection.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Error writing idempotency key to SQLite: {str(e)}")
+
+    def clear(self) -> None:
+        """Forget every stored response, including the persisted ones."""
+        with self._lock:
+            self._entries.clear()
+            if self.sqlite_path:
+                connection = self._get_connection()
+                connection.execute("DELETE FROM idempotency_keys")
+                connection.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the number of responses held in memory and whether SQLite is used."""
+        with self._lock:
+            return {"size": len(self._entries), "max_size": self.max_size, "sqlite": bool(self.sqlite_path)}
+
+
+# Singleton instance for easy import
+idempotency_store = IdempotencyStore()
+
+# Requests with the same key running at the same time
+_in_flight = SingleFlight()
+
+
+def _replay(status: int, body: str, replayed: bool) -> Response:
+    response = Response(body, status=status, mimetype="application/json")
+    if replayed:
+        response.headers[REPLAYED_HEADER] = "true"
+    return response
+
+
+def _digest(*parts: Any) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _request_fields() -> Dict[str, Any]:
+    """Return the fields of the request from its query string, form or JSON body."""
+    fields = request.args.to_dict()
+    if request.mimetype in ("multipart/form-data", "application/x-www-form-urlencoded"):
+        fields.update(request.form.to_dict())
+    else:
+        data = request.get_json(silent=True)
+        if isinstance(data, dict):
+            fields.update(data)
+    return fields
+
+
+def _request_scope() -> Tuple[str, str]:
+    """Return the organization and the caller a key belongs to."""
+    fields = _request_fields()
+    authorization = request.headers.get("Authorization")
+    if authorization:
+        caller = "auth:" + hashlib.sha256(authorization.encode("utf-8")).hexdigest()
+    else:
+        caller = f"user:{fields.get('user_id') or ''}"
+    return str(fields.get("organization_id") or ""), caller
+
+
+def _request_fingerprint() -> str:
+    """Return a digest identifying the request a key was first used for.
+
+    Raw CSV bodies are streamed to the parser, so they are identified by
+    their query string, type and length rather than read here. Uploaded
+    files are spooled by the form parser and are hashed in full.
+    """
+    query = sorted(request.args.items(multi=True))
+    if request.mimetype in ("multipart/form-data", "application/x-www-form-urlencoded"):
+        files = []
+        for name, upload in sorted(request.files.items(multi=True), key=lambda item: item[0]):
+            content = hashlib.sha256()
+            for chunk in iter(lambda: upload.stream.read(_HASH_CHUNK_SIZE), b""):
+                content.update(chunk)
+            upload.stream.seek(0)
+            files.append((name, upload.filename, content.hexdigest()))
+        return _digest(query, sorted(request.form.items(multi=True)), files)
+
+    if request.is_json:
+        data = request.get_json(silent=True)
+        return _digest(query, data if data is not None else request.get_data(as_text=True))
+
+    return _digest(query, request.mimetype, request.headers.get("Content-Encoding"), request.content_length)
+
+
+def _mismatch(key: str) -> Tuple[Response, int]:
+    return jsonify({
+        "status": "error",
+        "message": f"{IDEMPOTENCY_HEADER} {key} was already used for a different request"
+    }), 422
+
+
+def idempotent(view: Callable[..., Any]) -> Callable[..., Any]:
+    """Make a sync route replay its stored response for a repeated ``Idempotency-Key`` header.
+
+    Keys are scoped to the method, path, organization and caller (a hash of
+    the Authorization header, or the user ID without one), so the same key
+    sent to two endpoints or by two tenants refers to two different syncs.
+    A repeat whose request differs from the first gets 422. Requests without
+    the header are handled as before.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            return jsonify({
+                "status": "error",
+                "message": f"{IDEMPOTENCY_HEADER} must be at most {IDEMPOTENCY_KEY_MAX_LENGTH} characters"
+            }), 400
+
+        organization_id, caller = _request_scope()
+        scoped_key = _digest(request.method, request.path, organization_id, caller, key)
+        fingerprint = _request_fingerprint()
+        stored = idempotency_store.get(scoped_key)
+        if stored:
+            if stored[2] != fingerprint:
+                logger.warning(f"Rejected reuse of {IDEMPOTENCY_HEADER} {key} on {request.path} for a different request")
+                return _mismatch(key)
+            logger.info(f"Replaying stored response for {IDEMPOTENCY_HEADER} {key} on {request.path}")
+            return _replay(stored[0], stored[1], replayed=True)
+
+        def run() -> Tuple[int, str, str, bool]:
+            # A request that waited on another with the same key may find its response stored
+            stored = idempotency_store.get(scoped_key)
+            if stored:
+                return stored[0], stored[1], stored[2], True
+            response = make_response(view(*args, **kwargs))
+            body = response.get_data(as_text=True)
+            if response.status_code in STORED_STATUS_CODES:
+                idempotency_store.put(scoped_key, response.status_code, body, fingerprint)
+            return response.status_code, body, fingerprint, False
+
+        ran = []
+        status, body, first_fingerprint, replayed = _in_flight.do(scoped_key, lambda: ran.append(True) or run())
+        if first_fingerprint != fingerprint:
+            # Waited on a concurrent request that used the key for something else
+            return _mismatch(key)
+        # Callers that waited on the request that ran receive its response as a replay
+        return _replay(status, body, replayed=replayed or not ran)
+
+    return wrapper
@@ -7,11 +7,23 @@ import argparse
 from datetime import datetime
 import pandas as pd
 import requests
-from supabase import create_client, Client
+from supabase import Client
 from dotenv import load_dotenv
-from typing import Dict, List, Any, Optional, Union
+from typing import Callable, Dict, Iterable, Iterator, List, Any, Optional, Set, Tuple, Union
 import pathlib
 
+from supabase_client import get_supabase_client
+from merge_client import MERGE_EXPAND_RELATIONS, MergePage, expanded_id, iter_merge_pages, with_query_params
+from token_service import token_service
+from bulk_upsert import bulk_upsert, fetch_existing_ids, fetch_rows_by_id
+from id_cache import id_cache
+from metrics import RESOLVER_LOOKUP_SECONDS, TRANSFORM_SECONDS
+from csv_import import import_csv_in_chunks
+from csv_transforms import (
+    fill_missing, frame_to_records, key_column, optional_column, raw_column, text_column, time_column,
+    uuid5_column, with_id_column
+)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -29,23 +41,41 @@ logger.info(f"SUPABASE_KEY: {SUPABASE_KEY[:10]}...")  # Print only first 10 char
     
 INTERVIEWS_TABLE = "interviews"
 APPLICATIONS_TABLE = "applications"
+JOBS_TABLE = "jobs"
 MERGE_BASE_URL = "https://api.merge.dev/api/ats/v1"
 
+# Business fields hashed to detect interviews that have not changed since the last sync
+INTERVIEW_HASH_FIELDS = ["organization_id", "candidate_id", "job_id", "date", "time", "status", "notes", "calendar_event_id"]
+
+# CSV columns that ids are derived from, read as text so every chunk formats them the same way
+CSV_KEY_DTYPES = {column: str for column in ("id", "application_id", "interview_date", "interview_type")}
+
 # Valid interview type values
 VALID_INTERVIEW_TYPES = ["PHONE", "VIRTUAL", "ONSITE", "TECHNICAL", "BEHAVIORAL", "OTHER"]
 
 # Valid result values
 VALID_RESULTS = ["PASSED", "FAILED", "PENDING", "CANCELED", "NO_SHOW", "OTHER"]
 
+def _is_uuid(value: str) -> bool:
+    try:
+        uuid.UUID(str(value))
+        return True
+    except ValueError:
+        return False
+
 class InterviewsManager:
     """Manager for handling interviews data in Supabase."""
     
     def __init__(self):
-        """Initialize the InterviewsManager with Supabase client."""
+        """Initialize the InterviewsManager with the shared Supabase client."""
         if not SUPABASE_URL or not SUPABASE_KEY:
             raise ValueError("Missing Supabase configuration. Check your environment variables.")
             
-        self.supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+        # Borrow the worker's shared client instead of building a new one per request
+        self.supabase: Client = get_supabase_client(SUPABASE_URL, SUPABASE_KEY)
+        
+        # Resolved ids; a full-tenant sync swaps in one cache shared by every stage
+        self.id_cache = id_cache
         
     def check_table_exists(self) -> bool:
         """Check if the interviews table exists."""
@@ -81,7 +111,8 @@ class InterviewsManager:
                 calendar_event_id TEXT,
                 deleted_at TIMESTAMP WITH TIME ZONE,
                 deleted_by UUID,
-                restore_until TIMESTAMP WITH TIME ZONE
+                restore_until TIMESTAMP WITH TIME ZONE,
+                content_hash TEXT
             );
             """
             
@@ -105,47 +136,90 @@ class InterviewsManager:
             logger.error(f"Error creating table schema: {str(e)}")
             return False
     
-    def get_merge_token(self, test_mode=False) -> str:
+    def get_merge_token(self, test_mode=False, org_id: Optional[str] = None, refresh: bool = False) -> str:
         """Get a Merge token securely using Supabase functions.
         This eliminates the need to handle tokens directly in the client code.
         
         Args:
             test_mode: If True, return a dummy token for testing
+            org_id: The organization whose token the RPC returns; it is cached per
+                    organization and only fetched again once it expires
+            refresh: If True, drop the cached token first, e.g. after Merge rejected it
         """
         if test_mode:
             # For testing only - in production, always use the Supabase function
             logger.info("TEST MODE: Using dummy token")
             return "test_merge_token"
             
-        try:
+        def exchange():
             # Call the Supabase function that generates/exchanges Merge tokens
             response = self.supabase.rpc(
                 "get_merge_token",  # Replace with your actual function name
-                {}  # Add any parameters your function needs
+                {"organization_id": org_id}  # The organization whose Merge account token is returned
             ).execute()
             
             if not response.data:
                 raise ValueError("Failed to get Merge token: No data returned")
                 
             # The structure will depend on your function's return format
-            token = response.data.get("token")
-            if not token:
+            if not response.data.get("token"):
                 raise ValueError("Failed to get Merge token: No token in response")
                 
             logger.info("Successfully obtained Merge token")
-            return token
+            return response.data
+            
+        try:
+            if refresh:
+                token_service.invalidate(f"org:{org_id}")
+            return token_service.get_cached_token(f"org:{org_id}", exchange)
         except Exception as e:
             logger.error(f"Error getting Merge token: {str(e)}")
             raise
 
-    def fetch_merge_interviews(self, user_id: str, org_id: str, test_mode=False) -> List[Dict[str, Any]]:
+    def fetch_merge_interviews(self, user_id: str, org_id: str, test_mode=False, user_token: Optional[str] = None,
+                               modified_after: Optional[str] = None, expand: Optional[bool] = None) -> List[Dict[str, Any]]:
         """Fetch interviews from Merge.dev API using a secure token exchange.
         
         Args:
             user_id: The UUID of the user associated with this data
             org_id: The UUID of the organization associated with this data
             test_mode: If True, use a dummy token for testing
+            user_token: Optional user JWT or Merge account token from the request,
+                        exchanged through the token service instead of the RPC
+            modified_after: Optional ISO timestamp; only records modified after it are fetched
+            expand: Embed applications in each page (defaults to MERGE_EXPAND_RELATIONS)
+        """
+        interviews = []
+        for page in self.iter_merge_interviews(user_id, org_id, test_mode=test_mode, user_token=user_token,
+                                               modified_after=modified_after, expand=expand):
+            interviews.extend(page)
+        return interviews
+    
+    def iter_merge_interviews(self, user_id: str, org_id: str, test_mode=False, user_token: Optional[str] = None,
+                              modified_after: Optional[str] = None, cursor: Optional[str] = None,
+                              expand: Optional[bool] = None) -> Iterator[List[Dict[str, Any]]]:
+        """Yield transformed interviews from Merge.dev one page at a time.
+        
+        Each list holds one Merge page, so callers can write it before the next
+        page is consumed instead of holding the whole collection in memory.
+        Pages are MergePage lists whose ``next_url`` is the cursor of the page
+        after them.
+        
+        Args:
+            user_id: The UUID of the user associated with this data
+            org_id: The UUID of the organization associated with this data
+            test_mode: If True, use a dummy token for testing
+            user_token: Optional user JWT or Merge account token from the request,
+                        exchanged through the token service instead of the RPC
+            modified_after: Optional ISO timestamp; only records modified after it are fetched
+            cursor: Optional Merge page URL to resume from, e.g. a saved checkpoint
+            expand: If True, ask Merge to embed each interview's application,
+                    which is written when missing instead of looked up
+                    (defaults to MERGE_EXPAND_RELATIONS)
         """
+        if expand is None:
+            expand = MERGE_EXPAND_RELATIONS
+        
         # For test mode, return sample data without making API calls
         if test_mode:
             logger.info("TEST MODE: Using sample interview data")
@@ -187,11 +261,17 @@ class InterviewsManager:
                 transformed_interviews.append(interview_data)
                 
             logger.info(f"TEST MODE: Generated {len(transformed_interviews)} sample interviews")
-            return transformed_interviews
+            yield transformed_interviews
+            return
             
         # Normal mode - get a secure token from Supabase function and make API calls
         try:
-            account_token = self.get_merge_token(test_mode=test_mode)
+            def get_account_token(refresh: bool = False) -> str:
+                if user_token:
+                    return token_service.get_merge_token(user_token=user_token, refresh=refresh)
+                return self.get_merge_token(test_mode=test_mode, org_id=org_id, refresh=refresh)
+
+            account_token = get_account_token()
             
             if not MERGE_API_KEY:
                 raise ValueError("Missing Merge API Key. Check your environment variables.")
@@ -201,33 +281,50 @@ class InterviewsManager:
                 "X-Account-Token": account_token
             }
             
-            interviews = []
-            next_page_url = f"{MERGE_BASE_URL}/interviews"
+            fetched = 0
             
-            while next_page_url:
-                try:
-                    response = requests.get(next_page_url, headers=headers)
-                    response.raise_for_status()
-                    data = response.json()
-                    
-                    for interview in data.get("results", []):
-                        interview_data = self.transform_merge_interview(interview, user_id, org_id)
+            # Pages are downloaded in the background while the current one is transformed
+            url = cursor or with_query_params(f"{MERGE_BASE_URL}/interviews", {
+                "modified_after": modified_after,
+                "expand": "application" if expand else None
+            })
+            for data in iter_merge_pages(url, headers, label="interviews",
+                                         refresh_token=lambda: get_account_token(refresh=True)):
+                interviews = []
+                page = data.get("results", [])
+                
+                if expand:
+                    # Use the embedded applications, writing the ones we don't have yet
+                    page, resolved = self.resolve_expanded_applications(page, user_id, org_id)
+                else:
+                    # Resolve every application reference on the page in bulk
+                    resolved = self.resolve_page_applications(interview.get("application") for interview in page)
+                
+                with TRANSFORM_SECONDS.labels(entity="interviews", source="merge").time():
+                    for interview in page:
+                        interview_data = self.transform_merge_interview(interview, user_id, org_id, resolved=resolved)
                         if interview_data:  # Only add if transformed successfully
                             interviews.append(interview_data)
-                    
-                    next_page_url = data.get("next")
-                except requests.RequestException as e:
-                    logger.error(f"Error fetching interviews from Merge API: {str(e)}")
-                    break
-                    
-            logger.info(f"Fetched {len(interviews)} interviews from Merge API")
-            return interviews
+                fetched += len(interviews)
+                yield MergePage(interviews, next_url=data.get("next"))
+            
+            logger.info(f"Fetched {fetched} interviews from Merge API")
         except Exception as e:
-            logger.error(f"Error in fetch_merge_interviews: {str(e)}")
+            logger.error(f"Error in iter_merge_interviews: {str(e)}")
             raise
     
-    def transform_merge_interview(self, merge_data: Dict[str, Any], user_id: str, org_id: str) -> Dict[str, Any]:
-        """Transform interview data from Merge API to match our schema."""
+    def transform_merge_interview(self, merge_data: Dict[str, Any], user_id: str, org_id: str,
+                                  resolved: Optional[Dict[str, Optional[Dict[str, Any]]]] = None) -> Dict[str, Any]:
+        """Transform interview data from Merge API to match our schema.
+        
+        Args:
+            merge_data: The interview as returned by Merge
+            user_id: The UUID of the user associated with this data
+            org_id: The UUID of the organization associated with this data
+            resolved: Optional map from Merge application ID to application info for
+                      the page this interview belongs to. When omitted, the
+                      application is resolved on its own.
+        """
         # Generate a UUID from the Merge ID to ensure consistency
         merge_id = merge_data.get("id", "")
         interview_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, f"merge-interview-{merge_id}"))
@@ -236,7 +333,10 @@ class InterviewsManager:
         merge_application_id = merge_data.get("application", "")
         
         # Try to resolve application info to get candidate and job IDs
-        application_info = self.resolve_application_info(merge_application_id)
+        if resolved is not None:
+            application_info = resolved.get(merge_application_id)
+        else:
+            application_info = self.resolve_application_info(merge_application_id)
         candidate_id = application_info.get("candidate_id") if application_info else None
         job_id = application_info.get("job_id") if application_info else None
         
@@ -312,192 +412,257 @@ class InterviewsManager:
         """Resolve a Merge application ID to get candidate_id and job_id."""
         if not merge_application_id:
             return None
+        return self.resolve_page_applications([merge_application_id]).get(merge_application_id)
+    
+    def resolve_page_applications(self, merge_application_ids: Iterable[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Resolve the applications referenced by a whole page of Merge interviews.
+        
+        Instead of querying the application and then its job for every
+        interview, the page's applications are fetched with one ``in_`` query
+        and their jobs with a second. Rows in the id cache are not queried.
+        
+        Args:
+            merge_application_ids: Merge IDs of the referenced applications
             
-        try:
-            # Generate the deterministic UUID we use in our database
-            application_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, f"merge-app-{merge_application_id}"))
+        Returns:
+            Dict from Merge application ID to its candidate_id and job_id, or
+            None when the application is not in the database
+        """
+        # Generate the deterministic UUIDs we use in our database
+        application_ids = {merge_id: str(uuid.uuid5(uuid.NAMESPACE_DNS, f"merge-app-{merge_id}"))
+                           for merge_id in merge_application_ids if merge_id}
+        applications = self.fetch_applications(application_ids.values())
+        job_ids = self.resolve_job_ids(app.get("job_posting_id") for app in applications.values())
+        
+        resolved = {}
+        for merge_id, application_id in application_ids.items():
+            app = applications.get(application_id)
+            if not app:
+                logger.warning(f"Application with ID {application_id} (from Merge ID {merge_id}) not found in database")
+                resolved[merge_id] = None
+                continue
             
-            # Check if this application exists in our database
-            response = self.supabase.table(APPLICATIONS_TABLE) \
-                .select("candidate_id,job_posting_id") \
-                .eq("id", application_id) \
-                .execute()
-                
-            if response.data and len(response.data) > 0:
-                app = response.data[0]
-                
-                # Get job ID from job_postings table and map it to the jobs table if needed
-                job_posting_id = app.get("job_posting_id")
-                job_id = None
-                
-                if job_posting_id:
-                    # Try to find corresponding job ID in the jobs table
-                    try:
-                        # This is a guess - we don't know the exact relationship between job_postings and jobs
-                        # You might need to adjust this query based on your actual schema
-                        job_response = self.supabase.table("jobs") \
-                            .select("id") \
-                            .eq("id", job_posting_id) \
-                            .execute()
-                            
-                        if job_response.data and len(job_response.data) > 0:
-                            job_id = job_response.data[0]["id"]
-                        else:
-                            logger.warning(f"Job posting with ID {job_posting_id} not found in jobs table")
-                    except Exception as e:
-                        logger.error(f"Error finding job ID: {str(e)}")
-                
-                return {
-                    "candidate_id": app.get("candidate_id"),
-                    "job_id": job_id
+            # Map the job posting to the jobs table when it has a matching row
+            job_posting_id = app.get("job_posting_id")
+            if job_posting_id and job_posting_id not in job_ids:
+                logger.warning(f"Job posting with ID {job_posting_id} not found in jobs table")
+            resolved[merge_id] = {
+                "candidate_id": app.get("candidate_id"),
+                "job_id": job_posting_id if job_posting_id in job_ids else None
+            }
+        return resolved
+    
+    def resolve_expanded_applications(self, merge_interviews: List[Dict[str, Any]], user_id: str,
+                                      org_id: str) -> Tuple[List[Dict[str, Any]], Dict[str, Optional[Dict[str, Any]]]]:
+        """Resolve a page of interviews fetched with ``expand=application``.
+        
+        The embedded applications carry their candidate and job, so they are
+        transformed with the page's references resolved in bulk, and the ones
+        not in the id cache are upserted. Their jobs are then checked against
+        the jobs table in one batch. Interviews whose application Merge left as
+        a bare id go through resolve_page_applications.
+        
+        Returns:
+            Tuple of (the interviews with their application reduced to its Merge ID,
+            a map from Merge application ID to its candidate_id and job_id)
+        """
+        from applications_manager import ApplicationsManager
+        
+        embedded = {}
+        flattened = []
+        for interview in merge_interviews:
+            application = interview.get("application")
+            if isinstance(application, dict) and application.get("id"):
+                embedded[application["id"]] = {**application,
+                                               "candidate": expanded_id(application.get("candidate")),
+                                               "job": expanded_id(application.get("job"))}
+            flattened.append({**interview, "application": expanded_id(application)})
+        
+        resolved = {}
+        if embedded:
+            manager = ApplicationsManager()
+            manager.id_cache = self.id_cache
+            references = manager.resolve_page_references(list(embedded.values()))
+            records = {merge_id: manager.transform_merge_application(application, user_id, org_id, resolved=references)
+                       for merge_id, application in embedded.items()}
+            
+            _, missing = self.id_cache.lookup_many(APPLICATIONS_TABLE, (record["id"] for record in records.values()))
+            if missing:
+                missing = set(missing)
+                manager.upsert_applications([record for record in records.values() if record["id"] in missing])
+            
+            job_ids = self.resolve_job_ids(record["job_posting_id"] for record in records.values())
+            for merge_id, record in records.items():
+                resolved[merge_id] = {
+                    "candidate_id": record["candidate_id"],
+                    "job_id": record["job_posting_id"] if record["job_posting_id"] in job_ids else None
                 }
-            else:
-                logger.warning(f"Application with ID {application_id} (from Merge ID {merge_application_id}) not found in database")
-                return None
-        except Exception as e:
-            logger.error(f"Error resolving application info: {str(e)}")
-            return None
+        
+        bare = {interview.get("application") for interview in flattened} - set(resolved)
+        if bare - {None, ""}:
+            resolved.update(self.resolve_page_applications(bare))
+        
+        return flattened, resolved
     
-    def upsert_interviews(self, interviews: List[Dict[str, Any]]) -> Dict[str, int]:
-        """Insert or update interviews in Supabase."""
+    def resolve_job_ids(self, job_posting_ids: Iterable[Optional[str]]) -> Set[str]:
+        """Return which job posting ids also exist in the jobs table, with batched ``in_`` queries."""
+        cached, missing = self.id_cache.lookup_many(JOBS_TABLE, {job_id for job_id in job_posting_ids if job_id})
+        existing = set(cached)
+        if missing:
+            try:
+                with RESOLVER_LOOKUP_SECONDS.labels(entity=JOBS_TABLE).time():
+                    found = fetch_existing_ids(self.supabase, JOBS_TABLE, missing)
+                self.id_cache.set_many(JOBS_TABLE, found)
+                existing.update(found)
+            except Exception as e:
+                logger.error(f"Error finding job IDs: {str(e)}")
+        return existing
+    
+    def upsert_interviews(self, interviews: List[Dict[str, Any]], batch_size: Optional[int] = None) -> Dict[str, int]:
+        """Insert or update interviews in Supabase using batched upserts."""
         if not interviews:
             logger.info("No interviews to upsert")
-            return {"inserted": 0, "updated": 0}
-            
-        inserted = 0
-        updated = 0
+            return {"inserted": 0, "updated": 0, "unchanged": 0}
         
         for interview in interviews:
+            # Generate ID if not provided
+            if not interview.get("id"):
+                interview["id"] = str(uuid.uuid4())
+        
+        def prepare(interview: Dict[str, Any], exists: bool) -> None:
+            if exists:
+                return
+            now = datetime.now().isoformat()
+            if not interview.get("date"):
+                interview["date"] = now
+            if not interview.get("created_at"):
+                interview["created_at"] = now
+        
+        results = bulk_upsert(
+            self.supabase,
+            INTERVIEWS_TABLE,
+            interviews,
+            batch_size=batch_size,
+            prepare=prepare,
+            cache=self.id_cache,
+            hash_fields=INTERVIEW_HASH_FIELDS
+        )
+        
+        logger.info(f"Upsert complete. Inserted: {results['inserted']}, Updated: {results['updated']}, "
+                    f"Unchanged: {results['unchanged']}")
+        return results
+    
+    def transform_csv_frame(self, df: pd.DataFrame, user_id: str, org_id: str) -> List[Dict[str, Any]]:
+        """Transform a frame of CSV rows into interview records, column by column."""
+        now = datetime.now().isoformat()
+        
+        # Resolve candidate_id from the applications of the whole chunk at once
+        application_ids = optional_column(df, "application_id")
+        candidate_ids = self.resolve_application_candidates(application_ids.dropna().unique())
+        
+        # Get interview type and result
+        interview_types = text_column(df, "interview_type").str.upper()
+        results = text_column(df, "result").str.upper()
+        
+        # Compile notes from feedback, interviewer and interview type
+        interviewers = text_column(df, "interviewer")
+        notes = text_column(df, "feedback")
+        notes = notes + ("\nInterviewer: " + interviewers).where(interviewers != "", "")
+        notes = notes + ("\nType: " + interview_types).where(interview_types != "", "")
+        
+        # Create a deterministic UUID based on application and interview date
+        unique_ids = key_column(df, "application_id") + "-" + key_column(df, "interview_date") + "-" + interview_types
+        interview_ids = with_id_column(df, uuid5_column("csv-interview-", unique_ids))
+        
+        # Transform to match our schema - include job_id from CSV
+        frame = pd.DataFrame({
+            "id": interview_ids,
+            "organization_id": org_id,
+            "created_by": user_id,  # User who initiated the import
+            "job_id": optional_column(df, "job_id"),  # Use job_id directly from CSV
+            "date": optional_column(df, "interview_date"),  # Store the full datetime in the date field
+            "time": time_column(raw_column(df, "interview_date")),
+            "status": results,  # Use result as status
+            "notes": notes,
+            "created_at": fill_missing(df, "remote_created_at", now)
+        }, index=df.index)
+        interviews = frame_to_records(frame)
+        
+        # Only add candidate_id if it exists to avoid FK constraint errors
+        for interview, application_id in zip(interviews, application_ids):
+            candidate_id = candidate_ids.get(application_id)
+            if candidate_id:
+                interview["candidate_id"] = candidate_id
+        
+        return interviews
+    
+    def resolve_application_candidates(self, application_ids: Iterable[str]) -> Dict[str, Optional[str]]:
+        """Map application ids to their candidate ids with batched ``in_`` queries.
+        
+        Args:
+            application_ids: Our database ids of the applications
+            
+        Returns:
+            Dict from application id to candidate id, for the applications that exist
+        """
+        return {app_id: app.get("candidate_id") for app_id, app in self.fetch_applications(application_ids).items()}
+    
+    def fetch_applications(self, application_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Fetch the candidate and job posting references of applications in bulk.
+        
+        Applications already in the id cache are not queried again, and the rest
+        are fetched LOOKUP_CHUNK_SIZE at a time instead of one query per id.
+        
+        Args:
+            application_ids: Our database ids of the applications
+            
+        Returns:
+            Dict from application id to its candidate_id and job_posting_id, for
+            the applications that exist
+        """
+        cached, missing = self.id_cache.lookup_many(APPLICATIONS_TABLE, (str(app_id) for app_id in application_ids))
+        # Entries recorded without their references still need a lookup
+        missing += [app_id for app_id, app in cached.items() if not isinstance(app, dict)]
+        applications = {app_id: app for app_id, app in cached.items() if isinstance(app, dict)}
+        
+        # Ids that are not UUIDs can never match and would fail the whole query
+        lookup_ids = [app_id for app_id in missing if _is_uuid(app_id)]
+        if lookup_ids:
             try:
-                # Check if the interview already exists by ID
-                existing_response = self.supabase.table(INTERVIEWS_TABLE) \
-                    .select("id") \
-                    .eq("id", interview["id"]) \
-                    .execute()
-                
-                existing = existing_response.data
-                
-                if existing and len(existing) > 0:
-                    # Update existing record
-                    
-                    # Log the update
-                    logger.info(f"Updating interview {interview['id']} (Status: {interview['status']})")
-                    
-                    self.supabase.table(INTERVIEWS_TABLE) \
-                        .update(interview) \
-                        .eq("id", interview["id"]) \
-                        .execute()
-                    updated += 1
-                else:
-                    # Insert new record
-                    if not interview.get("date"):
-                        interview["date"] = datetime.now().isoformat()
-                    if not interview.get("created_at"):
-                        interview["created_at"] = datetime.now().isoformat()
-                    
-                    # Generate ID if not provided
-                    if not interview.get("id"):
-                        interview["id"] = str(uuid.uuid4())
-                    
-                    # Log the insert
-                    logger.info(f"Inserting new interview {interview['id']} (Status: {interview['status']})")
-                    
-                    self.supabase.table(INTERVIEWS_TABLE) \
-                        .insert(interview) \
-                        .execute()
-                    inserted += 1
+                with RESOLVER_LOOKUP_SECONDS.labels(entity=APPLICATIONS_TABLE).time():
+                    rows = fetch_rows_by_id(self.supabase, APPLICATIONS_TABLE, lookup_ids,
+                                            ["candidate_id", "job_posting_id"])
             except Exception as e:
-                logger.error(f"Error upserting interview {interview.get('id')}: {str(e)}")
+                logger.warning(f"Error resolving {len(lookup_ids)} applications: {str(e)}")
+                rows = {}
+            for app_id, row in rows.items():
+                app = {"candidate_id": row.get("candidate_id"), "job_posting_id": row.get("job_posting_id")}
+                self.id_cache.set(APPLICATIONS_TABLE, app_id, app)
+                applications[app_id] = app
         
-        logger.info(f"Upsert complete. Inserted: {inserted}, Updated: {updated}")
-        return {"inserted": inserted, "updated": updated}
+        return applications
     
-    def import_from_csv(self, csv_path: str, user_id: str, org_id: str) -> Dict[str, int]:
-        """Import interviews from a CSV file."""
+    def import_from_csv(self, csv_path: str, user_id: str, org_id: str, chunk_size: Optional[int] = None,
+                        progress: Optional[Callable[..., None]] = None) -> Dict[str, int]:
+        """Import interviews from a CSV file, one chunk of rows at a time.
+        
+        Args:
+            csv_path: Path or file-like object to read the CSV from
+            user_id: The UUID of the user associated with this data
+            org_id: The UUID of the organization associated with this data
+            chunk_size: Rows transformed and upserted at a time (defaults to CSV_CHUNK_SIZE)
+            progress: Optional callback receiving progress counters per chunk
+        """
         try:
-            df = pd.read_csv(csv_path)
-            logger.info(f"Loaded CSV with {len(df)} rows")
-            
-            # Transform data to match our schema
-            interviews = []
-            for _, row in df.iterrows():
-                row_dict = row.to_dict()
-                
-                # Get required fields from CSV
-                application_id = row_dict.get("application_id")
-                
-                # Get job_id directly from CSV if available
-                job_id = row_dict.get("job_id")
-                
-                # Try to resolve candidate_id from application if available
-                candidate_id = None
-                
-                # Check if the application exists in our database
-                if application_id:
-                    try:
-                        response = self.supabase.table(APPLICATIONS_TABLE) \
-                            .select("candidate_id") \
-                            .eq("id", application_id) \
-                            .execute()
-                            
-                        if response.data and len(response.data) > 0:
-                            app = response.data[0]
-                            candidate_id = app.get("candidate_id")
-                    except Exception as e:
-                        logger.warning(f"Error resolving application {application_id}: {str(e)}")
-                
-                # Get interview date and time
-                interview_datetime = row_dict.get("interview_date")
-                date = interview_datetime  # Store the full datetime in the date field
-                
-                # For time, extract the time portion or leave as None
-                time = None
-                if interview_datetime:
-                    try:
-                        dt = datetime.fromisoformat(interview_datetime.replace('Z', '+00:00'))
-                        time = dt.strftime("%H:%M")  # Format as HH:MM
-                    except Exception as e:
-                        logger.warning(f"Error parsing interview datetime: {str(e)}")
-                
-                # Get interviewer and add to notes
-                interviewer = row_dict.get("interviewer", "")
-                
-                # Get interview type and result
-                interview_type = row_dict.get("interview_type", "").upper()
-                result = row_dict.get("result", "").upper()
-                
-                # Compile notes
-                notes = row_dict.get("feedback", "")
-                if interviewer:
-                    notes += f"\nInterviewer: {interviewer}"
-                if interview_type:
-                    notes += f"\nType: {interview_type}"
-                
-                # Create a deterministic UUID based on application and interview date
-                unique_id = f"{application_id}-{interview_datetime}-{interview_type}"
-                interview_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, f"csv-interview-{unique_id}")) if unique_id else str(uuid.uuid4())
-                
-                # Transform to match our schema - include job_id from CSV
-                interview_data = {
-                    "id": row_dict.get("id", interview_id),
-                    "organization_id": org_id,
-                    "created_by": user_id,  # User who initiated the import
-                    "job_id": job_id,  # Use job_id directly from CSV
-                    "date": date,
-                    "time": time,
-                    "status": result,  # Use result as status
-                    "notes": notes,
-                    "created_at": row_dict.get("remote_created_at", datetime.now().isoformat())
-                }
-                
-                # Only add candidate_id if it exists to avoid FK constraint errors
-                if candidate_id:
-                    interview_data["candidate_id"] = candidate_id
-                
-                interviews.append(interview_data)
-            
-            # Upsert interviews
-            return self.upsert_interviews(interviews)
+            return import_csv_in_chunks(
+                csv_path,
+                lambda df: self.transform_csv_frame(df, user_id, org_id),
+                self.upsert_interviews,
+                entity="interviews",
+                chunk_size=chunk_size,
+                progress=progress,
+                dtype=CSV_KEY_DTYPES
+            )
         except Exception as e:
             logger.error(f"Error importing from CSV: {str(e)}")
             raise
@@ -7,11 +7,20 @@ import argparse
 from datetime import datetime
 import pandas as pd
 import requests
-from supabase import create_client, Client
+from supabase import Client
 from dotenv import load_dotenv
-from typing import Dict, List, Any, Optional, Union
+from typing import Callable, Dict, Iterator, List, Any, Optional, Union
 import pathlib
 
+from supabase_client import get_supabase_client
+from merge_client import MergePage, iter_merge_pages, with_query_params
+from token_service import token_service
+from bulk_upsert import bulk_upsert
+from id_cache import id_cache
+from metrics import TRANSFORM_SECONDS
+from csv_import import import_csv_in_chunks
+from csv_transforms import bool_column, fill_missing, frame_to_records, key_column, text_column, uuid5_column, with_id_column
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -30,15 +39,28 @@ logger.info(f"SUPABASE_KEY: {SUPABASE_KEY[:10]}...")  # Print only first 10 char
 JOB_POSTINGS_TABLE = "job_postings"
 MERGE_BASE_URL = "https://api.merge.dev/api/ats/v1"
 
+# Business fields hashed to detect job postings that have not changed since the last sync
+JOB_POSTING_HASH_FIELDS = [
+    "organization_id", "name", "description", "requirements", "responsibilities", "job_posting_url", "code",
+    "location", "remote", "status", "hiring_manager"
+]
+
+# CSV columns that ids are derived from, read as text so every chunk formats them the same way
+CSV_KEY_DTYPES = {column: str for column in ("id", "name", "code")}
+
 class JobPostingsManager:
     """Manager for handling job postings data in Supabase."""
     
     def __init__(self):
-        """Initialize the JobPostingsManager with Supabase client."""
+        """Initialize the JobPostingsManager with the shared Supabase client."""
         if not SUPABASE_URL or not SUPABASE_KEY:
             raise ValueError("Missing Supabase configuration. Check your environment variables.")
             
-        self.supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+        # Borrow the worker's shared client instead of building a new one per request
+        self.supabase: Client = get_supabase_client(SUPABASE_URL, SUPABASE_KEY)
+        
+        # Resolved ids; a full-tenant sync swaps in one cache shared by every stage
+        self.id_cache = id_cache
         
     def check_table_exists(self) -> bool:
         """Check if the job_postings table exists."""
@@ -76,7 +98,8 @@ class JobPostingsManager:
                 status TEXT,
                 hiring_manager TEXT,
                 created_at TIMESTAMP WITH TIME ZONE,
-                updated_at TIMESTAMP WITH TIME ZONE
+                updated_at TIMESTAMP WITH TIME ZONE,
+                content_hash TEXT
             );
             """
             
@@ -100,46 +123,81 @@ class JobPostingsManager:
             logger.error(f"Error creating table schema: {str(e)}")
             return False
     
-    def get_merge_token(self, test_mode=False) -> str:
+    def get_merge_token(self, test_mode=False, org_id: Optional[str] = None, refresh: bool = False) -> str:
         """Get a Merge token securely using Supabase functions.
         This eliminates the need to handle tokens directly in the client code.
         
         Args:
             test_mode: If True, return a dummy token for testing
+            org_id: The organization whose token the RPC returns; it is cached per
+                    organization and only fetched again once it expires
+            refresh: If True, drop the cached token first, e.g. after Merge rejected it
         """
         if test_mode:
             # For testing only - in production, always use the Supabase function
             logger.info("TEST MODE: Using dummy token")
             return "test_merge_token"
             
-        try:
+        def exchange():
             # Call the Supabase function that generates/exchanges Merge tokens
             response = self.supabase.rpc(
                 "get_merge_token",  # Replace with your actual function name
-                {}  # Add any parameters your function needs
+                {"organization_id": org_id}  # The organization whose Merge account token is returned
             ).execute()
             
             if not response.data:
                 raise ValueError("Failed to get Merge token: No data returned")
                 
             # The structure will depend on your function's return format
-            token = response.data.get("token")
-            if not token:
+            if not response.data.get("token"):
                 raise ValueError("Failed to get Merge token: No token in response")
                 
             logger.info("Successfully obtained Merge token")
-            return token
+            return response.data
+            
+        try:
+            if refresh:
+                token_service.invalidate(f"org:{org_id}")
+            return token_service.get_cached_token(f"org:{org_id}", exchange)
         except Exception as e:
             logger.error(f"Error getting Merge token: {str(e)}")
             raise
 
-    def fetch_merge_job_postings(self, user_id: str, org_id: str, test_mode=False) -> List[Dict[str, Any]]:
+    def fetch_merge_job_postings(self, user_id: str, org_id: str, test_mode=False, user_token: Optional[str] = None,
+                                 modified_after: Optional[str] = None) -> List[Dict[str, Any]]:
         """Fetch job postings from Merge.dev API using a secure token exchange.
         
         Args:
             user_id: The UUID of the user associated with this data
             org_id: The UUID of the organization associated with this data
             test_mode: If True, use a dummy token for testing
+            user_token: Optional user JWT or Merge account token from the request,
+                        exchanged through the token service instead of the RPC
+            modified_after: Optional ISO timestamp; only records modified after it are fetched
+        """
+        job_postings = []
+        for page in self.iter_merge_job_postings(user_id, org_id, test_mode=test_mode, user_token=user_token,
+                                                 modified_after=modified_after):
+            job_postings.extend(page)
+        return job_postings
+    
+    def iter_merge_job_postings(self, user_id: str, org_id: str, test_mode=False, user_token: Optional[str] = None,
+                                modified_after: Optional[str] = None, cursor: Optional[str] = None) -> Iterator[List[Dict[str, Any]]]:
+        """Yield transformed job postings from Merge.dev one page at a time.
+        
+        Each list holds one Merge page, so callers can write it before the next
+        page is consumed instead of holding the whole collection in memory.
+        Pages are MergePage lists whose ``next_url`` is the cursor of the page
+        after them.
+        
+        Args:
+            user_id: The UUID of the user associated with this data
+            org_id: The UUID of the organization associated with this data
+            test_mode: If True, use a dummy token for testing
+            user_token: Optional user JWT or Merge account token from the request,
+                        exchanged through the token service instead of the RPC
+            modified_after: Optional ISO timestamp; only records modified after it are fetched
+            cursor: Optional Merge page URL to resume from, e.g. a saved checkpoint
         """
         # For test mode, return sample data without making API calls
         if test_mode:
@@ -183,11 +241,17 @@ class JobPostingsManager:
                 transformed_job_postings.append(job_posting_data)
                 
             logger.info(f"TEST MODE: Generated {len(transformed_job_postings)} sample job postings")
-            return transformed_job_postings
+            yield transformed_job_postings
+            return
             
         # Normal mode - get a secure token from Supabase function and make API calls
         try:
-            account_token = self.get_merge_token(test_mode=test_mode)
+            def get_account_token(refresh: bool = False) -> str:
+                if user_token:
+                    return token_service.get_merge_token(user_token=user_token, refresh=refresh)
+                return self.get_merge_token(test_mode=test_mode, org_id=org_id, refresh=refresh)
+
+            account_token = get_account_token()
             
             if not MERGE_API_KEY:
                 raise ValueError("Missing Merge API Key. Check your environment variables.")
@@ -197,28 +261,23 @@ class JobPostingsManager:
                 "X-Account-Token": account_token
             }
             
-            job_postings = []
-            next_page_url = f"{MERGE_BASE_URL}/job-postings"
+            fetched = 0
             
-            while next_page_url:
-                try:
-                    response = requests.get(next_page_url, headers=headers)
-                    response.raise_for_status()
-                    data = response.json()
-                    
+            # Pages are downloaded in the background while the current one is transformed
+            url = cursor or with_query_params(f"{MERGE_BASE_URL}/job-postings", {"modified_after": modified_after})
+            for data in iter_merge_pages(url, headers, label="job postings",
+                                         refresh_token=lambda: get_account_token(refresh=True)):
+                job_postings = []
+                with TRANSFORM_SECONDS.labels(entity="job_postings", source="merge").time():
                     for job_posting in data.get("results", []):
                         job_posting_data = self.transform_merge_job_posting(job_posting, user_id, org_id)
                         job_postings.append(job_posting_data)
-                    
-                    next_page_url = data.get("next")
-                except requests.RequestException as e:
-                    logger.error(f"Error fetching job postings from Merge API: {str(e)}")
-                    break
-                    
-            logger.info(f"Fetched {len(job_postings)} job postings from Merge API")
-            return job_postings
+                fetched += len(job_postings)
+                yield MergePage(job_postings, next_url=data.get("next"))
+            
+            logger.info(f"Fetched {fetched} job postings from Merge API")
         except Exception as e:
-            logger.error(f"Error in fetch_merge_job_postings: {str(e)}")
+            logger.error(f"Error in iter_merge_job_postings: {str(e)}")
             raise
     
     def transform_merge_job_posting(self, merge_data: Dict[str, Any], user_id: str, org_id: str) -> Dict[str, Any]:
@@ -263,115 +322,92 @@ class JobPostingsManager:
             "updated_at": updated_at
         }
     
-    def upsert_job_postings(self, job_postings: List[Dict[str, Any]]) -> Dict[str, int]:
-        """Insert or update job postings in Supabase."""
+    def upsert_job_postings(self, job_postings: List[Dict[str, Any]], batch_size: Optional[int] = None) -> Dict[str, int]:
+        """Insert or update job postings in Supabase using batched upserts."""
         if not job_postings:
             logger.info("No job postings to upsert")
-            return {"inserted": 0, "updated": 0}
-            
-        inserted = 0
-        updated = 0
+            return {"inserted": 0, "updated": 0, "unchanged": 0}
         
         for job_posting in job_postings:
-            try:
-                # Check if the job posting already exists by ID
-                existing_response = self.supabase.table(JOB_POSTINGS_TABLE) \
-                    .select("id") \
-                    .eq("id", job_posting["id"]) \
-                    .execute()
-                
-                existing = existing_response.data
-                
-                if existing and len(existing) > 0:
-                    # Update existing record
-                    job_posting["updated_at"] = datetime.now().isoformat()
-                    
-                    # Log the update
-                    job_title = job_posting.get("name", "")
-                    logger.info(f"Updating job posting {job_posting['id']} ({job_title})")
-                    
-                    self.supabase.table(JOB_POSTINGS_TABLE) \
-                        .update(job_posting) \
-                        .eq("id", job_posting["id"]) \
-                        .execute()
-                    updated += 1
-                else:
-                    # Insert new record
-                    if not job_posting.get("created_at"):
-                        job_posting["created_at"] = datetime.now().isoformat()
-                    if not job_posting.get("updated_at"):
-                        job_posting["updated_at"] = datetime.now().isoformat()
-                    
-                    # Generate ID if not provided
-                    if not job_posting.get("id"):
-                        job_posting["id"] = str(uuid.uuid4())
-                    
-                    # Log the insert
-                    job_title = job_posting.get("name", "")
-                    logger.info(f"Inserting new job posting {job_posting['id']} ({job_title})")
-                    
-                    self.supabase.table(JOB_POSTINGS_TABLE) \
-                        .insert(job_posting) \
-                        .execute()
-                    inserted += 1
-            except Exception as e:
-                logger.error(f"Error upserting job posting {job_posting.get('id')}: {str(e)}")
+            # Generate ID if not provided
+            if not job_posting.get("id"):
+                job_posting["id"] = str(uuid.uuid4())
+        
+        def prepare(job_posting: Dict[str, Any], exists: bool) -> None:
+            now = datetime.now().isoformat()
+            if exists:
+                job_posting["updated_at"] = now
+            else:
+                if not job_posting.get("created_at"):
+                    job_posting["created_at"] = now
+                if not job_posting.get("updated_at"):
+                    job_posting["updated_at"] = now
+        
+        results = bulk_upsert(
+            self.supabase,
+            JOB_POSTINGS_TABLE,
+            job_postings,
+            batch_size=batch_size,
+            prepare=prepare,
+            cache=self.id_cache,
+            hash_fields=JOB_POSTING_HASH_FIELDS
+        )
         
-        logger.info(f"Upsert complete. Inserted: {inserted}, Updated: {updated}")
-        return {"inserted": inserted, "updated": updated}
+        logger.info(f"Upsert complete. Inserted: {results['inserted']}, Updated: {results['updated']}, "
+                    f"Unchanged: {results['unchanged']}")
+        return results
     
-    def import_from_csv(self, csv_path: str, user_id: str, org_id: str) -> Dict[str, int]:
-        """Import job postings from a CSV file."""
+    def transform_csv_frame(self, df: pd.DataFrame, user_id: str, org_id: str) -> List[Dict[str, Any]]:
+        """Transform a frame of CSV rows into job posting records, column by column."""
+        now = datetime.now().isoformat()
+        
+        # Create a deterministic UUID based on name and code
+        unique_ids = key_column(df, "name", "") + "-" + key_column(df, "code", "")
+        job_posting_ids = with_id_column(df, uuid5_column("csv-job-", unique_ids))
+        
+        # Transform to match our schema
+        frame = pd.DataFrame({
+            "id": job_posting_ids,
+            "organization_id": org_id,
+            "user_id": user_id,
+            "created_by": user_id,  # User who initiated the import
+            "name": text_column(df, "name"),
+            "description": text_column(df, "description"),
+            "requirements": text_column(df, "requirements"),
+            "responsibilities": text_column(df, "responsibilities"),
+            "job_posting_url": text_column(df, "job_posting_url"),
+            "code": text_column(df, "code"),
+            "location": text_column(df, "location"),
+            "remote": bool_column(df, "remote"),
+            "status": fill_missing(df, "status", "OPEN"),
+            "hiring_manager": text_column(df, "hiring_manager"),
+            "created_at": fill_missing(df, "created_at", now),
+            "updated_at": fill_missing(df, "updated_at", now)
+        }, index=df.index)
+        return frame_to_records(frame)
+    
+    def import_from_csv(self, csv_path: str, user_id: str, org_id: str, chunk_size: Optional[int] = None,
+                        progress: Optional[Callable[..., None]] = None) -> Dict[str, int]:
+        """Import job postings from a CSV file, one chunk of rows at a time.
+        
+        Args:
+            csv_path: Path or file-like object to read the CSV from
+            user_id: The UUID of the user associated with this data
+            org_id: The UUID of the organization associated with this data
+            chunk_size: Rows transformed and upserted at a time (defaults to CSV_CHUNK_SIZE)
+            progress: Optional callback receiving progress counters per chunk
+        """
         try:
-            df = pd.read_csv(csv_path)
-            logger.info(f"Loaded CSV with {len(df)} rows")
-            
-            # Validate required columns
-            required_cols = ["name"]
-            missing_cols = [col for col in required_cols if col not in df.columns]
-            if missing_cols:
-                raise ValueError(f"Missing required columns in CSV: {', '.join(missing_cols)}")
-            
-            # Transform data to match our schema
-            job_postings = []
-            for _, row in df.iterrows():
-                row_dict = row.to_dict()
-                name = row_dict.get("name", "")
-                
-                # Create a deterministic UUID based on name and code
-                code = row_dict.get("code", "")
-                unique_id = f"{name}-{code}"
-                job_posting_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, f"csv-job-{unique_id}")) if unique_id else str(uuid.uuid4())
-                
-                # Parse boolean values
-                remote = row_dict.get("remote", False)
-                if isinstance(remote, str):
-                    remote = remote.lower() in ["true", "yes", "1", "y"]
-                
-                # Transform to match our schema
-                job_posting = {
-                    "id": row_dict.get("id", job_posting_id),
-                    "organization_id": org_id,
-                    "user_id": user_id,
-                    "created_by": user_id,  # User who initiated the import
-                    "name": name,
-                    "description": row_dict.get("description", ""),
-                    "requirements": row_dict.get("requirements", ""),
-                    "responsibilities": row_dict.get("responsibilities", ""),
-                    "job_posting_url": row_dict.get("job_posting_url", ""),
-                    "code": code,
-                    "location": row_dict.get("location", ""),
-                    "remote": remote,
-                    "status": row_dict.get("status", "OPEN"),
-                    "hiring_manager": row_dict.get("hiring_manager", ""),
-                    "created_at": row_dict.get("created_at", datetime.now().isoformat()),
-                    "updated_at": row_dict.get("updated_at", datetime.now().isoformat())
-                }
-                
-                job_postings.append(job_posting)
-            
-            # Upsert job postings
-            return self.upsert_job_postings(job_postings)
+            return import_csv_in_chunks(
+                csv_path,
+                lambda df: self.transform_csv_frame(df, user_id, org_id),
+                self.upsert_job_postings,
+                entity="job_postings",
+                required_cols=["name"],
+                chunk_size=chunk_size,
+                progress=progress,
+                dtype=CSV_KEY_DTYPES
+            )
         except Exception as e:
             logger.error(f"Error importing from CSV: {str(e)}")
             raise
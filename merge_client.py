@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Helpers for reading paginated collections from the Merge ATS API.
+
+Merge paginates with ``next`` cursors, so page N+1 can only be requested once
+page N has arrived. ``iter_merge_pages`` downloads pages on a background
+thread and hands them to the caller through a bounded queue, which lets the
+next page download while the current one is being transformed.
+
+Every request draws from a token bucket shared by the worker's threads and
+is retried with exponential backoff and jitter on 429s, transient 5xx
+responses and connection errors, honouring ``Retry-After`` and Merge's
+rate-limit headers in full. Retries repeat the failed page's cursor, so a
+sync never restarts from the first page or silently ends early. A page whose
+requested wait exceeds MERGE_RETRY_AFTER_MAX_SECONDS fails at once with the
+cursor to resume from, instead of holding a worker thread for that long.
+"""
+
+import os
+import time
+import queue
+import random
+import logging
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Iterator, Optional
+from urllib.parse import urlencode
+
+import requests
+
+from http_client import get_session
+from metrics import MERGE_PAGE_FETCH_SECONDS
+from rate_limiter import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+MERGE_BASE_URL = "https://api.merge.dev/api/ats/v1"
+
+# Maximum number of pages downloaded ahead of the consumer (0 disables prefetching)
+MERGE_PREFETCH_DEPTH = int(os.environ.get("MERGE_PREFETCH_DEPTH", "2"))
+
+# Sustained Merge requests per second per worker process, and the allowed burst
+MERGE_RATE_LIMIT_PER_SECOND = float(os.environ.get("MERGE_RATE_LIMIT_PER_SECOND", "5"))
+MERGE_RATE_LIMIT_BURST = float(os.environ.get("MERGE_RATE_LIMIT_BURST", "10"))
+
+# Attempts per page after the first one, and the backoff bounds in seconds
+MERGE_MAX_RETRIES = int(os.environ.get("MERGE_MAX_RETRIES", "5"))
+MERGE_BACKOFF_BASE_SECONDS = float(os.environ.get("MERGE_BACKOFF_BASE_SECONDS", "1"))
+MERGE_BACKOFF_MAX_SECONDS = float(os.environ.get("MERGE_BACKOFF_MAX_SECONDS", "60"))
+
+# Longest Retry-After or rate-limit reset waited out before the page fails with its resume cursor
+MERGE_RETRY_AFTER_MAX_SECONDS = float(os.environ.get("MERGE_RETRY_AFTER_MAX_SECONDS", "900"))
+
+# Ask Merge to embed related objects (``expand``) instead of resolving bare ids against Supabase
+MERGE_EXPAND_RELATIONS = os.environ.get("MERGE_EXPAND_RELATIONS", "false").lower() in ("true", "1", "yes")
+
+# Seconds before a single request is abandoned
+MERGE_REQUEST_TIMEOUT = float(os.environ.get("MERGE_REQUEST_TIMEOUT", "30"))
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Seconds the producer waits between checks for a cancelled consumer
+_PUT_POLL_SECONDS = 0.5
+
+_DONE = object()
+
+
+class MergeAPIError(Exception):
+    """Raised when a page cannot be fetched, so callers never mistake a partial read for a full one."""
+
+    def __init__(self, message: str, resume_url: Optional[str] = None, status_code: Optional[int] = None):
+        super().__init__(message)
+        # URL of the page that failed; fetching it again resumes the collection
+        self.resume_url = resume_url
+        # HTTP status Merge answered with, or None if no response was received
+        self.status_code = status_code
+
+    @property
+    def retryable(self) -> bool:
+        """Whether fetching the same page again later may succeed."""
+        return self.status_code is None or self.status_code in RETRY_STATUS_CODES
+
+
+class MergePage(list):
+    """A page of transformed records that remembers the cursor of the next page."""
+
+    def __init__(self, records=(), next_url: Optional[str] = None):
+        super().__init__(records)
+        self.next_url = next_url
+
+
+_limiter: Optional[TokenBucket] = None
+_limiter_pid: Optional[int] = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> TokenBucket:
+    """Return the Merge token bucket shared by every thread in this process."""
+    global _limiter, _limiter_pid
+
+    pid = os.getpid()
+    if _limiter is None or _limiter_pid != pid:
+        with _limiter_lock:
+            if _limiter is None or _limiter_pid != pid:
+                _limiter = TokenBucket(MERGE_RATE_LIMIT_PER_SECOND, MERGE_RATE_LIMIT_BURST)
+                _limiter_pid = pid
+    return _limiter
+
+
+def _header_seconds(value: Optional[str]) -> Optional[float]:
+    """Parse a header holding seconds to wait, an epoch timestamp or an HTTP date."""
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+        # Large values are reset timestamps rather than durations
+        if seconds > 1e9:
+            seconds -= time.time()
+        return max(0.0, seconds)
+    except ValueError:
+        pass
+    try:
+        reset_at = parsedate_to_datetime(value)
+        return max(0.0, (reset_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def _quota_wait(response: requests.Response) -> Optional[float]:
+    """Return how long to hold off before the next request, per the response headers."""
+    retry_after = _header_seconds(response.headers.get("Retry-After"))
+    if retry_after is not None:
+        return retry_after
+
+    remaining = response.headers.get("X-RateLimit-Remaining")
+    if remaining is not None and remaining.strip() in ("0", "0.0"):
+        return _header_seconds(response.headers.get("X-RateLimit-Reset"))
+    return None
+
+
+def _backoff(attempt: int) -> float:
+    """Exponential backoff with full jitter."""
+    ceiling = min(MERGE_BACKOFF_MAX_SECONDS, MERGE_BACKOFF_BASE_SECONDS * (2 ** attempt))
+    return random.uniform(0, ceiling)
+
+
+def _fetch_page(url: str, headers: Dict[str, str]) -> Dict[str, Any]:
+    """Fetch a single page from the Merge API, retrying transient failures.
+
+    Raises:
+        requests.RequestException: Once the retries are used up, or at once
+            for errors that retrying cannot fix
+    """
+    limiter = get_rate_limiter()
+    attempt = 0
+    while True:
+        limiter.acquire()
+        try:
+            response = get_session().get(url, headers=headers, timeout=MERGE_REQUEST_TIMEOUT)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt >= MERGE_MAX_RETRIES:
+                raise
+            delay = _backoff(attempt)
+            logger.warning(f"Merge request failed ({str(e)}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+            attempt += 1
+            continue
+
+        wait = _quota_wait(response)
+        if wait is not None and wait > MERGE_RETRY_AFTER_MAX_SECONDS:
+            # Waiting that long would hold the worker; the caller resumes from this page later
+            logger.warning(f"Merge asked to wait {wait:.0f}s, more than {MERGE_RETRY_AFTER_MAX_SECONDS:.0f}s")
+            if response.status_code in RETRY_STATUS_CODES:
+                response.raise_for_status()
+            wait = None
+        if response.status_code in RETRY_STATUS_CODES and attempt < MERGE_MAX_RETRIES:
+            # The server's wait is honoured in full; only our own backoff is capped
+            delay = wait if wait is not None else _backoff(attempt)
+            logger.warning(f"Merge returned {response.status_code}, retrying in {delay:.1f}s")
+            if response.status_code == 429:
+                # Every thread in the worker shares the quota, so every thread backs off
+                limiter.pause(delay)
+            else:
+                time.sleep(delay)
+            attempt += 1
+            continue
+
+        response.raise_for_status()
+        if wait:
+            # The quota is used up; hold the next request until it resets
+            limiter.pause(wait)
+        return response.json()
+
+
+def _refreshed_headers(headers: Dict[str, str], refresh_token: Callable[[], Optional[str]],
+                       label: str) -> Optional[Dict[str, str]]:
+    """Return the headers with a freshly exchanged account token, or None if there is none."""
+    try:
+        token = refresh_token()
+    except Exception as e:
+        logger.error(f"Could not refresh the Merge account token for {label}: {str(e)}")
+        return None
+    if not token or token == headers.get("X-Account-Token"):
+        return None
+    return dict(headers, **{"X-Account-Token": token})
+
+
+def _iter_pages_sequential(url: str, headers: Dict[str, str], label: str,
+                           refresh_token: Optional[Callable[[], Optional[str]]] = None) -> Iterator[Dict[str, Any]]:
+    """Follow ``next`` links one page at a time on the calling thread."""
+    next_page_url = url
+    entity = label.replace(" ", "_")
+    while next_page_url:
+        try:
+            with MERGE_PAGE_FETCH_SECONDS.labels(entity=entity).time():
+                data = _fetch_page(next_page_url, headers)
+        except requests.RequestException as e:
+            status_code = e.response.status_code if e.response is not None else None
+            if status_code == 401 and refresh_token:
+                # The cached account token was revoked or rotated; retry the page once with a new one
+                refreshed = _refreshed_headers(headers, refresh_token, label)
+                refresh_token = None
+                if refreshed:
+                    logger.warning(f"Merge rejected the account token for {label}, retrying with a new one")
+                    headers = refreshed
+                    continue
+            logger.error(f"Error fetching {label} from Merge API: {str(e)}")
+            raise MergeAPIError(f"Error fetching {label} from Merge API: {str(e)}",
+                                resume_url=next_page_url, status_code=status_code) from e
+
+        yield data
+        next_page_url = data.get("next")
+
+
+def expanded_id(value: Any) -> Any:
+    """Return the Merge id of a reference, whether it is a bare id or an expanded object."""
+    return value.get("id") if isinstance(value, dict) else value
+
+
+def with_query_params(url: str, params: Dict[str, Any]) -> str:
+    """Append query parameters to a Merge URL, skipping empty values."""
+    params = {key: value for key, value in params.items() if value}
+    if not params:
+        return url
+    separator = "&" if "?" in url else "?"
+    return f"{url}{separator}{urlencode(params)}"
+
+
+def iter_merge_pages(url: str, headers: Dict[str, str], label: str = "records",
+                     prefetch_depth: Optional[int] = None,
+                     refresh_token: Optional[Callable[[], Optional[str]]] = None) -> Iterator[Dict[str, Any]]:
+    """Yield the raw JSON pages of a Merge collection, prefetching ahead of the caller.
+
+    Args:
+        url: The URL of the first page
+        headers: Request headers including the API key and account token
+        label: Name of the collection, used in log messages
+        prefetch_depth: Maximum number of pages fetched ahead of the consumer
+                        (defaults to MERGE_PREFETCH_DEPTH, 0 fetches synchronously)
+        refresh_token: Optional callable that drops the cached account token
+                       and returns a new one. When Merge answers 401, the page
+                       is retried once with the new token.
+
+    Yields:
+        The decoded JSON body of each page, in order
+
+    Raises:
+        MergeAPIError: If a page cannot be fetched
+    """
+    depth = MERGE_PREFETCH_DEPTH if prefetch_depth is None else prefetch_depth
+    if depth <= 0:
+        yield from _iter_pages_sequential(url, headers, label, refresh_token)
+        return
+
+    pages: "queue.Queue[Any]" = queue.Queue(maxsize=depth)
+    cancelled = threading.Event()
+
+    def put(item: Any) -> bool:
+        # Block while the queue is full, but give up if the consumer went away
+        while not cancelled.is_set():
+            try:
+                pages.put(item, timeout=_PUT_POLL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for data in _iter_pages_sequential(url, headers, label, refresh_token):
+                if not put(data):
+                    return
+        except Exception as e:
+            put(e)
+            return
+        put(_DONE)
+
+    producer = threading.Thread(target=produce, name=f"merge-prefetch-{label}", daemon=True)
+    producer.start()
+
+    try:
+        while True:
+            item = pages.get()
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        cancelled.set()
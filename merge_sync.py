@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Merge sync runner shared by the route handlers.
+
+Streams a manager's iter_merge_* pages into its upsert_* method in bounded
+batches, so memory stays flat and the first rows are written while later
+pages are still downloading. Syncs are incremental: the high-water mark of
+the last successful run for the organization and entity is passed to Merge
+as ``modified_after``, and a new mark is recorded once every fetched record
+has been written.
+
+Syncs are also resumable: after each written batch the cursor of the next
+page is checkpointed, and a run that finds a checkpoint left by an
+interrupted run continues from that page instead of starting over. A
+checkpoint whose cursor Merge rejects outright is discarded and the run
+restarts from the watermark.
+
+Identical syncs requested while one is running (same organization, entity,
+source and options, e.g. a double-clicked sync button) wait for the running
+sync and share its result instead of fetching and writing the same data again.
+"""
+
+import time
+import logging
+import itertools
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from bulk_upsert import DEFAULT_BATCH_SIZE
+from merge_client import MERGE_BASE_URL, MergeAPIError
+from metrics import SYNC_DURATION_SECONDS
+from single_flight import SingleFlight
+from sync_state import SyncStateStore
+
+logger = logging.getLogger(__name__)
+
+# Entity name -> (page iterator, upsert method) on the matching manager
+SYNC_METHODS = {
+    "candidates": ("iter_merge_candidates", "upsert_candidates"),
+    "job_postings": ("iter_merge_job_postings", "upsert_job_postings"),
+    "applications": ("iter_merge_applications", "upsert_applications"),
+    "interviews": ("iter_merge_interviews", "upsert_interviews"),
+}
+
+# Syncs in progress in this worker process, keyed by sync_key
+in_flight_syncs = SingleFlight()
+
+
+def sync_key(entity: str, org_id: str, source: str = "merge_api", test_mode: bool = False,
+             full_resync: bool = False) -> Tuple:
+    """Identify syncs that would fetch and write the same data.
+
+    The user and token of the request are not part of the key: several users
+    of one organization syncing at once get the same rows from Merge.
+    """
+    return (entity, org_id, source, bool(test_mode), bool(full_resync))
+
+
+def run_coalesced_merge_sync(manager, entity: str, user_id: str, org_id: str, user_token: Optional[str] = None,
+                             test_mode: bool = False, full_resync: bool = False,
+                             progress: Optional[Callable[..., None]] = None,
+                             batch_size: Optional[int] = None) -> Dict[str, Any]:
+    """Run run_merge_sync, or wait for an identical sync already in flight and return its result.
+
+    Takes the same arguments as run_merge_sync. A caller that joins a running
+    sync receives no progress callbacks.
+    """
+    def run() -> Dict[str, Any]:
+        return run_merge_sync(manager, entity, user_id, org_id, user_token=user_token, test_mode=test_mode,
+                              full_resync=full_resync, progress=progress, batch_size=batch_size)
+
+    return in_flight_syncs.do(sync_key(entity, org_id, test_mode=test_mode, full_resync=full_resync), run)
+
+
+def run_merge_sync(manager, entity: str, user_id: str, org_id: str, user_token: Optional[str] = None,
+                   test_mode: bool = False, full_resync: bool = False,
+                   progress: Optional[Callable[..., None]] = None,
+                   batch_size: Optional[int] = None) -> Dict[str, Any]:
+    """Fetch an entity from Merge and upsert it, incrementally when possible.
+
+    Args:
+        manager: The manager instance for the entity
+        entity: One of the keys of SYNC_METHODS
+        user_id: The UUID of the user associated with this data
+        org_id: The UUID of the organization associated with this data
+        user_token: Optional user JWT or Merge account token from the request
+        test_mode: If True, use sample data and leave the watermark untouched
+        full_resync: If True, ignore the stored watermark and fetch everything
+        progress: Optional callback receiving progress counters as keyword arguments
+        batch_size: Records buffered before they are written (defaults to UPSERT_BATCH_SIZE)
+
+    Returns:
+        The upsert counts plus the ``modified_after`` value that was used and
+        whether the run resumed from a checkpoint
+    """
+    if entity not in SYNC_METHODS:
+        raise ValueError(f"Unknown sync entity: {entity}")
+    iter_name, upsert_name = SYNC_METHODS[entity]
+    upsert = getattr(manager, upsert_name)
+    batch_size = batch_size or DEFAULT_BATCH_SIZE
+    report = progress or (lambda **counters: None)
+    sync_started = time.perf_counter()
+
+    state = None if test_mode else SyncStateStore(manager.supabase)
+    checkpoint = None
+    if state and not full_resync:
+        checkpoint = state.get_checkpoint(org_id, entity)
+        if checkpoint and not checkpoint["cursor"].startswith(MERGE_BASE_URL):
+            logger.warning(f"Ignoring {entity} checkpoint for organization {org_id} outside the Merge API")
+            checkpoint = None
+
+    if checkpoint:
+        # Continue the interrupted run with its own watermark and start time
+        cursor = checkpoint["cursor"]
+        modified_after = checkpoint["modified_after"]
+        started_at = checkpoint["started_at"] or datetime.now(timezone.utc).isoformat()
+        logger.info(f"Resuming {entity} sync for organization {org_id} from checkpoint")
+    else:
+        cursor = None
+        modified_after = state.get_watermark(org_id, entity) if state and not full_resync else None
+        # Records modified while this sync runs are picked up by the next one
+        started_at = datetime.now(timezone.utc).isoformat()
+
+    if modified_after:
+        logger.info(f"Incremental {entity} sync for organization {org_id} since {modified_after}")
+    else:
+        logger.info(f"Full {entity} sync for organization {org_id}")
+
+    results = {"inserted": 0, "updated": 0, "unchanged": 0, "failed": 0}
+    fetched = 0
+    buffer = []
+    next_cursor = None
+
+    def flush() -> None:
+        records = buffer[:]
+        buffer.clear()
+        counts = upsert(records)
+        for key, value in counts.items():
+            results[key] = results.get(key, 0) + value
+        # Never checkpoint past rows that failed, so a resumed run retries them
+        if state and next_cursor and not results.get("failed"):
+            state.save_checkpoint(org_id, entity, next_cursor, started_at, modified_after)
+        report(stage="syncing", fetched=fetched, **results)
+
+    def open_pages(cursor: Optional[str], modified_after: Optional[str]) -> Iterator[Any]:
+        return iter(getattr(manager, iter_name)(
+            user_id,
+            org_id,
+            test_mode=test_mode,
+            user_token=user_token,
+            modified_after=modified_after,
+            cursor=cursor
+        ))
+
+    report(stage="fetching", modified_after=modified_after, resumed=bool(checkpoint))
+    pages = open_pages(cursor, modified_after)
+    try:
+        first_page = next(pages, None)
+    except MergeAPIError as e:
+        if not checkpoint or e.retryable:
+            raise
+        # Merge rejected the saved cursor (e.g. it expired); resuming from it would fail on every run
+        logger.warning(f"Discarding {entity} checkpoint for organization {org_id} after Merge returned "
+                       f"{e.status_code}, restarting from the watermark")
+        state.clear_checkpoint(org_id, entity)
+        checkpoint = None
+        modified_after = state.get_watermark(org_id, entity)
+        started_at = datetime.now(timezone.utc).isoformat()
+        report(stage="fetching", modified_after=modified_after, resumed=False)
+        pages = open_pages(None, modified_after)
+        first_page = next(pages, None)
+
+    for page in itertools.chain([first_page] if first_page is not None else [], pages):
+        fetched += len(page)
+        buffer.extend(page)
+        next_cursor = getattr(page, "next_url", None)
+        if len(buffer) >= batch_size:
+            flush()
+    if buffer:
+        flush()
+
+    report(stage="done", fetched=fetched, **results)
+    SYNC_DURATION_SECONDS.labels(entity=entity).observe(time.perf_counter() - sync_started)
+    logger.info(f"Synced {fetched} {entity} for organization {org_id}: {results}")
+
+    if state:
+        # The run reached the last page; a failed one starts over from the watermark
+        state.clear_checkpoint(org_id, entity)
+        # Only advance the watermark once every fetched record has been written
+        if not results.get("failed"):
+            state.set_watermark(org_id, entity, started_at)
+
+    results["modified_after"] = modified_after
+    results["resumed"] = bool(checkpoint)
+    return results
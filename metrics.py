@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Sync metrics served by ``GET /metrics`` through prometheus_client.
+
+The sync path records Merge page fetch latency, transform time, Supabase
+upsert batch latency, resolver lookups, row counts and the background job
+queue. The worker's id cache is read when the endpoint is scraped.
+
+With several gunicorn workers, set PROMETHEUS_MULTIPROC_DIR to an empty
+directory before the workers start: every process then writes its series
+there and any worker answers a scrape with the sum over all of them
+(gunicorn.conf.py removes the files of exited workers). Without it the
+metrics are those of the worker process that answers.
+
+The endpoint is protected: requests must carry ``Authorization: Bearer
+<METRICS_TOKEN>``, or come from the loopback interface when no token is set.
+"""
+
+import os
+import hmac
+import logging
+from typing import Dict, Iterator, Optional
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, Metric
+
+from id_cache import id_cache
+
+logger = logging.getLogger(__name__)
+
+# Directory shared by the gunicorn workers; read by prometheus_client when it is imported
+PROMETHEUS_MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR", "")
+
+# Bearer token required by /metrics; without one only loopback requests are served
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+# Addresses allowed to scrape /metrics when METRICS_TOKEN is not set
+LOOPBACK_ADDRESSES = ("127.0.0.1", "::1")
+
+# Upper bounds in seconds, from a cached lookup to a slow Merge page
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+
+class IdCacheCollector:
+    """Reads the id cache of this worker process at scrape time."""
+
+    def collect(self) -> Iterator[Metric]:
+        stats = id_cache.stats()
+        pid = str(os.getpid())
+
+        lookups = CounterMetricFamily(
+            "id_cache_lookups",
+            "Resolved-id lookups answered by the worker's id cache (hit) or by Supabase (miss)",
+            labels=["pid", "result"]
+        )
+        lookups.add_metric([pid, "hit"], stats["hits"])
+        lookups.add_metric([pid, "miss"], stats["misses"])
+        yield lookups
+
+        entries = GaugeMetricFamily(
+            "id_cache_entries",
+            "Ids currently held by the worker's id cache",
+            labels=["pid"]
+        )
+        entries.add_metric([pid], stats["size"])
+        yield entries
+
+
+_id_cache_collector = IdCacheCollector()
+if not PROMETHEUS_MULTIPROC_DIR:
+    REGISTRY.register(_id_cache_collector)
+
+
+def render_metrics() -> bytes:
+    """Render the metrics of every worker (multiprocess mode) or of this one."""
+    if not PROMETHEUS_MULTIPROC_DIR:
+        return generate_latest(REGISTRY)
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    # The id cache lives in memory, so only the answering worker's is reported
+    registry.register(_id_cache_collector)
+    return generate_latest(registry)
+
+
+def is_authorized(authorization: Optional[str], remote_addr: Optional[str]) -> bool:
+    """Return whether a request may read the metrics.
+
+    Args:
+        authorization: The Authorization header of the request
+        remote_addr: The address the request came from
+
+    Returns:
+        True for the configured bearer token, or for loopback requests when
+        no token is configured
+    """
+    if METRICS_TOKEN:
+        return hmac.compare_digest((authorization or "").encode("utf-8"),
+                                   f"Bearer {METRICS_TOKEN}".encode("utf-8"))
+    return remote_addr in LOOPBACK_ADDRESSES
+
+
+MERGE_PAGE_FETCH_SECONDS = Histogram(
+    "merge_page_fetch_seconds",
+    "Time to fetch one Merge API page, including rate-limit waits and retries",
+    ["entity"],
+    buckets=DEFAULT_BUCKETS
+)
+
+TRANSFORM_SECONDS = Histogram(
+    "sync_transform_seconds",
+    "Time to transform one Merge page or CSV chunk into rows",
+    ["entity", "source"],
+    buckets=DEFAULT_BUCKETS
+)
+
+UPSERT_BATCH_SECONDS = Histogram(
+    "supabase_upsert_batch_seconds",
+    "Time of one bulk upsert call to Supabase",
+    ["entity"],
+    buckets=DEFAULT_BUCKETS
+)
+
+RESOLVER_LOOKUP_SECONDS = Histogram(
+    "resolver_lookup_seconds",
+    "Time of Supabase lookups made to resolve foreign keys",
+    ["entity"],
+    buckets=DEFAULT_BUCKETS
+)
+
+SYNC_DURATION_SECONDS = Histogram(
+    "sync_duration_seconds",
+    "Duration of a complete Merge sync of one entity",
+    ["entity"],
+    buckets=(1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0)
+)
+
+SYNC_ROWS = Counter(
+    "sync_rows",
+    "Rows written or skipped by syncs and imports",
+    ["entity", "result"]
+)
+
+TOKEN_CACHE_REQUESTS = Counter(
+    "merge_token_cache_requests",
+    "Merge account token lookups served from the cache or by an exchange",
+    ["result"]
+)
+
+SYNC_QUEUE_WAIT_SECONDS = Histogram(
+    "sync_queue_wait_seconds",
+    "Time a background sync job waited in the scheduler queue before starting",
+    ["priority"],
+    buckets=(0.1, 1.0, 5.0, 15.0, 30.0, 60.0, 300.0, 900.0, 1800.0, 3600.0, 7200.0)
+)
+
+# Kept up to date by the sync job schedulers; live workers are summed in multiprocess mode
+SYNC_QUEUE_DEPTH = Gauge(
+    "sync_queue_depth",
+    "Background sync jobs waiting for a worker",
+    ["priority"],
+    multiprocess_mode="livesum"
+)
+
+SYNC_JOBS_RUNNING = Gauge(
+    "sync_jobs_running",
+    "Background sync jobs currently running",
+    multiprocess_mode="livesum"
+)
+
+
+def record_rows(entity: str, counts: Dict[str, int]) -> None:
+    """Add the inserted/updated/unchanged/failed counts of a write to ``sync_rows_total``."""
+    for result, amount in counts.items():
+        if amount:
+            SYNC_ROWS.labels(entity=entity, result=result).inc(amount)
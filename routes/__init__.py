@@ -14,6 +14,9 @@ from routes.applications import applications_bp
 from routes.jobs import jobs_bp
 from routes.job_postings import job_postings_bp
 from routes.candidates import candidates_bp
+from routes.sync_jobs import sync_jobs_bp
+from routes.sync_all import sync_all_bp
+from routes.sync_batch import sync_batch_bp
 
 # Register blueprints with the sync blueprint
 sync_bp.register_blueprint(interviews_bp)
@@ -21,6 +24,9 @@ sync_bp.register_blueprint(applications_bp)
 sync_bp.register_blueprint(jobs_bp)
 sync_bp.register_blueprint(job_postings_bp)
 sync_bp.register_blueprint(candidates_bp)
+sync_bp.register_blueprint(sync_jobs_bp)
+sync_bp.register_blueprint(sync_all_bp)
+sync_bp.register_blueprint(sync_batch_bp)
 
 # Export the blueprints
 __all__ = ['sync_bp'] 
\ No newline at end of file
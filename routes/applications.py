@@ -3,16 +3,17 @@
 Applications sync route handler.
 This file provides the route handler for syncing applications with Merge API.
 """
-import os
 import logging
-import base64
-import tempfile
 import traceback
 import uuid
 from flask import Blueprint, request, jsonify
 
 # Import the applications manager
 from applications_manager import ApplicationsManager
+from merge_sync import run_coalesced_merge_sync
+from routes.csv_upload import CSVUploadError, get_sync_request, spool_csv_upload
+from routes.sync_jobs import submit_merge_sync, submit_csv_import, accepted_job_response
+from idempotency import idempotent
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +21,7 @@ logger = logging.getLogger(__name__)
 applications_bp = Blueprint('applications', __name__, url_prefix='/applications')
 
 @applications_bp.route('/', methods=['POST'])
+@idempotent
 def sync_applications():
     """Sync applications from Merge API or CSV.
     
@@ -28,7 +30,10 @@ def sync_applications():
         "user_id": str,           # Required - The user ID
         "organization_id": str,   # Required - The organization ID
         "csv_file": str,          # Optional - Base64 encoded CSV file
-        "test_mode": bool         # Optional - If true, use test data
+        "chunk_size": int,        # Optional - Rows imported at a time
+        "test_mode": bool,        # Optional - If true, use test data
+        "full_resync": bool,      # Optional - If true, ignore the last sync watermark
+        "async": bool             # Optional - If true, queue the sync and return 202 with a job ID
     }
     
     Headers:
@@ -36,19 +41,30 @@ def sync_applications():
     
     Returns:
         JSON response with status and counts
+    
+    The CSV can also be sent as a text/csv body (fields in the query string)
+    or as a multipart/form-data upload named csv_file, optionally gzipped.
     """
     logger.info(f"Received request to sync applications")
     
-    # Extract request data
-    if not request.is_json:
-        logger.error("Request must be JSON")
+    # Extract request fields and the CSV upload, if any
+    try:
+        data, csv_file = get_sync_request()
+    except CSVUploadError as e:
+        logger.error(str(e))
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 400
+    
+    if data is None:
+        logger.error("Request must be JSON, text/csv or multipart/form-data")
         return jsonify({
             "status": "error",
-            "message": "Request must be JSON"
+            "message": "Request must be JSON, text/csv or multipart/form-data"
         }), 400
     
-    data = request.json
-    logger.debug(f"Request data: {data}")
+    logger.debug(f"Request fields: {data}")
     
     # Validate required fields
     required_fields = ['user_id', 'organization_id']
@@ -73,52 +89,71 @@ def sync_applications():
         manager = ApplicationsManager()
         
         # Check if CSV file is provided
-        if data.get('csv_file'):
+        if csv_file is not None:
             # Handle CSV import
-            # CSV import mode - requires base64 encoded CSV content
-            csv_content = base64.b64decode(data['csv_file'])
+            logger.info("Processing CSV import mode")
             
-            # Create a temporary file
-            with tempfile.NamedTemporaryFile(suffix='.csv', delete=False) as temp_file:
-                temp_file.write(csv_content)
-                temp_file_path = temp_file.name
+            if data.get('async'):
+                # The background job removes the spooled file when it is done
+                job = submit_csv_import(
+                    manager,
+                    "applications",
+                    spool_csv_upload(csv_file),
+                    data['user_id'],
+                    data['organization_id'],
+                    chunk_size=data.get('chunk_size')
+                )
+                return accepted_job_response(job)
             
-            try:
-                # Import from CSV
-                results = manager.import_from_csv(temp_file_path, data['user_id'], data['organization_id'])
-                os.unlink(temp_file_path)  # Clean up temp file
-                
-                return jsonify({
-                    "status": "success",
-                    "source": "csv",
-                    "inserted": results['inserted'],
-                    "updated": results['updated']
-                })
-            except Exception as e:
-                # Clean up temp file in case of exception
-                if os.path.exists(temp_file_path):
-                    os.unlink(temp_file_path)
-                raise e
+            # Import from CSV, streaming the upload straight into the parser
+            results = manager.import_from_csv(
+                csv_file,
+                data['user_id'],
+                data['organization_id'],
+                chunk_size=data.get('chunk_size')
+            )
+            
+            return jsonify({
+                "status": "success",
+                "source": "csv",
+                "inserted": results.get("inserted", 0),
+                "updated": results.get("updated", 0),
+                "unchanged": results.get("unchanged", 0)
+            })
         else:
             # Import from Merge API
             logger.info(f"Importing applications from Merge API")
             
-            # Fetch applications using the provided user token
+            # Fetch applications changed since the last sync using the provided user token
             test_mode = data.get('test_mode', False)
-            applications = manager.fetch_merge_applications(
+            if data.get('async'):
+                job = submit_merge_sync(
+                    manager,
+                    "applications",
+                    data['user_id'],
+                    data['organization_id'],
+                    user_token=user_token,
+                    test_mode=test_mode,
+                    full_resync=data.get('full_resync', False)
+                )
+                return accepted_job_response(job)
+            
+            results = run_coalesced_merge_sync(
+                manager,
+                "applications",
                 data['user_id'], 
                 data['organization_id'],
                 user_token=user_token,
-                test_mode=test_mode
+                test_mode=test_mode,
+                full_resync=data.get('full_resync', False)
             )
             
-            results = manager.upsert_applications(applications)
-            
             return jsonify({
                 "status": "success",
                 "source": "merge_api",
                 "inserted": results['inserted'],
-                "updated": results['updated']
+                "updated": results['updated'],
+                "unchanged": results.get("unchanged", 0)
             })
     except ValueError as e:
         # Handle expected validation errors
@@ -1,18 +1,22 @@
-import os
 import logging
-import base64
-import tempfile
 import traceback
 from flask import Blueprint, request, jsonify
 import uuid
 
 # Import the CandidatesManager
 from candidates_manager import CandidatesManager
+from merge_sync import run_coalesced_merge_sync
+from routes.csv_upload import CSVUploadError, get_sync_request, spool_csv_upload
+from routes.sync_jobs import submit_merge_sync, submit_csv_import, accepted_job_response
+from idempotency import idempotent
+
+logger = logging.getLogger(__name__)
 
 # Create a blueprint for the candidates route
 candidates_bp = Blueprint('candidates', __name__, url_prefix='/candidates')
 
 @candidates_bp.route('/', methods=['POST'])
+@idempotent
 def sync_candidates():
     """Sync candidates from Merge API or CSV.
     
@@ -21,7 +25,10 @@ def sync_candidates():
         "user_id": str,           # Required - The user ID
         "organization_id": str,   # Required - The organization ID
         "csv_file": str,          # Optional - Base64 encoded CSV file
-        "test_mode": bool         # Optional - If true, use test data
+        "chunk_size": int,        # Optional - Rows imported at a time
+        "test_mode": bool,        # Optional - If true, use test data
+        "full_resync": bool,      # Optional - If true, ignore the last sync watermark
+        "async": bool             # Optional - If true, queue the sync and return 202 with a job ID
     }
     
     Headers:
@@ -29,19 +36,30 @@ def sync_candidates():
     
     Returns:
         JSON response with status and counts
+    
+    The CSV can also be sent as a text/csv body (fields in the query string)
+    or as a multipart/form-data upload named csv_file, optionally gzipped.
     """
     logger.info(f"Received request to sync candidates")
     
-    # Extract request data
-    if not request.is_json:
-        logger.error("Request must be JSON")
+    # Extract request fields and the CSV upload, if any
+    try:
+        data, csv_file = get_sync_request()
+    except CSVUploadError as e:
+        logger.error(str(e))
         return jsonify({
             "status": "error",
-            "message": "Request must be JSON"
+            "message": str(e)
         }), 400
     
-    data = request.json
-    logger.debug(f"Request data: {data}")
+    if data is None:
+        logger.error("Request must be JSON, text/csv or multipart/form-data")
+        return jsonify({
+            "status": "error",
+            "message": "Request must be JSON, text/csv or multipart/form-data"
+        }), 400
+    
+    logger.debug(f"Request fields: {data}")
     
     # Validate required fields
     required_fields = ['user_id', 'organization_id']
@@ -66,60 +84,71 @@ def sync_candidates():
         manager = CandidatesManager()
         
         # Check if CSV file is provided
-        if data.get('csv_file'):
+        if csv_file is not None:
             # Handle CSV import
             logger.info("Processing CSV import mode")
             
-            # Decode the base64 content
-            try:
-                csv_content = base64.b64decode(data["csv_file"])
-            except Exception as e:
-                logger.error(f"Error decoding CSV content: {str(e)}")
-                return jsonify({
-                    "status": "error",
-                    "message": f"Error decoding CSV content: {str(e)}"
-                }), 400
-                
-            # Write to a temporary file
-            temp_file = None
-            try:
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.csv') as f:
-                    f.write(csv_content)
-                    temp_file = f.name
-                    
-                # Import from the CSV file
-                result = manager.import_from_csv(temp_file, data['user_id'], data['organization_id'])
-                
-                return jsonify({
-                    "status": "success",
-                    "source": "csv",
-                    "inserted": result.get("inserted", 0),
-                    "updated": result.get("updated", 0)
-                })
-            finally:
-                # Clean up the temporary file
-                if temp_file and os.path.exists(temp_file):
-                    os.unlink(temp_file)
+            if data.get('async'):
+                # The background job removes the spooled file when it is done
+                job = submit_csv_import(
+                    manager,
+                    "candidates",
+                    spool_csv_upload(csv_file),
+                    data['user_id'],
+                    data['organization_id'],
+                    chunk_size=data.get('chunk_size')
+                )
+                return accepted_job_response(job)
+            
+            # Import from CSV, streaming the upload straight into the parser
+            result = manager.import_from_csv(
+                csv_file,
+                data['user_id'],
+                data['organization_id'],
+                chunk_size=data.get('chunk_size')
+            )
+            
+            return jsonify({
+                "status": "success",
+                "source": "csv",
+                "inserted": result.get("inserted", 0),
+                "updated": result.get("updated", 0),
+                "unchanged": result.get("unchanged", 0)
+            })
         else:
             # Import from Merge API
             logger.info(f"Importing candidates from Merge API")
             
-            # Fetch candidates using the provided user token
+            # Fetch candidates changed since the last sync using the provided user token
             test_mode = data.get('test_mode', False)
-            candidates = manager.fetch_merge_candidates(
+            if data.get('async'):
+                job = submit_merge_sync(
+                    manager,
+                    "candidates",
+                    data['user_id'],
+                    data['organization_id'],
+                    user_token=user_token,
+                    test_mode=test_mode,
+                    full_resync=data.get('full_resync', False)
+                )
+                return accepted_job_response(job)
+            
+            result = run_coalesced_merge_sync(
+                manager,
+                "candidates",
                 data['user_id'], 
                 data['organization_id'],
                 user_token=user_token,
-                test_mode=test_mode
+                test_mode=test_mode,
+                full_resync=data.get('full_resync', False)
             )
             
-            result = manager.upsert_candidates(candidates)
-            
             return jsonify({
                 "status": "success",
                 "source": "merge_api",
                 "inserted": result.get("inserted", 0),
-                "updated": result.get("updated", 0)
+                "updated": result.get("updated", 0),
+                "unchanged": result.get("unchanged", 0)
             })
     except ValueError as e:
         # Handle expected validation errors
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Request parsing shared by the sync routes.
+
+Besides the original JSON body with a base64 ``csv_file``, the sync routes
+accept the CSV as a raw ``text/csv`` request body (fields in the query
+string) or as a ``multipart/form-data`` upload (fields in the form). Raw and
+multipart uploads are handed to the CSV parser as streams, optionally
+gzip-compressed, without base64 decoding or writing a temporary file.
+"""
+import io
+import gzip
+import base64
+import shutil
+import logging
+import tempfile
+from flask import request
+
+logger = logging.getLogger(__name__)
+
+CSV_CONTENT_TYPES = ("text/csv", "application/csv")
+GZIP_CONTENT_TYPES = ("application/gzip", "application/x-gzip")
+
+# Multipart field names checked for the CSV file, in order
+CSV_FILE_FIELDS = ("csv_file", "file")
+
+# Fields that arrive as strings in query strings and forms
+FLAG_FIELDS = ("test_mode", "full_resync", "async")
+INT_FIELDS = ("chunk_size",)
+
+
+class CSVUploadError(ValueError):
+    """Raised when the uploaded CSV cannot be read."""
+
+
+def _parse_flag(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ("true", "yes", "1", "y")
+    return bool(value)
+
+
+def _normalize_fields(data):
+    """Convert flag and integer fields sent as strings."""
+    for field in FLAG_FIELDS:
+        if field in data:
+            data[field] = _parse_flag(data[field])
+    for field in INT_FIELDS:
+        if data.get(field) not in (None, ""):
+            try:
+                data[field] = int(data[field])
+            except (TypeError, ValueError):
+                raise CSVUploadError(f"{field} must be an integer")
+    return data
+
+
+def _maybe_gunzip(stream, gzipped):
+    return gzip.GzipFile(fileobj=stream, mode="rb") if gzipped else stream
+
+
+def get_sync_request():
+    """Return the fields and the CSV stream of a sync request.
+
+    Returns:
+        A (data, csv_file) tuple. ``data`` is None when the request carries no
+        fields, and ``csv_file`` is a binary file-like object, or None for
+        Merge API syncs.
+
+    Raises:
+        CSVUploadError: If the base64 CSV content cannot be decoded
+    """
+    content_encoding = request.headers.get("Content-Encoding", "").lower()
+
+    if request.mimetype in CSV_CONTENT_TYPES + GZIP_CONTENT_TYPES:
+        data = _normalize_fields(request.args.to_dict())
+        gzipped = content_encoding == "gzip" or request.mimetype in GZIP_CONTENT_TYPES
+        return data, _maybe_gunzip(request.stream, gzipped)
+
+    if request.mimetype == "multipart/form-data":
+        data = _normalize_fields(request.form.to_dict())
+        upload = next((request.files[name] for name in CSV_FILE_FIELDS if name in request.files), None)
+        if upload is None:
+            return data, None
+        gzipped = (upload.filename or "").endswith(".gz") or upload.mimetype in GZIP_CONTENT_TYPES
+        return data, _maybe_gunzip(upload.stream, gzipped)
+
+    data = request.get_json(silent=True)
+    if not data:
+        return None, None
+    if not data.get("csv_file"):
+        return data, None
+
+    # Legacy mode: base64 encoded CSV content inside the JSON body
+    try:
+        csv_content = base64.b64decode(data["csv_file"])
+    except Exception as e:
+        raise CSVUploadError(f"Error decoding CSV content: {str(e)}")
+    return data, io.BytesIO(csv_content)
+
+
+def spool_csv_upload(csv_file):
+    """Copy a CSV stream to a temporary file for a background job.
+
+    The request stream is gone once the 202 response is sent, so queued
+    imports read from a file instead. The job removes it when it is done.
+    """
+    with tempfile.NamedTemporaryFile(suffix=".csv", delete=False) as temp_file:
+        shutil.copyfileobj(csv_file, temp_file)
+        return temp_file.name
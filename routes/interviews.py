@@ -3,14 +3,15 @@
 Interviews sync route handler.
 This file provides the route handler for syncing interviews with Merge API.
 """
-import os
 import logging
-import base64
-import tempfile
 import traceback
 from flask import Blueprint, request, jsonify
 
 from interviews_manager import InterviewsManager
+from merge_sync import run_coalesced_merge_sync
+from routes.csv_upload import CSVUploadError, get_sync_request, spool_csv_upload
+from routes.sync_jobs import submit_merge_sync, submit_csv_import, accepted_job_response
+from idempotency import idempotent
 
 logger = logging.getLogger(__name__)
 
@@ -18,13 +19,14 @@ logger = logging.getLogger(__name__)
 interviews_bp = Blueprint('interviews', __name__, url_prefix='/interviews')
 
 @interviews_bp.route('/', methods=['POST'])
+@idempotent
 def sync_interviews():
     """Sync interviews from Merge API or CSV"""
     try:
-        # Get JSON data from request
-        data = request.get_json()
-        if not data:
-            return jsonify({"status": "error", "message": "No JSON data provided"}), 400
+        # Get the request fields and the CSV upload, if any
+        data, csv_file = get_sync_request()
+        if data is None:
+            return jsonify({"status": "error", "message": "No request data provided"}), 400
         
         # Validate required fields
         required_fields = ['user_id', 'organization_id']
@@ -44,43 +46,67 @@ def sync_interviews():
         manager = InterviewsManager()
         
         # Choose appropriate action based on data
-        if 'csv_file' in data:
-            # CSV import mode - requires base64 encoded CSV content
-            csv_content = base64.b64decode(data['csv_file'])
+        if csv_file is not None:
+            # CSV import mode - raw text/csv, multipart or base64 encoded CSV content
+            if data.get('async'):
+                # The background job removes the spooled file when it is done
+                job = submit_csv_import(
+                    manager,
+                    "interviews",
+                    spool_csv_upload(csv_file),
+                    user_id,
+                    organization_id,
+                    chunk_size=data.get('chunk_size')
+                )
+                return accepted_job_response(job)
             
-            # Create a temporary file
-            with tempfile.NamedTemporaryFile(suffix='.csv', delete=False) as temp_file:
-                temp_file.write(csv_content)
-                temp_file_path = temp_file.name
+            # Import from CSV, streaming the upload straight into the parser
+            results = manager.import_from_csv(
+                csv_file,
+                user_id,
+                organization_id,
+                chunk_size=data.get('chunk_size')
+            )
             
-            try:
-                # Import from CSV
-                results = manager.import_from_csv(temp_file_path, user_id, organization_id)
-                os.unlink(temp_file_path)  # Clean up temp file
-                
-                return jsonify({
-                    "status": "success",
-                    "source": "csv",
-                    "inserted": results['inserted'],
-                    "updated": results['updated']
-                })
-            except Exception as e:
-                # Clean up temp file in case of exception
-                if os.path.exists(temp_file_path):
-                    os.unlink(temp_file_path)
-                raise e
+            return jsonify({
+                "status": "success",
+                "source": "csv",
+                "inserted": results['inserted'],
+                "updated": results['updated'],
+                "unchanged": results.get("unchanged", 0)
+            })
         else:
-            # Merge API import mode
-            interviews = manager.fetch_merge_interviews(user_id, organization_id, test_mode=test_mode)
-            results = manager.upsert_interviews(interviews)
+            # Merge API import mode, incremental unless a full resync is requested
+            if data.get('async'):
+                job = submit_merge_sync(
+                    manager,
+                    "interviews",
+                    user_id,
+                    organization_id,
+                    test_mode=test_mode,
+                    full_resync=data.get('full_resync', False)
+                )
+                return accepted_job_response(job)
+            
+            results = run_coalesced_merge_sync(
+                manager,
+                "interviews",
+                user_id,
+                organization_id,
+                test_mode=test_mode,
+                full_resync=data.get('full_resync', False)
+            )
             
             return jsonify({
                 "status": "success",
                 "source": "merge_api",
                 "inserted": results['inserted'],
-                "updated": results['updated']
+                "updated": results['updated'],
+                "unchanged": results.get("unchanged", 0)
             })
             
+    except CSVUploadError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
     except Exception as e:
         logger.error(f"Error in sync_interviews: {str(e)}")
         logger.error(traceback.format_exc())
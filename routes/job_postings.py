@@ -1,11 +1,11 @@
-import os
 import logging
-import base64
-import tempfile
 import traceback
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, jsonify
 import uuid
 
+from routes.csv_upload import CSVUploadError, get_sync_request
+from idempotency import idempotent
+
 # Import the JobPostingsManager (assuming it exists similar to InterviewsManager)
 # from job_postings_manager import JobPostingsManager
 
@@ -13,11 +13,13 @@ import uuid
 job_postings_bp = Blueprint('job_postings', __name__, url_prefix='/job_postings')
 
 @job_postings_bp.route('/', methods=['POST'])
+@idempotent
 def sync_job_postings():
     """
     Handle POST requests to sync job postings from Merge API or from a CSV file.
     
-    Expected JSON body:
+    Expected JSON body (the CSV can also be sent as a text/csv body with the
+    fields in the query string, or as a multipart/form-data upload):
     {
         "user_id": "string (required)",
         "organization_id": "string (required)",
@@ -30,12 +32,16 @@ def sync_job_postings():
     """
     logging.info("Received request to sync job postings")
     
-    # Check if we have JSON data
-    if not request.is_json:
-        logging.error("Request is not JSON")
-        return jsonify({"status": "error", "message": "Request must be JSON"}), 400
-        
-    data = request.get_json()
+    # Get the request fields and the CSV upload, if any
+    try:
+        data, csv_file = get_sync_request()
+    except CSVUploadError as e:
+        logging.error(str(e))
+        return jsonify({"status": "error", "message": str(e)}), 400
+    
+    if data is None:
+        logging.error("Request is not JSON, text/csv or multipart/form-data")
+        return jsonify({"status": "error", "message": "Request must be JSON, text/csv or multipart/form-data"}), 400
     
     # Validate required fields
     required_fields = ["user_id", "organization_id"]
@@ -76,39 +82,18 @@ def sync_job_postings():
     
     try:
         # Process CSV file if provided
-        if "csv_file" in data and data["csv_file"]:
+        if csv_file is not None:
             logging.info("Processing CSV import mode")
             
-            # Decode the base64 content
-            try:
-                csv_content = base64.b64decode(data["csv_file"]).decode('utf-8')
-            except Exception as e:
-                logging.error(f"Error decoding CSV content: {str(e)}")
-                return jsonify({
-                    "status": "error",
-                    "message": f"Error decoding CSV content: {str(e)}"
-                }), 400
-                
-            # Write to a temporary file
-            temp_file = None
-            try:
-                with tempfile.NamedTemporaryFile(mode='w+', delete=False, suffix='.csv') as f:
-                    f.write(csv_content)
-                    temp_file = f.name
-                    
-                # Import from the CSV file
-                result = job_postings_manager.import_from_csv(temp_file)
-                
-                return jsonify({
-                    "status": "success",
-                    "source": "csv",
-                    "inserted": result.get("inserted", 0),
-                    "updated": result.get("updated", 0)
-                })
-            finally:
-                # Clean up the temporary file
-                if temp_file and os.path.exists(temp_file):
-                    os.unlink(temp_file)
+            # Import straight from the uploaded stream
+            result = job_postings_manager.import_from_csv(csv_file)
+            
+            return jsonify({
+                "status": "success",
+                "source": "csv",
+                "inserted": result.get("inserted", 0),
+                "updated": result.get("updated", 0)
+            })
         else:
             # Import from Merge API
             logging.info("Processing Merge API import mode")
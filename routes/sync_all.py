@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Full-tenant sync route handler.
+This file provides the route handler for syncing every entity of an
+organization from Merge API in dependency order.
+"""
+import logging
+import traceback
+import uuid
+from flask import Blueprint, request, jsonify
+
+from full_sync import run_coalesced_full_sync
+from routes.sync_jobs import submit_full_sync, accepted_job_response
+from idempotency import idempotent
+
+logger = logging.getLogger(__name__)
+
+# Create a blueprint for the full sync route
+sync_all_bp = Blueprint('sync_all', __name__, url_prefix='/all')
+
+@sync_all_bp.route('/', methods=['POST'])
+@idempotent
+def sync_all():
+    """Sync candidates, job postings, applications and interviews from Merge API.
+
+    Candidates and job postings are synced in parallel, then applications,
+    then interviews.
+
+    Expected JSON body:
+    {
+        "user_id": str,           # Required - The user ID
+        "organization_id": str,   # Required - The organization ID
+        "test_mode": bool,        # Optional - If true, use test data
+        "full_resync": bool,      # Optional - If true, ignore the last sync watermarks
+        "async": bool             # Optional - If true, queue the sync and return 202 with a job ID
+    }
+
+    Headers:
+    - Authorization: Bearer <token> - User's auth token or a Merge account token
+
+    Returns:
+        JSON response with the counts of each entity
+    """
+    logger.info("Received request to sync all entities")
+
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({"status": "error", "message": "Request must be JSON"}), 400
+
+    # Validate required fields
+    required_fields = ['user_id', 'organization_id']
+    missing_fields = [field for field in required_fields if field not in data]
+    if missing_fields:
+        return jsonify({
+            "status": "error",
+            "message": f"Missing required fields: {', '.join(missing_fields)}"
+        }), 400
+
+    # Extract token from Authorization header
+    user_token = None
+    auth_header = request.headers.get('Authorization')
+    if auth_header and auth_header.startswith('Bearer '):
+        user_token = auth_header.split('Bearer ')[1].strip()
+
+    options = {
+        "user_token": user_token,
+        "test_mode": data.get('test_mode', False),
+        "full_resync": data.get('full_resync', False)
+    }
+
+    try:
+        if data.get('async'):
+            job = submit_full_sync(data['user_id'], data['organization_id'], **options)
+            return accepted_job_response(job)
+
+        summary = run_coalesced_full_sync(data['user_id'], data['organization_id'], **options)
+        if summary["errors"]:
+            return jsonify({
+                "status": "error",
+                "message": "One or more entities failed to sync",
+                "results": summary["results"],
+                "errors": summary["errors"],
+                "skipped": summary["skipped"]
+            }), 500
+
+        return jsonify({
+            "status": "success",
+            "source": "merge_api",
+            "results": summary["results"]
+        })
+    except Exception as e:
+        error_id = str(uuid.uuid4())
+        logger.error(f"Error ID: {error_id} - {str(e)}")
+        logger.error(traceback.format_exc())
+
+        return jsonify({
+            "status": "error",
+            "message": str(e),
+            "error_id": error_id
+        }), 500
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Multi-tenant sync route handler.
+This file provides the route handler for queueing Merge API syncs of many
+organizations at once, e.g. from a nightly cron.
+"""
+import logging
+from flask import Blueprint, request, jsonify, url_for
+
+from full_sync import ENTITY_MANAGERS
+from sync_scheduler import PRIORITIES, PRIORITY_NIGHTLY
+from routes.sync_jobs import submit_merge_sync, submit_full_sync
+from idempotency import idempotent
+
+logger = logging.getLogger(__name__)
+
+# Create a blueprint for the batch sync route
+sync_batch_bp = Blueprint('sync_batch', __name__, url_prefix='/batch')
+
+# "all" syncs every entity of the organization in dependency order
+BATCH_ENTITIES = list(ENTITY_MANAGERS) + ["all"]
+
+@sync_batch_bp.route('/', methods=['POST'])
+@idempotent
+def sync_batch():
+    """Queue Merge API syncs for a list of (organization, entity) pairs.
+
+    Jobs are scheduled fairly: each organization runs at most
+    SYNC_JOB_PER_ORG_LIMIT syncs at a time and organizations take turns for
+    the SYNC_JOB_WORKERS threads, so one large tenant cannot starve the rest.
+
+    Expected JSON body:
+    {
+        "user_id": str,           # Required - The user ID recorded on the synced rows
+        "syncs": [                # Required - The syncs to queue, in order per organization
+            {
+                "organization_id": str,   # Required
+                "entity": str,            # Required - candidates, job_postings, applications, interviews or all
+                "user_id": str            # Optional - Overrides the top-level user ID
+            }
+        ],
+        "priority": str,          # Optional - "nightly" (default) or "interactive"
+        "test_mode": bool,        # Optional - If true, use test data
+        "full_resync": bool       # Optional - If true, ignore the last sync watermarks
+    }
+
+    Each organization's Merge account token is fetched by passing its
+    organization_id to the get_merge_token RPC, so no Authorization header
+    is used.
+
+    Returns:
+        202 JSON response with the queued job of each sync
+    """
+    logger.info("Received request to queue a batch of syncs")
+
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({"status": "error", "message": "Request must be JSON"}), 400
+
+    syncs = data.get('syncs')
+    if not isinstance(syncs, list) or not syncs:
+        return jsonify({"status": "error", "message": "syncs must be a non-empty list"}), 400
+
+    priority = data.get('priority', PRIORITY_NIGHTLY)
+    if priority not in PRIORITIES:
+        return jsonify({
+            "status": "error",
+            "message": f"Invalid priority: {priority}. Expected one of {', '.join(PRIORITIES)}"
+        }), 400
+
+    # Validate every sync before queueing any of them
+    for index, sync in enumerate(syncs):
+        if not isinstance(sync, dict) or not sync.get('organization_id'):
+            return jsonify({"status": "error", "message": f"syncs[{index}] is missing organization_id"}), 400
+        if sync.get('entity') not in BATCH_ENTITIES:
+            return jsonify({
+                "status": "error",
+                "message": f"syncs[{index}] has invalid entity: {sync.get('entity')}. "
+                           f"Expected one of {', '.join(BATCH_ENTITIES)}"
+            }), 400
+        if not sync.get('user_id', data.get('user_id')):
+            return jsonify({"status": "error", "message": f"syncs[{index}] is missing user_id"}), 400
+
+    options = {
+        "test_mode": data.get('test_mode', False),
+        "full_resync": data.get('full_resync', False)
+    }
+
+    jobs = []
+    for sync in syncs:
+        entity = sync['entity']
+        organization_id = sync['organization_id']
+        user_id = sync.get('user_id', data.get('user_id'))
+        if entity == "all":
+            job = submit_full_sync(user_id, organization_id, priority=priority, **options)
+        else:
+            job = submit_merge_sync(ENTITY_MANAGERS[entity](), entity, user_id, organization_id,
+                                    priority=priority, **options)
+        jobs.append({
+            "job_id": job.id,
+            "organization_id": organization_id,
+            "entity": entity,
+            "status_url": url_for('sync.sync_jobs.get_sync_job', job_id=job.id)
+        })
+
+    logger.info(f"Queued {len(jobs)} {priority} syncs for {len({job['organization_id'] for job in jobs})} organizations")
+    return jsonify({"status": "accepted", "priority": priority, "jobs": jobs}), 202
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Sync job status route handler.
+This file provides the route handler for polling background sync jobs.
+"""
+import os
+import logging
+from flask import Blueprint, jsonify, url_for
+
+from sync_jobs import sync_job_runner
+from sync_scheduler import PRIORITY_INTERACTIVE
+from merge_sync import run_coalesced_merge_sync, sync_key
+from full_sync import run_coalesced_full_sync
+
+logger = logging.getLogger(__name__)
+
+# Create a blueprint for the sync job status route
+sync_jobs_bp = Blueprint('sync_jobs', __name__, url_prefix='/status')
+
+
+def submit_merge_sync(manager, entity, user_id, organization_id, priority=PRIORITY_INTERACTIVE, **kwargs):
+    """Queue a Merge API sync for the manager and return the job.
+
+    An identical sync that is already queued or running is returned instead.
+    """
+    def run(job):
+        return run_coalesced_merge_sync(manager, entity, user_id, organization_id, progress=job.update_progress,
+                                        **kwargs)
+
+    key = sync_key(entity, organization_id, test_mode=kwargs.get('test_mode', False),
+                   full_resync=kwargs.get('full_resync', False))
+    return sync_job_runner.submit(entity, organization_id, "merge_api", run, priority=priority, coalesce_key=key)
+
+
+def submit_full_sync(user_id, organization_id, priority=PRIORITY_INTERACTIVE, **kwargs):
+    """Queue a dependency-ordered sync of every entity and return the job.
+
+    An identical full sync that is already queued or running is returned instead.
+    """
+    def run(job):
+        summary = run_coalesced_full_sync(user_id, organization_id, progress=job.update_progress, **kwargs)
+        if summary["errors"]:
+            failed = ", ".join(f"{entity}: {error}" for entity, error in summary["errors"].items())
+            raise RuntimeError(f"Full sync failed ({failed}); skipped {', '.join(summary['skipped']) or 'nothing'}")
+        return summary["results"]
+
+    key = sync_key("all", organization_id, test_mode=kwargs.get('test_mode', False),
+                   full_resync=kwargs.get('full_resync', False))
+    return sync_job_runner.submit("all", organization_id, "merge_api", run, priority=priority, coalesce_key=key)
+
+
+def submit_csv_import(manager, entity, csv_path, user_id, organization_id, chunk_size=None):
+    """Queue a CSV import for the manager and return the job.
+
+    The job takes ownership of csv_path and removes it when the import ends.
+    """
+    def run(job):
+        try:
+            job.update_progress(stage="importing")
+            return manager.import_from_csv(
+                csv_path,
+                user_id,
+                organization_id,
+                chunk_size=chunk_size,
+                progress=job.update_progress
+            )
+        finally:
+            if os.path.exists(csv_path):
+                os.unlink(csv_path)
+
+    return sync_job_runner.submit(entity, organization_id, "csv", run)
+
+
+def accepted_job_response(job):
+    """Build the 202 response returned when a sync is queued."""
+    return jsonify({
+        "status": "accepted",
+        "job_id": job.id,
+        "status_url": url_for('sync.sync_jobs.get_sync_job', job_id=job.id)
+    }), 202
+
+
+@sync_jobs_bp.route('/<job_id>', methods=['GET'])
+def get_sync_job(job_id):
+    """Return the status and progress counters of a background sync job."""
+    job = sync_job_runner.get_status(job_id)
+    if not job:
+        return jsonify({
+            "status": "error",
+            "message": f"Sync job {job_id} not found"
+        }), 404
+
+    return jsonify(job)
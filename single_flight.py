@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Collapse concurrent calls for the same key into one.
+
+When several threads ask for the same thing at once (e.g. the Merge token of
+one organization at the start of a sync), only the first caller runs the
+work; the others wait for it and receive the same result or exception.
+"""
+
+import logging
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """A call in progress and its outcome."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Run at most one call per key at a time and share its outcome."""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Run ``fn`` unless a call for ``key`` is already in flight.
+
+        Args:
+            key: Identifies calls that would produce the same result
+            fn: The work to run when no call for the key is in flight
+
+        Returns:
+            The result of ``fn``, whichever caller ran it
+
+        Raises:
+            Whatever ``fn`` raised, in every caller that waited on it
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            if call.waiters:
+                logger.debug(f"Shared in-flight result for {key!r} with {call.waiters} waiting caller(s)")
+            call.done.set()
+
+    def waiters(self, key: Hashable) -> int:
+        """Return the number of callers waiting on the call for ``key`` (0 if none is in flight)."""
+        with self._lock:
+            call = self._calls.get(key)
+            return call.waiters if call else 0
+
+    def in_flight(self) -> int:
+        """Return the number of calls currently running."""
+        with self._lock:
+            return len(self._calls)
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Process-wide Supabase client registry.
+
+Creating a Supabase client builds its PostgREST, auth and storage
+sub-clients, which is too expensive to repeat for every request. Managers
+borrow a shared client from this registry instead. Clients are created
+lazily and rebuilt after a fork so gunicorn workers never share sockets.
+"""
+
+import os
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+from supabase import create_client, Client
+
+logger = logging.getLogger(__name__)
+
+_clients: Dict[Tuple[str, str], Client] = {}
+_clients_pid: Optional[int] = None
+_lock = threading.Lock()
+
+
+def get_supabase_client(url: str, key: str) -> Client:
+    """Return the shared Supabase client for a URL and key, creating it on first use.
+
+    Args:
+        url: The Supabase project URL
+        key: The Supabase service role key
+
+    Raises:
+        ValueError: If the URL or key is missing
+    """
+    global _clients_pid
+
+    if not url or not key:
+        raise ValueError("Missing Supabase configuration. Check your environment variables.")
+
+    pid = os.getpid()
+    cache_key = (url, key)
+    with _lock:
+        if _clients_pid != pid:
+            # Forked worker: drop clients inherited from the parent process
+            _clients.clear()
+            _clients_pid = pid
+
+        client = _clients.get(cache_key)
+        if client is None:
+            client = create_client(url, key)
+            _clients[cache_key] = client
+            logger.info(f"Created shared Supabase client for {url}")
+
+    return client
+
+
+def reset_supabase_clients() -> None:
+    """Drop all shared clients, e.g. after rotating keys."""
+    with _lock:
+        _clients.clear()
@@ -8,6 +8,7 @@ CREATE SCHEMA IF NOT EXISTS secure_operations;
 -- IMPORTANT: Set appropriate RLS policies to restrict access
 CREATE TABLE IF NOT EXISTS secure_operations.merge_config (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    organization_id UUID NOT NULL,
     api_key TEXT NOT NULL,
     account_token TEXT NOT NULL,
     account_id TEXT,
@@ -17,6 +18,11 @@ CREATE TABLE IF NOT EXISTS secure_operations.merge_config (
     is_active BOOLEAN DEFAULT TRUE
 );
 
+-- Existing installs kept a single, shared configuration
+ALTER TABLE secure_operations.merge_config ADD COLUMN IF NOT EXISTS organization_id UUID;
+CREATE INDEX IF NOT EXISTS merge_config_organization_id_idx
+    ON secure_operations.merge_config (organization_id, updated_at DESC);
+
 -- Table RLS: Only allow administrators to modify the config
 ALTER TABLE secure_operations.merge_config ENABLE ROW LEVEL SECURITY;
 
@@ -32,9 +38,10 @@ CREATE POLICY "Only administrators can modify merge_config"
         SELECT user_id FROM administrators WHERE is_active = TRUE
     ));
 
--- Function to get a Merge token
+-- Function to get the Merge token of an organization
 -- This is the function that will be called by your Python script
-CREATE OR REPLACE FUNCTION public.get_merge_token()
+DROP FUNCTION IF EXISTS public.get_merge_token();
+CREATE OR REPLACE FUNCTION public.get_merge_token(organization_id UUID)
 RETURNS JSONB
 LANGUAGE plpgsql SECURITY DEFINER
 AS $$
@@ -42,20 +49,21 @@ DECLARE
     config_record RECORD;
     result JSONB;
 BEGIN
-    -- Verify the user is authenticated
-    IF auth.uid() IS NULL THEN
+    -- Verify the user is authenticated (the sync service uses the service role)
+    IF auth.uid() IS NULL AND auth.role() <> 'service_role' THEN
         RAISE EXCEPTION 'Authentication required';
     END IF;
     
-    -- Get the most recent active token
+    -- Get the most recent active token of the organization
     SELECT * INTO config_record 
-    FROM secure_operations.merge_config 
-    WHERE is_active = TRUE
-    ORDER BY updated_at DESC
+    FROM secure_operations.merge_config AS config
+    WHERE config.is_active = TRUE
+      AND config.organization_id = get_merge_token.organization_id
+    ORDER BY config.updated_at DESC
     LIMIT 1;
     
     IF config_record IS NULL THEN
-        RAISE EXCEPTION 'No active Merge configuration found';
+        RAISE EXCEPTION 'No active Merge configuration found for organization %', get_merge_token.organization_id;
     END IF;
     
     -- Check if token is expired and needs refresh
@@ -76,8 +84,8 @@ END;
 $$;
 
 -- Grant access to the function - adjust as needed for your auth setup
-GRANT EXECUTE ON FUNCTION public.get_merge_token() TO authenticated;
+GRANT EXECUTE ON FUNCTION public.get_merge_token(UUID) TO authenticated, service_role;
 
 -- Example insert for testing (REMOVE THIS IN PRODUCTION)
--- INSERT INTO secure_operations.merge_config (api_key, account_token, expires_at)
--- VALUES ('YOUR_API_KEY', 'YOUR_ACCOUNT_TOKEN', NOW() + INTERVAL '30 days'); 
\ No newline at end of file
+-- INSERT INTO secure_operations.merge_config (organization_id, api_key, account_token, expires_at)
+-- VALUES ('YOUR_ORGANIZATION_ID', 'YOUR_API_KEY', 'YOUR_ACCOUNT_TOKEN', NOW() + INTERVAL '30 days'); 
\ No newline at end of file
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Background execution of sync jobs.
+
+Large tenants can take longer to sync than gunicorn's worker timeout, so the
+sync routes can hand the work to an in-process thread pool instead and return
+a job id straight away. Jobs are started by a SyncScheduler (see
+sync_scheduler.py), which caps concurrent syncs per organization and takes
+organizations in turn. Job status and progress counters are kept in memory
+per worker process and exposed through ``GET /sync/status/<job_id>``.
+
+With several worker processes, a status request can reach a worker other
+than the one running the job. With SYNC_JOB_PERSIST (on by default when
+WEB_CONCURRENCY is above 1), job status is also written to the sync_jobs
+table in Supabase, and workers look up jobs they do not know there.
+"""
+
+import os
+import time
+import uuid
+import logging
+import threading
+import traceback
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import candidates_manager
+from supabase_client import get_supabase_client
+from sync_scheduler import PRIORITY_INTERACTIVE, SYNC_JOB_PER_ORG_LIMIT, SyncScheduler
+from sync_state import SyncJobStore
+
+logger = logging.getLogger(__name__)
+
+# Threads per worker process running sync jobs
+SYNC_JOB_WORKERS = int(os.environ.get("SYNC_JOB_WORKERS", "2"))
+
+# Finished jobs kept in memory for status lookups
+SYNC_JOB_HISTORY = int(os.environ.get("SYNC_JOB_HISTORY", "500"))
+
+# Write job status to the sync_jobs table so every worker process can report it
+SYNC_JOB_PERSIST = os.environ.get(
+    "SYNC_JOB_PERSIST",
+    "true" if int(os.environ.get("WEB_CONCURRENCY", "1")) > 1 else "false"
+).lower() in ("true", "1", "yes")
+
+# Seconds between writes of a running job's progress counters
+SYNC_JOB_PERSIST_INTERVAL_SECONDS = float(os.environ.get("SYNC_JOB_PERSIST_INTERVAL_SECONDS", "5"))
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class SyncJob:
+    """Status and progress of a single background sync."""
+
+    def __init__(self, entity: str, organization_id: str, source: str, priority: str = PRIORITY_INTERACTIVE,
+                 on_progress: Optional[Callable[["SyncJob"], None]] = None):
+        """Initialize a queued job.
+
+        Args:
+            entity: The entity being synced
+            organization_id: The organization the sync belongs to
+            source: "merge_api" or "csv"
+            priority: The scheduler lane the job runs in
+            on_progress: Optional callback invoked after each progress update
+        """
+        self.id = str(uuid.uuid4())
+        self.entity = entity
+        self.organization_id = organization_id
+        self.source = source
+        self.priority = priority
+        self.status = JOB_QUEUED
+        self.progress: Dict[str, Any] = {}
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = _now()
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+        self._on_progress = on_progress
+        self._lock = threading.Lock()
+
+    def update_progress(self, **counters: Any) -> None:
+        """Merge new progress counters into the job. Safe to call from any thread."""
+        with self._lock:
+            self.progress.update(counters)
+        if self._on_progress:
+            self._on_progress(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a JSON-serializable snapshot of the job."""
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "entity": self.entity,
+                "organization_id": self.organization_id,
+                "source": self.source,
+                "priority": self.priority,
+                "status": self.status,
+                "progress": dict(self.progress),
+                "result": self.result,
+                "error": self.error,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at
+            }
+
+
+class SyncJobRunner:
+    """Runs sync jobs on a bounded, per-organization fair thread pool and keeps their status."""
+
+    def __init__(self, max_workers: int = SYNC_JOB_WORKERS, history: int = SYNC_JOB_HISTORY,
+                 per_org_limit: int = SYNC_JOB_PER_ORG_LIMIT, persist: bool = False):
+        """Initialize the runner.
+
+        Args:
+            max_workers: Number of jobs that run at the same time
+            history: Number of jobs remembered for status lookups
+            per_org_limit: Number of jobs of one organization that run at the same time
+            persist: If True, also record job status in the sync_jobs table
+        """
+        self.max_workers = max_workers
+        self.history = history
+        self.persist = persist
+        # Job id -> time its progress was last written to the sync_jobs table
+        self._persisted_at: Dict[str, float] = {}
+        self.scheduler = SyncScheduler(max_workers, per_org_limit=per_org_limit)
+        self._jobs: "OrderedDict[str, SyncJob]" = OrderedDict()
+        # Queued or running jobs by coalesce key, so duplicates attach to them
+        self._active: Dict[Hashable, SyncJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, entity: str, organization_id: str, source: str,
+               func: Callable[[SyncJob], Dict[str, Any]], priority: str = PRIORITY_INTERACTIVE,
+               coalesce_key: Optional[Hashable] = None) -> SyncJob:
+        """Queue a sync and return its job.
+
+        Args:
+            entity: The entity being synced
+            organization_id: The organization the sync belongs to
+            source: "merge_api" or "csv"
+            func: Callable that performs the sync. It receives the job so it
+                  can report progress, and returns the result counts.
+            priority: PRIORITY_INTERACTIVE for syncs a user is waiting on, or
+                      PRIORITY_NIGHTLY for scheduled batch syncs
+            coalesce_key: Optional key identifying identical syncs. While a job
+                          with the same key and priority is queued or running,
+                          that job is returned instead of queueing another.
+        """
+        key = (coalesce_key, priority) if coalesce_key is not None else None
+
+        with self._lock:
+            active = self._active.get(key) if key else None
+            if active:
+                logger.info(f"Attached {entity} sync for organization {organization_id} to in-flight job {active.id}")
+                return active
+
+            job = SyncJob(entity, organization_id, source, priority,
+                          on_progress=self._save_progress if self.persist else None)
+            if key:
+                self._active[key] = job
+            self._jobs[job.id] = job
+            excess = len(self._jobs) - self.history
+            if excess > 0:
+                # Forget the oldest finished jobs; queued and running ones are still polled
+                finished = [job_id for job_id, held in self._jobs.items()
+                            if held.status not in (JOB_QUEUED, JOB_RUNNING)]
+                for job_id in finished[:excess]:
+                    del self._jobs[job_id]
+
+        self._save(job)
+        self.scheduler.submit(organization_id, lambda: self._run(job, func, key), priority)
+        logger.info(f"Queued {priority} {entity} sync job {job.id} for organization {organization_id}")
+        return job
+
+    def _run(self, job: SyncJob, func: Callable[[SyncJob], Dict[str, Any]], key: Optional[Hashable] = None) -> None:
+        with job._lock:
+            job.status = JOB_RUNNING
+            job.started_at = _now()
+        self._save(job)
+
+        try:
+            result = func(job)
+            with job._lock:
+                job.result = result
+                job.status = JOB_SUCCEEDED
+            logger.info(f"Sync job {job.id} finished: {result}")
+        except Exception as e:
+            logger.error(f"Sync job {job.id} failed: {str(e)}")
+            logger.error(traceback.format_exc())
+            with job._lock:
+                job.error = str(e)
+                job.status = JOB_FAILED
+        finally:
+            with job._lock:
+                job.finished_at = _now()
+            self._save(job)
+            with self._lock:
+                self._persisted_at.pop(job.id, None)
+                if key and self._active.get(key) is job:
+                    del self._active[key]
+
+    def _store(self) -> SyncJobStore:
+        # Job status is kept in the Supabase project the managers write to
+        return SyncJobStore(get_supabase_client(candidates_manager.SUPABASE_URL, candidates_manager.SUPABASE_KEY))
+
+    def _save(self, job: SyncJob) -> None:
+        """Record a job in the sync_jobs table when persistence is on."""
+        if not self.persist:
+            return
+        with self._lock:
+            self._persisted_at[job.id] = time.monotonic()
+        self._store().save(job.to_dict())
+
+    def _save_progress(self, job: SyncJob) -> None:
+        """Record a running job's progress, at most every SYNC_JOB_PERSIST_INTERVAL_SECONDS."""
+        with self._lock:
+            last = self._persisted_at.get(job.id, 0.0)
+            if time.monotonic() - last < SYNC_JOB_PERSIST_INTERVAL_SECONDS:
+                return
+        self._save(job)
+
+    def get(self, job_id: str) -> Optional[SyncJob]:
+        """Return a job by id, or None if it is unknown to this worker."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def get_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a snapshot of a job, from this worker or else from the sync_jobs table.
+
+        Returns:
+            The job as returned by SyncJob.to_dict(), or None if it is unknown
+        """
+        job = self.get(job_id)
+        if job:
+            return job.to_dict()
+        if self.persist:
+            return self._store().get(job_id)
+        return None
+
+
+# Singleton instance for easy import
+sync_job_runner = SyncJobRunner(persist=SYNC_JOB_PERSIST)
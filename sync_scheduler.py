@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Fair scheduling of sync jobs across organizations.
+
+Every queued sync belongs to an organization and a priority lane. Jobs start
+on a bounded thread pool while two caps hold: the pool size across all
+organizations, and a per-organization limit so one large tenant cannot hold
+every worker. Within a lane, organizations take turns (round-robin), so a
+tenant with hundreds of queued syncs only delays the others by one job each.
+Interactive syncs go ahead of nightly ones, but after a run of interactive
+starts a waiting nightly job is let through so the batch lane keeps moving.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Deque, Dict, List, Optional
+
+from metrics import SYNC_JOBS_RUNNING, SYNC_QUEUE_DEPTH, SYNC_QUEUE_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_NIGHTLY = "nightly"
+
+# Lanes in the order they are served
+PRIORITIES = (PRIORITY_INTERACTIVE, PRIORITY_NIGHTLY)
+
+# Syncs of one organization that may run at the same time
+SYNC_JOB_PER_ORG_LIMIT = int(os.environ.get("SYNC_JOB_PER_ORG_LIMIT", "1"))
+
+# Interactive jobs started in a row before a waiting nightly job gets a worker
+SYNC_JOB_INTERACTIVE_WEIGHT = int(os.environ.get("SYNC_JOB_INTERACTIVE_WEIGHT", "4"))
+
+
+class _Task:
+    """A queued unit of work and when it was queued."""
+
+    __slots__ = ("organization_id", "priority", "run", "queued_at")
+
+    def __init__(self, organization_id: str, priority: str, run: Callable[[], None]):
+        self.organization_id = organization_id
+        self.priority = priority
+        self.run = run
+        self.queued_at = time.monotonic()
+
+
+class SyncScheduler:
+    """Runs queued work with global and per-organization caps and round-robin fairness."""
+
+    def __init__(self, max_workers: int, per_org_limit: int = SYNC_JOB_PER_ORG_LIMIT,
+                 interactive_weight: int = SYNC_JOB_INTERACTIVE_WEIGHT):
+        """Initialize the scheduler.
+
+        Args:
+            max_workers: Jobs that run at the same time across all organizations
+            per_org_limit: Jobs of one organization that run at the same time
+            interactive_weight: Interactive jobs started in a row while nightly
+                                jobs are waiting
+        """
+        self.max_workers = max_workers
+        self.per_org_limit = max(1, per_org_limit)
+        self.interactive_weight = max(1, interactive_weight)
+        # Per lane, the organizations with queued work in round-robin order
+        self._queues: Dict[str, "OrderedDict[str, Deque[_Task]]"] = {
+            priority: OrderedDict() for priority in PRIORITIES
+        }
+        self._running_per_org: Dict[str, int] = {}
+        self._running = 0
+        self._interactive_streak = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_pid: Optional[int] = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # Threads do not survive a fork, so each worker process starts its own pool
+        pid = os.getpid()
+        if self._executor is None or self._executor_pid != pid:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="sync-job")
+            self._executor_pid = pid
+        return self._executor
+
+    def submit(self, organization_id: str, run: Callable[[], None], priority: str = PRIORITY_INTERACTIVE) -> None:
+        """Queue work for an organization; it starts as soon as both caps allow.
+
+        Args:
+            organization_id: The organization the work belongs to
+            run: Callable performing the work; exceptions are logged
+            priority: PRIORITY_INTERACTIVE or PRIORITY_NIGHTLY
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority}. Expected one of {', '.join(PRIORITIES)}")
+
+        with self._lock:
+            self._queues[priority].setdefault(organization_id, deque()).append(_Task(organization_id, priority, run))
+            SYNC_QUEUE_DEPTH.labels(priority=priority).inc()
+            started = self._dispatch()
+        self._start(started)
+
+    def _pop_task(self, priority: str) -> Optional[_Task]:
+        """Take the next job of a lane from the first organization below its cap."""
+        queues = self._queues[priority]
+        for organization_id, queue in queues.items():
+            if self._running_per_org.get(organization_id, 0) >= self.per_org_limit:
+                continue
+            task = queue.popleft()
+            if queue:
+                # The organization waits for every other one before its next turn
+                queues.move_to_end(organization_id)
+            else:
+                del queues[organization_id]
+            return task
+        return None
+
+    def _next_task(self) -> Optional[_Task]:
+        if not self._queues[PRIORITY_NIGHTLY]:
+            self._interactive_streak = 0
+        lanes = PRIORITIES
+        if self._interactive_streak >= self.interactive_weight:
+            lanes = (PRIORITY_NIGHTLY, PRIORITY_INTERACTIVE)
+
+        for priority in lanes:
+            task = self._pop_task(priority)
+            if task:
+                self._interactive_streak = self._interactive_streak + 1 if priority == PRIORITY_INTERACTIVE else 0
+                return task
+        return None
+
+    def _dispatch(self) -> List[_Task]:
+        """Claim workers for as many queued jobs as the caps allow. Called with the lock held."""
+        started = []
+        while self._running < self.max_workers:
+            task = self._next_task()
+            if task is None:
+                break
+            self._running += 1
+            SYNC_QUEUE_DEPTH.labels(priority=task.priority).dec()
+            SYNC_JOBS_RUNNING.inc()
+            self._running_per_org[task.organization_id] = self._running_per_org.get(task.organization_id, 0) + 1
+            started.append(task)
+        return started
+
+    def _start(self, tasks: List[_Task]) -> None:
+        if tasks:
+            executor = self._get_executor()
+            for task in tasks:
+                executor.submit(self._execute, task)
+
+    def _execute(self, task: _Task) -> None:
+        SYNC_QUEUE_WAIT_SECONDS.labels(priority=task.priority).observe(time.monotonic() - task.queued_at)
+        try:
+            task.run()
+        except Exception as e:
+            logger.error(f"Scheduled job for organization {task.organization_id} failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._running -= 1
+                SYNC_JOBS_RUNNING.dec()
+                remaining = self._running_per_org.get(task.organization_id, 1) - 1
+                if remaining:
+                    self._running_per_org[task.organization_id] = remaining
+                else:
+                    self._running_per_org.pop(task.organization_id, None)
+                started = self._dispatch()
+            self._start(started)
+
+    def queue_depths(self) -> Dict[str, int]:
+        """Return the number of queued (not yet running) jobs per priority lane."""
+        with self._lock:
+            return {priority: sum(len(queue) for queue in queues.values())
+                    for priority, queues in self._queues.items()}
+
+    def running(self) -> int:
+        """Return the number of jobs currently running."""
+        with self._lock:
+            return self._running
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Per-tenant sync state stored in Supabase.
+
+Each successful Merge sync records a high-water mark per
+(organization_id, entity) so the next run only asks Merge for records
+modified since then. While a sync runs, the cursor of the next page after
+the last fully written batch is checkpointed in the same row, so a run that
+dies halfway is resumed instead of restarted.
+
+The status of background sync jobs is also kept in Supabase, in the
+sync_jobs table, so any worker process can answer a status lookup for a job
+queued by another one. See create_sync_state_table.sql for both tables.
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+SYNC_STATE_TABLE = "sync_state"
+SYNC_JOBS_TABLE = "sync_jobs"
+
+
+class SyncStateStore:
+    """Read and write sync watermarks and checkpoints in the sync_state table."""
+
+    def __init__(self, supabase):
+        """Initialize the store with a Supabase client."""
+        self.supabase = supabase
+
+    def _get(self, org_id: str, entity: str) -> Optional[Dict[str, Any]]:
+        response = self.supabase.table(SYNC_STATE_TABLE) \
+            .select("*") \
+            .eq("organization_id", org_id) \
+            .eq("entity", entity) \
+            .execute()
+        return response.data[0] if response.data else None
+
+    def _save(self, org_id: str, entity: str, values: Dict[str, Any]) -> None:
+        row = {
+            "organization_id": org_id,
+            "entity": entity,
+            "updated_at": datetime.now(timezone.utc).isoformat()
+        }
+        row.update(values)
+        self.supabase.table(SYNC_STATE_TABLE) \
+            .upsert(row, on_conflict="organization_id,entity") \
+            .execute()
+
+    def get_watermark(self, org_id: str, entity: str) -> Optional[str]:
+        """Return the modified_after watermark for an organization and entity.
+
+        Returns None when no successful sync has been recorded or the state
+        table cannot be read, which results in a full sync.
+        """
+        try:
+            state = self._get(org_id, entity)
+            return state.get("modified_after") if state else None
+        except Exception as e:
+            logger.warning(f"Could not read sync watermark for {entity} ({org_id}): {str(e)}")
+            return None
+
+    def set_watermark(self, org_id: str, entity: str, modified_after: str) -> None:
+        """Record the watermark for the next incremental sync."""
+        try:
+            self._save(org_id, entity, {"modified_after": modified_after})
+            logger.info(f"Recorded {entity} watermark {modified_after} for organization {org_id}")
+        except Exception as e:
+            logger.warning(f"Could not record sync watermark for {entity} ({org_id}): {str(e)}")
+
+    def get_checkpoint(self, org_id: str, entity: str) -> Optional[Dict[str, Any]]:
+        """Return the checkpoint of an interrupted sync, if there is one.
+
+        Returns:
+            Dict with the ``cursor`` to resume from, the ``started_at`` time of
+            the interrupted run and the ``modified_after`` value it used, or
+            None when the last run completed or the state cannot be read
+        """
+        try:
+            state = self._get(org_id, entity)
+        except Exception as e:
+            logger.warning(f"Could not read sync checkpoint for {entity} ({org_id}): {str(e)}")
+            return None
+
+        if not state or not state.get("cursor"):
+            return None
+        return {
+            "cursor": state["cursor"],
+            "started_at": state.get("cursor_started_at"),
+            "modified_after": state.get("cursor_modified_after")
+        }
+
+    def save_checkpoint(self, org_id: str, entity: str, cursor: str, started_at: str,
+                        modified_after: Optional[str]) -> None:
+        """Record the page to resume from if the current sync is interrupted."""
+        try:
+            self._save(org_id, entity, {
+                "cursor": cursor,
+                "cursor_started_at": started_at,
+                "cursor_modified_after": modified_after
+            })
+        except Exception as e:
+            logger.warning(f"Could not record sync checkpoint for {entity} ({org_id}): {str(e)}")
+
+    def clear_checkpoint(self, org_id: str, entity: str) -> None:
+        """Forget the checkpoint once a sync has run to the end."""
+        try:
+            self._save(org_id, entity, {
+                "cursor": None,
+                "cursor_started_at": None,
+                "cursor_modified_after": None
+            })
+        except Exception as e:
+            logger.warning(f"Could not clear sync checkpoint for {entity} ({org_id}): {str(e)}")
+
+
+class SyncJobStore:
+    """Read and write background sync job status in the sync_jobs table."""
+
+    def __init__(self, supabase):
+        """Initialize the store with a Supabase client."""
+        self.supabase = supabase
+
+    def save(self, job: Dict[str, Any]) -> None:
+        """Record a snapshot of a job, as returned by SyncJob.to_dict()."""
+        row = dict(job, updated_at=datetime.now(timezone.utc).isoformat())
+        try:
+            self.supabase.table(SYNC_JOBS_TABLE) \
+                .upsert(row, on_conflict="job_id") \
+                .execute()
+        except Exception as e:
+            logger.warning(f"Could not record status of sync job {job.get('job_id')}: {str(e)}")
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return the last recorded snapshot of a job, or None if it is unknown or cannot be read."""
+        try:
+            response = self.supabase.table(SYNC_JOBS_TABLE) \
+                .select("*") \
+                .eq("job_id", job_id) \
+                .execute()
+        except Exception as e:
+            logger.warning(f"Could not read status of sync job {job_id}: {str(e)}")
+            return None
+        if not response.data:
+            return None
+        job = dict(response.data[0])
+        job.pop("updated_at", None)
+        return job
@@ -104,6 +104,54 @@ def test_csv_import():
             logger.error(f"CSV import test failed: {str(e)}")
             raise
 
+def test_resolve_page_references():
+    """Test that a page of applications is resolved with one query per table."""
+    logger.info("Testing batched reference resolution for applications")
+    
+    manager = ApplicationsManager()
+    manager.supabase = MagicMock()
+    
+    existing_candidate = str(uuid.uuid5(uuid.NAMESPACE_DNS, "merge-abc123"))
+    existing_job = str(uuid.uuid5(uuid.NAMESPACE_DNS, "merge-job-job-123"))
+    query = manager.supabase.table.return_value.select.return_value.in_.return_value
+    query.execute.side_effect = [
+        MagicMock(data=[{"id": existing_candidate}]),
+        MagicMock(data=[{"id": existing_job}])
+    ]
+    
+    page = SAMPLE_APPLICATIONS_RESPONSE["results"]
+    resolved = manager.resolve_page_references(page)
+    
+    # One lookup per table for the whole page
+    assert query.execute.call_count == 2
+    assert resolved["candidates"] == {"abc123": existing_candidate, "def456": None}
+    assert resolved["job_postings"] == {"job-123": existing_job, "job-456": None}
+    
+    application = manager.transform_merge_application(page[0], str(uuid.uuid4()), str(uuid.uuid4()), resolved=resolved)
+    assert application["candidate_id"] == existing_candidate
+    assert application["job_posting_id"] == existing_job
+
+def test_merge_token_rpc_is_called_per_organization():
+    """Each organization gets its own account token from the get_merge_token RPC."""
+    manager = ApplicationsManager()
+    manager.supabase = MagicMock()
+    manager.supabase.rpc.return_value.execute.side_effect = [
+        MagicMock(data={"token": "token-a"}),
+        MagicMock(data={"token": "token-b"})
+    ]
+    org_a = str(uuid.uuid4())
+    org_b = str(uuid.uuid4())
+    
+    assert manager.get_merge_token(org_id=org_a) == "token-a"
+    assert manager.get_merge_token(org_id=org_b) == "token-b"
+    assert manager.get_merge_token(org_id=org_a) == "token-a"
+    
+    calls = manager.supabase.rpc.call_args_list
+    assert [call.args for call in calls] == [
+        ("get_merge_token", {"organization_id": org_a}),
+        ("get_merge_token", {"organization_id": org_b})
+    ]
+
 def run_tests():
     """Run all tests."""
     try:
@@ -113,6 +161,9 @@ def run_tests():
         print("\n=== Testing Applications CSV Import ===\n")
         test_csv_import()
         
+        print("\n=== Testing Batched Reference Resolution ===\n")
+        test_resolve_page_references()
+        
         print("\nAll tests completed successfully!")
     except Exception as e:
         logger.error(f"Test failed: {str(e)}")
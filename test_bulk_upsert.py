@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+import logging
+import uuid
+from unittest.mock import MagicMock
+
+import bulk_upsert as bulk_upsert_module
+from bulk_upsert import HASH_COLUMN, bulk_upsert, content_hash, fetch_existing_ids
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def make_supabase(existing_rows):
+    """Build a mocked Supabase client whose select queries return existing_rows."""
+    supabase = MagicMock()
+    query = supabase.table.return_value
+    query.select.return_value.in_.return_value.execute.return_value.data = existing_rows
+    return supabase
+
+
+def test_fetch_existing_ids():
+    """Existing ids are looked up with a single in_ query."""
+    existing_id = str(uuid.uuid4())
+    supabase = make_supabase([{"id": existing_id}])
+
+    result = fetch_existing_ids(supabase, "candidates", [existing_id, str(uuid.uuid4())])
+
+    assert result == {existing_id}
+    assert supabase.table.return_value.select.return_value.in_.call_count == 1
+
+
+def test_bulk_upsert_counts():
+    """Inserted and updated counts come from the pre-fetched id set."""
+    existing_id = str(uuid.uuid4())
+    new_id = str(uuid.uuid4())
+    supabase = make_supabase([{"id": existing_id}])
+
+    records = [
+        {"id": existing_id, "name": "Existing"},
+        {"id": new_id, "name": "New"}
+    ]
+    prepared = {}
+
+    def prepare(record, exists):
+        prepared[record["id"]] = exists
+
+    result = bulk_upsert(supabase, "candidates", records, prepare=prepare)
+
+    assert result == {"inserted": 1, "updated": 1, "unchanged": 0, "failed": 0}
+    assert prepared == {existing_id: True, new_id: False}
+    upsert = supabase.table.return_value.upsert
+    assert upsert.call_count == 1
+    assert upsert.call_args.kwargs["on_conflict"] == "id"
+
+
+def test_bulk_upsert_batches():
+    """Records are sent in batches of the requested size."""
+    supabase = make_supabase([])
+    records = [{"id": str(uuid.uuid4()), "name": f"Candidate {i}"} for i in range(5)]
+
+    result = bulk_upsert(supabase, "candidates", records, batch_size=2)
+
+    assert result["inserted"] == 5
+    assert supabase.table.return_value.upsert.call_count == 3
+
+
+def test_bulk_upsert_row_fallback():
+    """A failing batch is retried row by row and failures are counted."""
+    supabase = make_supabase([])
+    execute = supabase.table.return_value.upsert.return_value.execute
+    execute.side_effect = [Exception("batch failed"), None, Exception("bad row")]
+
+    records = [{"id": str(uuid.uuid4())}, {"id": str(uuid.uuid4())}]
+    result = bulk_upsert(supabase, "interviews", records)
+
+    assert result == {"inserted": 1, "updated": 0, "unchanged": 0, "failed": 1}
+
+
+def test_unchanged_rows_are_skipped():
+    """Rows whose stored content hash matches are neither prepared nor written."""
+    same_id = str(uuid.uuid4())
+    changed_id = str(uuid.uuid4())
+    fields = ["name"]
+    supabase = make_supabase([
+        {"id": same_id, HASH_COLUMN: content_hash({"name": "Same"}, fields)},
+        {"id": changed_id, HASH_COLUMN: content_hash({"name": "Old"}, fields)}
+    ])
+    prepared = []
+
+    result = bulk_upsert(supabase, "job_postings", [
+        {"id": same_id, "name": "Same", "updated_at": "2024-01-01"},
+        {"id": changed_id, "name": "New", "updated_at": "2024-01-01"}
+    ], prepare=lambda record, exists: prepared.append(record["id"]), hash_fields=fields)
+
+    assert result == {"inserted": 0, "updated": 1, "unchanged": 1, "failed": 0}
+    assert prepared == [changed_id]
+    sent = supabase.table.return_value.upsert.call_args.args[0]
+    assert [row["id"] for row in sent] == [changed_id]
+    assert sent[0][HASH_COLUMN] == content_hash({"name": "New"}, fields)
+
+
+def test_missing_hash_column_falls_back_to_plain_upserts():
+    """Tables without a content_hash column are still written, without the column."""
+    supabase = MagicMock()
+    select = supabase.table.return_value.select
+    select.side_effect = lambda columns: MagicMock(**{"in_.return_value.execute.side_effect": Exception("column does not exist")}) \
+        if HASH_COLUMN in columns else MagicMock(**{"in_.return_value.execute.return_value.data": []})
+
+    try:
+        result = bulk_upsert(supabase, "legacy_table", [{"id": str(uuid.uuid4()), "name": "x"}], hash_fields=["name"])
+    finally:
+        bulk_upsert_module._tables_without_hash.discard("legacy_table")
+
+    assert result["inserted"] == 1
+    assert HASH_COLUMN not in supabase.table.return_value.upsert.call_args.args[0][0]
+
+
+def test_records_adopting_the_same_id_are_collapsed():
+    """Two new records matching one existing row by name are written once, as the last one."""
+    existing_id = str(uuid.uuid4())
+    supabase = MagicMock()
+    select = supabase.table.return_value.select
+    # The id lookup finds nothing, the name lookup finds the existing row
+    select.return_value.in_.return_value.execute.side_effect = [
+        MagicMock(data=[]),
+        MagicMock(data=[{"id": existing_id, "name": "Ada Lovelace"}])
+    ]
+
+    records = [
+        {"id": str(uuid.uuid4()), "name": "Ada Lovelace", "email": "old@example.com"},
+        {"id": str(uuid.uuid4()), "name": "Ada Lovelace", "email": "new@example.com"}
+    ]
+    result = bulk_upsert(supabase, "candidates", records, match_column="name")
+
+    assert result == {"inserted": 0, "updated": 1, "unchanged": 0, "failed": 0}
+    upsert = supabase.table.return_value.upsert
+    assert upsert.call_count == 1
+    assert upsert.call_args.args[0] == [{"id": existing_id, "name": "Ada Lovelace", "email": "new@example.com"}]
+
+
+def test_rows_matched_by_name_are_compared_with_their_stored_hash():
+    """A record that adopts an existing id by name is skipped when that row's hash is unchanged."""
+    existing_id = str(uuid.uuid4())
+    fields = ["name", "email"]
+    record = {"id": str(uuid.uuid4()), "name": "Ada Lovelace", "email": "ada@example.com"}
+    supabase = MagicMock()
+    select = supabase.table.return_value.select
+    # Hashes by the new id, then the name match, then hashes by the adopted id
+    select.return_value.in_.return_value.execute.side_effect = [
+        MagicMock(data=[]),
+        MagicMock(data=[{"id": existing_id, "name": "Ada Lovelace"}]),
+        MagicMock(data=[{"id": existing_id, HASH_COLUMN: content_hash(record, fields)}])
+    ]
+
+    result = bulk_upsert(supabase, "candidates", [record], match_column="name", hash_fields=fields)
+
+    assert result == {"inserted": 0, "updated": 0, "unchanged": 1, "failed": 0}
+    assert select.return_value.in_.call_args.args == ("id", [existing_id])
+    supabase.table.return_value.upsert.assert_not_called()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+import io
+
+from csv_import import import_csv_in_chunks
+
+
+def test_each_chunk_is_upserted_before_the_next_is_read():
+    """A file is processed chunk by chunk and the counts are summed."""
+    csv_file = io.StringIO("name\n" + "".join(f"row-{i}\n" for i in range(5)))
+    batches = []
+    progress = []
+
+    def upsert(records):
+        batches.append(records)
+        return {"inserted": len(records), "updated": 0}
+
+    results = import_csv_in_chunks(
+        csv_file,
+        lambda df: df.to_dict("records"),
+        upsert,
+        required_cols=["name"],
+        chunk_size=2,
+        progress=lambda **counters: progress.append(counters)
+    )
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert results == {"inserted": 5, "updated": 0, "unchanged": 0, "failed": 0}
+    assert progress[-1] == {"stage": "done", "chunks": 3, "rows": 5, "inserted": 5, "updated": 0, "unchanged": 0, "failed": 0}
+
+
+def test_missing_required_columns_fail_before_any_upsert():
+    """Required columns are checked on the first chunk."""
+    upserted = []
+    try:
+        import_csv_in_chunks(io.StringIO("email\na@example.com\n"), lambda df: [], upserted.append,
+                             required_cols=["name"])
+        assert False, "Expected a ValueError"
+    except ValueError as e:
+        assert "name" in str(e)
+    assert upserted == []
+
+
+def test_missing_required_columns_fail_for_a_file_without_rows():
+    """A header-only file is still checked for required columns."""
+    for content in ("email\n", "\n"):
+        try:
+            import_csv_in_chunks(io.StringIO(content), lambda df: [], lambda records: {},
+                                 required_cols=["name"])
+            assert False, "Expected a ValueError"
+        except ValueError as e:
+            assert "name" in str(e)
+
+
+def test_key_columns_read_as_text_format_the_same_in_every_chunk():
+    """Numeric-looking keys keep their spelling whether or not a chunk has blanks."""
+    from candidates_manager import CSV_KEY_DTYPES
+    csv_file = io.StringIO("first_name,last_name,email\n1,2,\n3,,\n")
+    chunks = []
+
+    import_csv_in_chunks(csv_file, lambda df: chunks.append(df["last_name"].astype(str).tolist()) or [],
+                         lambda records: {}, chunk_size=1, dtype=CSV_KEY_DTYPES)
+
+    assert chunks == [["2"], ["nan"]]
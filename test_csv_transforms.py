@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+import uuid
+
+import pandas as pd
+
+from csv_transforms import (
+    bool_column, frame_to_records, key_column, list_column, normalize_upper, numeric_column, time_column,
+    uuid5_column, with_id_column
+)
+
+
+def test_ids_match_row_by_row_derivation():
+    """Deterministic ids must not change, so re-imports keep updating the same rows."""
+    df = pd.DataFrame({"name": ["Engineer", "Designer"], "code": ["ENG-1", float("nan")]})
+    keys = key_column(df, "name", "") + "-" + key_column(df, "code", "")
+    ids = with_id_column(df, uuid5_column("csv-job-", keys))
+
+    assert list(ids) == [
+        str(uuid.uuid5(uuid.NAMESPACE_DNS, "csv-job-Engineer-ENG-1")),
+        str(uuid.uuid5(uuid.NAMESPACE_DNS, "csv-job-Designer-nan"))
+    ]
+
+
+def test_column_parsers():
+    """Booleans, lists, numbers, statuses and times are parsed a whole column at a time."""
+    df = pd.DataFrame({
+        "remote": ["TRUE", "no", None],
+        "skills": ["Python, SQL", None, ""],
+        "years": [8, None, 3],
+        "status": ["applied", "Hired", "unknown"],
+        "when": ["2023-06-05T10:00:00Z", "2023-06-06", None]
+    })
+
+    assert list(bool_column(df, "remote")) == [True, False, False]
+    assert list(list_column(df, "skills")) == [["Python", "SQL"], [], []]
+    assert list(normalize_upper(df["status"].str.strip(), ["APPLIED", "HIRED", "OTHER"])) == ["APPLIED", "HIRED", "OTHER"]
+    assert list(time_column(df["when"])) == ["10:00", "00:00", None]
+
+    records = frame_to_records(pd.DataFrame({"years": numeric_column(df, "years")}))
+    assert records == [{"years": 8}, {"years": None}, {"years": 3}]
+    assert type(records[0]["years"]) is int
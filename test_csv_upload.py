@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+import io
+import gzip
+import base64
+
+import pandas as pd
+from flask import Flask
+
+from routes.csv_upload import get_sync_request
+
+CSV_CONTENT = b"name,code\nEngineer,ENG-1\nDesigner,DES-2\n"
+
+app = Flask(__name__)
+
+
+def test_raw_csv_body_with_fields_in_query_string():
+    """A text/csv body is streamed to the parser and flags are parsed from strings."""
+    with app.test_request_context("/?user_id=u&organization_id=o&async=false&chunk_size=500",
+                                  method="POST", data=CSV_CONTENT, content_type="text/csv"):
+        data, csv_file = get_sync_request()
+        assert data == {"user_id": "u", "organization_id": "o", "async": False, "chunk_size": 500}
+        assert list(pd.read_csv(csv_file)["name"]) == ["Engineer", "Designer"]
+
+
+def test_gzipped_multipart_upload():
+    """A gzipped multipart file is decompressed on the fly."""
+    form = {
+        "user_id": "u",
+        "organization_id": "o",
+        "csv_file": (io.BytesIO(gzip.compress(CSV_CONTENT)), "jobs.csv.gz")
+    }
+    with app.test_request_context("/", method="POST", data=form, content_type="multipart/form-data"):
+        data, csv_file = get_sync_request()
+        assert data == {"user_id": "u", "organization_id": "o"}
+        assert list(pd.read_csv(csv_file)["code"]) == ["ENG-1", "DES-2"]
+
+
+def test_base64_json_body_still_supported():
+    """The original JSON body with base64 CSV content keeps working."""
+    body = {"user_id": "u", "organization_id": "o", "csv_file": base64.b64encode(CSV_CONTENT).decode()}
+    with app.test_request_context("/", method="POST", json=body):
+        data, csv_file = get_sync_request()
+        assert data["user_id"] == "u"
+        assert csv_file.read() == CSV_CONTENT
+
+    with app.test_request_context("/", method="POST", json={"user_id": "u", "organization_id": "o"}):
+        assert get_sync_request() == ({"user_id": "u", "organization_id": "o"}, None)
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+import logging
+
+import candidates_manager
+from http_client import get_session
+from supabase import create_client
+from fake_services import FakeMergeAPI, FakePostgREST
+from benchmark import run_size
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def test_fake_merge_paginates():
+    """The fake Merge API pages through a collection with next cursors."""
+    with FakeMergeAPI({"candidates": 25}, page_size=10) as merge_api:
+        url = f"{merge_api.base_url}/candidates"
+        ids = []
+        while url:
+            data = get_session().get(url, headers={"X-Account-Token": "token"}).json()
+            ids.extend(record["remote_id"] for record in data["results"])
+            url = data["next"]
+
+    assert ids == [f"cand-{index}" for index in range(25)]
+    assert merge_api.requests == 3
+
+
+def test_fake_postgrest_upsert_and_filters():
+    """The supabase client can upsert into and filter the in-memory tables."""
+    with FakePostgREST() as postgrest:
+        client = create_client(postgrest.url, candidates_manager.SUPABASE_KEY)
+        client.table("candidates").upsert([{"id": "a", "status": "Active"}, {"id": "b", "status": "Active"}],
+                                          on_conflict="id").execute()
+        client.table("candidates").upsert({"id": "a", "status": "Hired"}, on_conflict="id").execute()
+
+        found = client.table("candidates").select("id").in_("id", ["a", "c"]).execute().data
+        hired = client.table("candidates").select("*").eq("status", "Hired").execute().data
+
+    assert found == [{"id": "a"}]
+    assert hired == [{"id": "a", "status": "Hired"}]
+    assert len(postgrest.rows("candidates")) == 2
+
+
+def test_benchmark_covers_every_path():
+    """A small benchmark run times fetch, upsert and CSV import for every entity."""
+    original_url = candidates_manager.SUPABASE_URL
+    results = run_size(30)
+
+    paths = {(result["entity"], result["path"]) for result in results}
+    assert ("candidates", "fetch_merge_candidates (cold)") in paths
+    assert ("interviews", "import_from_csv") in paths
+    assert len(results) == 20
+
+    # Cold fetches resolve references through PostgREST, warm ones from the id cache
+    fetches = {result["path"]: result for result in results if result["entity"] == "applications"}
+    assert fetches["fetch_merge_applications (cold)"]["postgrest_requests"] > 0
+    assert fetches["fetch_merge_applications (warm)"]["postgrest_requests"] == 0
+
+    unchanged = [result for result in results if result["path"].endswith("(unchanged)")]
+    assert all(result["counts"]["unchanged"] == result["rows"] for result in unchanged)
+    assert all(result["counts"]["failed"] == 0 for result in results if "counts" in result)
+    # The managers point back at the real project afterwards
+    assert candidates_manager.SUPABASE_URL == original_url
+
+
+def test_expanded_fetch_writes_missing_parents():
+    """With expand, embedded candidates, jobs and applications are written instead of looked up."""
+    from benchmark import managers_pointed_at, BENCHMARK_USER_ID, BENCHMARK_ORG_ID, BENCHMARK_ACCOUNT_TOKEN
+    from applications_manager import ApplicationsManager
+    from interviews_manager import InterviewsManager
+
+    counts = {"candidates": 5, "job-postings": 2, "applications": 5, "interviews": 5}
+    with FakeMergeAPI(counts) as merge_api, FakePostgREST() as postgrest, \
+            managers_pointed_at(postgrest.url, merge_api.base_url):
+        applications = ApplicationsManager().fetch_merge_applications(
+            BENCHMARK_USER_ID, BENCHMARK_ORG_ID, user_token=BENCHMARK_ACCOUNT_TOKEN, expand=True)
+        interviews = InterviewsManager().fetch_merge_interviews(
+            BENCHMARK_USER_ID, BENCHMARK_ORG_ID, user_token=BENCHMARK_ACCOUNT_TOKEN, expand=True)
+
+        assert len(postgrest.rows("candidates")) == 5
+        assert len(postgrest.rows("job_postings")) == 2
+        assert len(postgrest.rows("applications")) == 5
+
+    assert all(application["candidate_id"] and application["job_posting_id"] for application in applications)
+    assert {interview["candidate_id"] for interview in interviews} == \
+        {application["candidate_id"] for application in applications}
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+import logging
+import threading
+from unittest.mock import MagicMock, patch
+
+import full_sync
+from full_sync import run_full_sync
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def fake_managers():
+    """Replace the manager classes with mocks that remember their instances."""
+    instances = {}
+
+    def factory(entity):
+        def create():
+            instances[entity] = MagicMock()
+            return instances[entity]
+        return create
+
+    return {entity: factory(entity) for entity in full_sync.ENTITY_MANAGERS}, instances
+
+
+def test_stages_run_in_dependency_order_with_a_shared_cache():
+    """Candidates and job postings run together, then applications, then interviews."""
+    managers, instances = fake_managers()
+    order = []
+    first_stage = threading.Barrier(2, timeout=5)
+
+    def fake_sync(manager, entity, *args, **kwargs):
+        if entity in ("candidates", "job_postings"):
+            # Both first-stage entities must be running at the same time
+            first_stage.wait()
+        order.append(entity)
+        manager.id_cache.set(entity, f"{entity}-id")
+        return {"inserted": 1, "updated": 0, "failed": 0}
+
+    with patch.dict(full_sync.ENTITY_MANAGERS, managers), patch('full_sync.run_merge_sync', side_effect=fake_sync):
+        summary = run_full_sync("user", "org", test_mode=True)
+
+    assert set(order[:2]) == {"candidates", "job_postings"}
+    assert order[2:] == ["applications", "interviews"]
+    assert summary["errors"] == {} and summary["skipped"] == []
+
+    # Every stage shares one cache, so ids written earlier are visible later
+    cache = instances["interviews"].id_cache
+    assert all(instance.id_cache is cache for instance in instances.values())
+    assert cache.get("candidates", "candidates-id")
+
+
+def test_failed_stage_skips_dependent_stages():
+    """Applications and interviews are not synced when a dependency failed."""
+    managers, _ = fake_managers()
+
+    def fake_sync(manager, entity, *args, **kwargs):
+        if entity == "job_postings":
+            raise RuntimeError("Merge is down")
+        return {"inserted": 1, "updated": 0, "failed": 0}
+
+    with patch.dict(full_sync.ENTITY_MANAGERS, managers), patch('full_sync.run_merge_sync', side_effect=fake_sync):
+        summary = run_full_sync("user", "org", test_mode=True)
+
+    assert list(summary["results"]) == ["candidates"]
+    assert summary["errors"] == {"job_postings": "Merge is down"}
+    assert summary["skipped"] == ["applications", "interviews"]
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+import logging
+from unittest.mock import patch
+
+import http_client
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def test_session_is_shared():
+    """Every caller in a process gets the same pooled session."""
+    assert http_client.get_session() is http_client.get_session()
+
+
+def test_session_recreated_after_fork():
+    """A forked worker does not reuse the parent's pooled session."""
+    parent = http_client.get_session()
+    with patch('http_client.os.getpid', return_value=-1):
+        child = http_client.get_session()
+    assert child is not parent
+
+
+def test_pool_stats_shape():
+    """Pool statistics report the configured pool size."""
+    http_client.get_session()
+    stats = http_client.pool_stats()
+    assert stats["pool_maxsize"] == http_client.HTTP_POOL_MAXSIZE
+    assert stats["connections_opened"] == 0
+    assert stats["pools"] == []
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+import logging
+import uuid
+from unittest.mock import MagicMock, patch
+
+from id_cache import IdCache, id_cache
+from bulk_upsert import bulk_upsert
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def test_hits_and_misses():
+    """Lookups are counted as hits or misses."""
+    cache = IdCache(max_size=10, ttl_seconds=60)
+    entity_id = str(uuid.uuid4())
+
+    assert cache.get("candidates", entity_id) is None
+    cache.set("candidates", entity_id)
+    assert cache.get("candidates", entity_id) is True
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_ratio"] == 0.5
+
+
+def test_lru_eviction():
+    """The least recently used entry is evicted when the cache is full."""
+    cache = IdCache(max_size=2, ttl_seconds=60)
+    cache.set("candidates", "a")
+    cache.set("candidates", "b")
+    cache.get("candidates", "a")
+    cache.set("candidates", "c")
+
+    assert cache.get("candidates", "a") is True
+    assert cache.get("candidates", "b") is None
+    assert cache.stats()["size"] == 2
+
+
+def test_ttl_expiry():
+    """Entries are dropped once their TTL has passed."""
+    cache = IdCache(max_size=10, ttl_seconds=30)
+
+    with patch("id_cache.time.monotonic", return_value=100.0):
+        cache.set("jobs", "job-1")
+    with patch("id_cache.time.monotonic", return_value=120.0):
+        assert cache.get("jobs", "job-1") is True
+    with patch("id_cache.time.monotonic", return_value=131.0):
+        assert cache.get("jobs", "job-1") is None
+
+
+def test_bulk_upsert_fills_cache():
+    """Rows written by bulk_upsert are known to exist without a lookup."""
+    supabase = MagicMock()
+    supabase.table.return_value.select.return_value.in_.return_value.execute.return_value.data = []
+    application_id = str(uuid.uuid4())
+    candidate_id = str(uuid.uuid4())
+
+    bulk_upsert(supabase, "applications", [
+        {"id": application_id, "candidate_id": candidate_id, "job_posting_id": None}
+    ], cache_fields=["candidate_id", "job_posting_id"])
+
+    assert id_cache.get("applications", application_id) == {
+        "candidate_id": candidate_id,
+        "job_posting_id": None
+    }
+
+
+def test_child_cache_reads_through_and_writes_to_parent():
+    """A run-scoped cache falls back to its parent and keeps it up to date."""
+    parent = IdCache(max_size=10, ttl_seconds=30)
+    child = IdCache(max_size=10, ttl_seconds=30, parent=parent)
+
+    parent.set("candidates", "known")
+    assert child.get("candidates", "known") is True
+
+    child.set("candidates", "written")
+    assert parent.get("candidates", "written") is True
+
+    # The child keeps its own copy even after the parent evicts it
+    parent.clear()
+    assert child.get("candidates", "known") is True
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+import io
+import os
+import time
+import logging
+import tempfile
+from unittest.mock import patch
+
+from app import app
+from idempotency import IdempotencyStore, idempotency_store, REPLAYED_HEADER
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+SYNC_BODY = {"user_id": "user", "organization_id": "org", "test_mode": True}
+
+
+def test_repeated_key_replays_the_stored_response():
+    """A retry with the same Idempotency-Key gets the first response without syncing again."""
+    idempotency_store.clear()
+    client = app.test_client()
+    result = {"inserted": 2, "updated": 0, "unchanged": 0}
+
+    with patch('routes.candidates.run_coalesced_merge_sync', return_value=result) as mock_sync:
+        first = client.post('/sync/candidates/', json=SYNC_BODY, headers={"Idempotency-Key": "retry-1"})
+        second = client.post('/sync/candidates/', json=SYNC_BODY, headers={"Idempotency-Key": "retry-1"})
+        # Another key, or the same key on another endpoint, is a different sync
+        client.post('/sync/candidates/', json=SYNC_BODY, headers={"Idempotency-Key": "retry-2"})
+        client.post('/sync/candidates/', json=SYNC_BODY)
+
+    assert mock_sync.call_count == 3
+    assert first.status_code == second.status_code == 200
+    assert second.get_json() == first.get_json()
+    assert second.headers.get(REPLAYED_HEADER) == "true"
+    assert REPLAYED_HEADER not in first.headers
+
+
+def test_errors_are_not_stored():
+    """A failed sync runs again when retried with the same key."""
+    idempotency_store.clear()
+    client = app.test_client()
+
+    with patch('routes.candidates.run_coalesced_merge_sync', side_effect=[RuntimeError("Merge is down"),
+                                                                         {"inserted": 1, "updated": 0}]):
+        failed = client.post('/sync/candidates/', json=SYNC_BODY, headers={"Idempotency-Key": "retry-3"})
+        retried = client.post('/sync/candidates/', json=SYNC_BODY, headers={"Idempotency-Key": "retry-3"})
+
+    assert failed.status_code == 500
+    assert retried.status_code == 200
+    assert REPLAYED_HEADER not in retried.headers
+
+
+
+def test_keys_are_scoped_to_the_organization():
+    """Two organizations that send the same key each get their own sync."""
+    idempotency_store.clear()
+    client = app.test_client()
+    other_org = dict(SYNC_BODY, organization_id="other-org")
+
+    with patch('routes.candidates.run_coalesced_merge_sync',
+               side_effect=[{"inserted": 1, "updated": 0}, {"inserted": 5, "updated": 0}]) as mock_sync:
+        first = client.post('/sync/candidates/', json=SYNC_BODY, headers={"Idempotency-Key": "shared"})
+        second = client.post('/sync/candidates/', json=other_org, headers={"Idempotency-Key": "shared"})
+
+    assert mock_sync.call_count == 2
+    assert mock_sync.call_args.args[3] == "other-org"
+    assert second.status_code == 200
+    assert REPLAYED_HEADER not in second.headers
+    assert second.get_json() != first.get_json()
+
+
+def test_keys_are_scoped_to_the_caller():
+    """The same key sent with another Authorization header is a different sync."""
+    idempotency_store.clear()
+    client = app.test_client()
+
+    with patch('routes.candidates.run_coalesced_merge_sync', return_value={"inserted": 1}) as mock_sync:
+        client.post('/sync/candidates/', json=SYNC_BODY,
+                    headers={"Idempotency-Key": "retry-4", "Authorization": "Bearer token-a"})
+        second = client.post('/sync/candidates/', json=SYNC_BODY,
+                             headers={"Idempotency-Key": "retry-4", "Authorization": "Bearer token-b"})
+
+    assert mock_sync.call_count == 2
+    assert REPLAYED_HEADER not in second.headers
+
+
+def test_reused_key_with_a_different_body_is_rejected():
+    """A key already used for one request cannot be replayed for another."""
+    idempotency_store.clear()
+    client = app.test_client()
+
+    with patch('routes.candidates.run_coalesced_merge_sync', return_value={"inserted": 1}) as mock_sync:
+        client.post('/sync/candidates/', json=SYNC_BODY, headers={"Idempotency-Key": "retry-5"})
+        changed = client.post('/sync/candidates/', json=dict(SYNC_BODY, full_resync=True),
+                              headers={"Idempotency-Key": "retry-5"})
+
+    assert mock_sync.call_count == 1
+    assert changed.status_code == 422
+    assert REPLAYED_HEADER not in changed.headers
+
+
+def test_multipart_uploads_are_fingerprinted_by_content():
+    """Replaying a multipart upload requires the same file; the file still reaches the route."""
+    idempotency_store.clear()
+    client = app.test_client()
+
+    def upload(content):
+        return client.post('/sync/candidates/', content_type="multipart/form-data",
+                           headers={"Idempotency-Key": "upload-1"},
+                           data={"user_id": "user", "organization_id": "org",
+                                 "csv_file": (io.BytesIO(content), "candidates.csv")})
+
+    imported = []
+
+    def import_from_csv(csv_file, user_id, organization_id, chunk_size=None):
+        imported.append(csv_file.read())
+        return {"inserted": 1}
+
+    with patch('routes.candidates.CandidatesManager') as mock_manager:
+        mock_manager.return_value.import_from_csv.side_effect = import_from_csv
+        first = upload(b"name\nAda\n")
+        same = upload(b"name\nAda\n")
+        changed = upload(b"name\nGrace\n")
+
+    assert first.status_code == 200
+    assert imported == [b"name\nAda\n"]
+    assert same.headers.get(REPLAYED_HEADER) == "true"
+    assert changed.status_code == 422
+
+
+def test_sqlite_store_persists_and_expires():
+    """Responses written to SQLite are read back by a new store until their TTL passes."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "idempotency.sqlite3")
+        IdempotencyStore(sqlite_path=path).put("key", 200, '{"inserted": 1}', "fingerprint")
+
+        assert IdempotencyStore(sqlite_path=path).get("key") == (200, '{"inserted": 1}', "fingerprint")
+        assert IdempotencyStore(sqlite_path=path, ttl_seconds=0.01).get("other") is None
+
+        time.sleep(0.02)
+        assert IdempotencyStore(sqlite_path=path, ttl_seconds=0.01).get("key") is None
+
+
+
+def test_queued_job_responses_are_not_persisted():
+    """A 202 points at an in-memory job, so only its own process replays it."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "idempotency.sqlite3")
+        store = IdempotencyStore(sqlite_path=path)
+        store.put("queued", 202, '{"job_id": "abc"}', "fingerprint")
+        store.put("done", 200, '{"inserted": 1}', "fingerprint")
+
+        assert store.get("queued") == (202, '{"job_id": "abc"}', "fingerprint")
+        restarted = IdempotencyStore(sqlite_path=path)
+        assert restarted.get("queued") is None
+        assert restarted.get("done") == (200, '{"inserted": 1}', "fingerprint")
+
+
+def test_memory_store_is_bounded():
+    """The least recently used response is evicted beyond max_size."""
+    store = IdempotencyStore(max_size=2, sqlite_path=None)
+    store.put("a", 200, "{}")
+    store.put("b", 200, "{}")
+    store.get("a")
+    store.put("c", 200, "{}")
+
+    assert store.get("a") and store.get("c")
+    assert store.get("b") is None
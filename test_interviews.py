@@ -3,7 +3,9 @@ import logging
 import uuid
 import json
 from unittest.mock import patch, MagicMock
+import pandas as pd
 from interviews_manager import InterviewsManager
+from id_cache import IdCache
 
 # Configure logging
 logging.basicConfig(
@@ -115,6 +117,62 @@ def test_csv_import():
             logger.error(f"CSV import test failed: {str(e)}")
             raise
 
+def test_csv_application_lookup_is_batched():
+    """Applications referenced by a CSV chunk are resolved with one in_ query, not one query per row."""
+    application_ids = [str(uuid.uuid4()) for _ in range(3)]
+    candidate_id = str(uuid.uuid4())
+    
+    manager = InterviewsManager()
+    manager.id_cache = IdCache(max_size=100, ttl_seconds=60)
+    manager.supabase = MagicMock()
+    query = manager.supabase.table.return_value.select.return_value.in_
+    query.return_value.execute.return_value.data = [
+        {"id": application_ids[0], "candidate_id": candidate_id, "job_posting_id": None}
+    ]
+    
+    df = pd.DataFrame({
+        "application_id": application_ids + [application_ids[0], "not-a-uuid"],
+        "interview_date": ["2023-06-05T10:00:00Z"] * 5,
+        "interview_type": ["PHONE", "PHONE", "PHONE", "TECHNICAL", "PHONE"]
+    })
+    interviews = manager.transform_csv_frame(df, str(uuid.uuid4()), str(uuid.uuid4()))
+    
+    assert query.call_count == 1
+    assert sorted(query.call_args.args[1]) == sorted(application_ids)
+    assert [interview.get("candidate_id") for interview in interviews] == [candidate_id, None, None, candidate_id, None]
+    
+    # A second chunk referencing the same application is answered from the id cache
+    manager.transform_csv_frame(df.head(1), str(uuid.uuid4()), str(uuid.uuid4()))
+    assert query.call_count == 1
+
+def test_page_application_lookup_is_batched():
+    """A Merge page resolves its applications and their jobs with one in_ query per table."""
+    merge_ids = ["app-1", "app-2", "app-3"]
+    application_ids = [str(uuid.uuid5(uuid.NAMESPACE_DNS, f"merge-app-{merge_id}")) for merge_id in merge_ids]
+    candidate_id = str(uuid.uuid4())
+    job_ids = [str(uuid.uuid4()), str(uuid.uuid4())]
+    
+    manager = InterviewsManager()
+    manager.id_cache = IdCache(max_size=100, ttl_seconds=60)
+    tables = {"applications": MagicMock(), "jobs": MagicMock()}
+    manager.supabase = MagicMock()
+    manager.supabase.table.side_effect = lambda name: tables[name]
+    tables["applications"].select.return_value.in_.return_value.execute.return_value.data = [
+        {"id": application_ids[0], "candidate_id": candidate_id, "job_posting_id": job_ids[0]},
+        {"id": application_ids[1], "candidate_id": candidate_id, "job_posting_id": job_ids[1]}
+    ]
+    tables["jobs"].select.return_value.in_.return_value.execute.return_value.data = [{"id": job_ids[0]}]
+    
+    resolved = manager.resolve_page_applications(merge_ids + ["app-1"])
+    
+    assert tables["applications"].select.return_value.in_.call_count == 1
+    assert tables["jobs"].select.return_value.in_.call_count == 1
+    assert resolved == {
+        "app-1": {"candidate_id": candidate_id, "job_id": job_ids[0]},
+        "app-2": {"candidate_id": candidate_id, "job_id": None},
+        "app-3": None
+    }
+
 def run_tests():
     """Run all tests."""
     try:
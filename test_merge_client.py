@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+import logging
+import threading
+from unittest.mock import patch, MagicMock
+
+import requests
+
+import merge_client
+from merge_client import MergeAPIError, iter_merge_pages
+from rate_limiter import TokenBucket
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+PAGES = {
+    "https://merge.test/candidates": {"results": [{"id": 1}], "next": "https://merge.test/candidates?cursor=2"},
+    "https://merge.test/candidates?cursor=2": {"results": [{"id": 2}], "next": "https://merge.test/candidates?cursor=3"},
+    "https://merge.test/candidates?cursor=3": {"results": [{"id": 3}], "next": None}
+}
+
+
+def fake_get(url, **kwargs):
+    """Serve pages from the PAGES fixture."""
+    response = MagicMock(status_code=200, headers={})
+    response.json.return_value = PAGES[url]
+    return response
+
+
+def test_pages_in_order():
+    """Prefetched pages are yielded in cursor order."""
+    for depth in (0, 1, 3):
+        with patch('merge_client.get_session', return_value=MagicMock(get=MagicMock(side_effect=fake_get))):
+            pages = list(iter_merge_pages("https://merge.test/candidates", {}, prefetch_depth=depth))
+        assert [page["results"][0]["id"] for page in pages] == [1, 2, 3]
+
+
+def test_request_error_is_raised():
+    """A failed page raises after the pages already fetched instead of ending silently."""
+    def failing_get(url, **kwargs):
+        if url.endswith("cursor=2"):
+            raise requests.RequestException("boom")
+        return fake_get(url)
+
+    pages = []
+    with patch('merge_client.get_session', return_value=MagicMock(get=MagicMock(side_effect=failing_get))):
+        try:
+            for page in iter_merge_pages("https://merge.test/candidates", {}, prefetch_depth=2):
+                pages.append(page)
+            raised = False
+        except MergeAPIError:
+            raised = True
+
+    assert raised
+    assert len(pages) == 1
+
+
+def test_consumer_can_stop_early():
+    """Closing the generator early does not hang the producer."""
+    with patch('merge_client.get_session', return_value=MagicMock(get=MagicMock(side_effect=fake_get))):
+        pages = iter_merge_pages("https://merge.test/candidates", {}, prefetch_depth=1)
+        first = next(pages)
+        pages.close()
+
+        # Let the producer notice the cancellation before the patch is removed
+        for thread in threading.enumerate():
+            if thread.name.startswith("merge-prefetch"):
+                thread.join(timeout=5)
+                assert not thread.is_alive()
+
+    assert first["results"][0]["id"] == 1
+
+
+def error_response(status_code, headers=None):
+    """Build a failed response that raises like requests does."""
+    response = MagicMock(status_code=status_code, headers=headers or {})
+    response.raise_for_status.side_effect = requests.HTTPError(f"{status_code} error", response=response)
+    return response
+
+
+def test_rate_limited_page_is_retried_after_retry_after():
+    """A 429 pauses the shared limiter for Retry-After and retries the same cursor."""
+    responses = {"https://merge.test/candidates?cursor=2": [error_response(429, {"Retry-After": "7"})]}
+    requested = []
+
+    def flaky_get(url, **kwargs):
+        requested.append(url)
+        queued = responses.get(url)
+        return queued.pop(0) if queued else fake_get(url)
+
+    limiter = TokenBucket(rate=1000, capacity=1000)
+    with patch('merge_client.get_session', return_value=MagicMock(get=MagicMock(side_effect=flaky_get))), \
+            patch('merge_client.get_rate_limiter', return_value=limiter), \
+            patch.object(limiter, 'pause') as pause:
+        pages = list(iter_merge_pages("https://merge.test/candidates", {}, prefetch_depth=0))
+
+    assert [page["results"][0]["id"] for page in pages] == [1, 2, 3]
+    assert requested.count("https://merge.test/candidates?cursor=2") == 2
+    pause.assert_called_once_with(7.0)
+
+
+
+def test_long_retry_after_is_honoured_beyond_the_backoff_cap():
+    """Retry-After is waited out in full; only the exponential backoff is capped."""
+    wait = merge_client.MERGE_BACKOFF_MAX_SECONDS * 2
+    responses = {"https://merge.test/candidates?cursor=2": [error_response(429, {"Retry-After": str(wait)})]}
+
+    def flaky_get(url, **kwargs):
+        queued = responses.get(url)
+        return queued.pop(0) if queued else fake_get(url)
+
+    limiter = TokenBucket(rate=1000, capacity=1000)
+    with patch('merge_client.get_session', return_value=MagicMock(get=MagicMock(side_effect=flaky_get))), \
+            patch('merge_client.get_rate_limiter', return_value=limiter), \
+            patch.object(limiter, 'pause') as pause:
+        pages = list(iter_merge_pages("https://merge.test/candidates", {}, prefetch_depth=0))
+
+    assert len(pages) == 3
+    pause.assert_called_once_with(wait)
+
+
+def test_retry_after_beyond_the_limit_fails_with_the_resume_cursor():
+    """A wait longer than MERGE_RETRY_AFTER_MAX_SECONDS fails the page at once instead of sleeping."""
+    wait = merge_client.MERGE_RETRY_AFTER_MAX_SECONDS + 60
+    requested = []
+
+    def limited_get(url, **kwargs):
+        requested.append(url)
+        if url.endswith("cursor=2"):
+            return error_response(429, {"Retry-After": str(wait)})
+        return fake_get(url)
+
+    limiter = TokenBucket(rate=1000, capacity=1000)
+    with patch('merge_client.get_session', return_value=MagicMock(get=MagicMock(side_effect=limited_get))), \
+            patch('merge_client.get_rate_limiter', return_value=limiter), \
+            patch.object(limiter, 'pause') as pause:
+        try:
+            list(iter_merge_pages("https://merge.test/candidates", {}, prefetch_depth=0))
+            assert False, "Expected a MergeAPIError"
+        except MergeAPIError as e:
+            assert e.resume_url == "https://merge.test/candidates?cursor=2"
+            assert e.status_code == 429 and e.retryable
+
+    assert requested.count("https://merge.test/candidates?cursor=2") == 1
+    pause.assert_not_called()
+
+
+def test_exhausted_retries_report_the_resume_cursor():
+    """When a page keeps failing the error carries the URL to resume from."""
+    def failing_get(url, **kwargs):
+        if url.endswith("cursor=2"):
+            return error_response(503)
+        return fake_get(url)
+
+    with patch('merge_client.get_session', return_value=MagicMock(get=MagicMock(side_effect=failing_get))), \
+            patch('merge_client.get_rate_limiter', return_value=TokenBucket(rate=0, capacity=1)), \
+            patch('merge_client.time.sleep') as sleep:
+        try:
+            list(iter_merge_pages("https://merge.test/candidates", {}, prefetch_depth=0))
+            assert False, "Expected a MergeAPIError"
+        except MergeAPIError as e:
+            assert e.resume_url == "https://merge.test/candidates?cursor=2"
+
+    # Backoff between every attempt, never above the configured maximum
+    assert sleep.call_count == merge_client.MERGE_MAX_RETRIES
+    assert all(call.args[0] <= merge_client.MERGE_BACKOFF_MAX_SECONDS for call in sleep.call_args_list)
+
+
+
+def test_rejected_account_token_is_refreshed_once():
+    """A 401 asks for a new account token and retries the same page with it, only once."""
+    refreshes = []
+
+    def refresh_token():
+        refreshes.append(True)
+        return next(tokens)
+
+    def token_get(url, headers=None, **kwargs):
+        if headers["X-Account-Token"] == "revoked" or (url.endswith("cursor=3") and headers["X-Account-Token"] == "fresh"):
+            return error_response(401)
+        return fake_get(url)
+
+    for depth in (0, 1):
+        tokens = iter(["fresh", "newer"])
+        refreshes.clear()
+        with patch('merge_client.get_session', return_value=MagicMock(get=MagicMock(side_effect=token_get))), \
+                patch('merge_client.get_rate_limiter', return_value=TokenBucket(rate=1000, capacity=1000)):
+            pages = []
+            try:
+                for page in iter_merge_pages("https://merge.test/candidates", {"X-Account-Token": "revoked"},
+                                             prefetch_depth=depth, refresh_token=refresh_token):
+                    pages.append(page)
+                assert False, "Expected a MergeAPIError"
+            except MergeAPIError as e:
+                # The second 401 is not retried again
+                assert e.status_code == 401
+                assert e.resume_url == "https://merge.test/candidates?cursor=3"
+
+        assert [page["results"][0]["id"] for page in pages] == [1, 2]
+        assert len(refreshes) == 1
+
+
+def test_token_bucket_waits_when_empty():
+    """An empty bucket sleeps for the time needed to earn the next token."""
+    bucket = TokenBucket(rate=2, capacity=1)
+    with patch('rate_limiter.time.monotonic', return_value=100.0), patch('rate_limiter.time.sleep') as sleep:
+        bucket._updated_at = 100.0
+        assert bucket.acquire() == 0.0
+        sleep.side_effect = lambda seconds: setattr(bucket, "_tokens", 1.0)
+        assert bucket.acquire() == 0.5
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+import logging
+import threading
+import time
+import uuid
+from unittest.mock import MagicMock, patch
+
+from merge_client import MERGE_BASE_URL, MergeAPIError, MergePage
+from merge_sync import in_flight_syncs, run_merge_sync, run_coalesced_merge_sync, sync_key
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def make_manager(upsert_result):
+    """Build a mocked candidates manager."""
+    manager = MagicMock()
+    manager.iter_merge_candidates.return_value = iter([[{"id": str(uuid.uuid4())}]])
+    manager.upsert_candidates.side_effect = lambda records: dict(upsert_result)
+    return manager
+
+
+def test_incremental_sync_uses_watermark():
+    """The stored watermark is passed to Merge and advanced after a clean sync."""
+    manager = make_manager({"inserted": 1, "updated": 0, "failed": 0})
+    org_id = str(uuid.uuid4())
+
+    with patch('merge_sync.SyncStateStore') as mock_store:
+        store = mock_store.return_value
+        store.get_checkpoint.return_value = None
+        store.get_watermark.return_value = "2024-01-01T00:00:00+00:00"
+
+        results = run_merge_sync(manager, "candidates", "user", org_id)
+
+    assert manager.iter_merge_candidates.call_args.kwargs["modified_after"] == "2024-01-01T00:00:00+00:00"
+    assert results["modified_after"] == "2024-01-01T00:00:00+00:00"
+    store.set_watermark.assert_called_once()
+    assert store.set_watermark.call_args.args[:2] == (org_id, "candidates")
+
+
+def test_full_resync_ignores_watermark():
+    """full_resync fetches everything regardless of the stored watermark."""
+    manager = make_manager({"inserted": 1, "updated": 0, "failed": 0})
+
+    with patch('merge_sync.SyncStateStore') as mock_store:
+        run_merge_sync(manager, "candidates", "user", "org", full_resync=True)
+
+    mock_store.return_value.get_watermark.assert_not_called()
+    assert manager.iter_merge_candidates.call_args.kwargs["modified_after"] is None
+
+
+def test_failed_rows_keep_watermark():
+    """The watermark is not advanced when some rows could not be written."""
+    manager = make_manager({"inserted": 0, "updated": 0, "failed": 1})
+
+    with patch('merge_sync.SyncStateStore') as mock_store:
+        mock_store.return_value.get_checkpoint.return_value = None
+        mock_store.return_value.get_watermark.return_value = None
+        run_merge_sync(manager, "candidates", "user", "org")
+
+    mock_store.return_value.set_watermark.assert_not_called()
+
+
+def test_pages_are_streamed_in_batches():
+    """Pages are written in bounded batches as they arrive."""
+    manager = MagicMock()
+    pages = [[{"id": f"{page}-{i}"} for i in range(3)] for page in range(4)]
+    manager.iter_merge_candidates.return_value = iter(pages)
+    batch_sizes = []
+
+    def upsert(records):
+        batch_sizes.append(len(records))
+        return {"inserted": len(records), "updated": 0, "failed": 0}
+
+    manager.upsert_candidates.side_effect = upsert
+
+    with patch('merge_sync.SyncStateStore') as mock_store:
+        mock_store.return_value.get_checkpoint.return_value = None
+        mock_store.return_value.get_watermark.return_value = None
+        results = run_merge_sync(manager, "candidates", "user", "org", batch_size=5)
+
+    assert batch_sizes == [6, 6]
+    assert results["inserted"] == 12
+
+
+def test_checkpoints_follow_written_batches():
+    """The next cursor is checkpointed after each batch and cleared at the end."""
+    manager = MagicMock()
+    pages = [MergePage([{"id": f"{page}-{i}"} for i in range(3)], next_url=f"{MERGE_BASE_URL}/candidates?cursor={page + 1}")
+             for page in range(3)]
+    pages[-1].next_url = None
+    manager.iter_merge_candidates.return_value = iter(pages)
+    manager.upsert_candidates.side_effect = lambda records: {"inserted": len(records), "updated": 0, "failed": 0}
+
+    with patch('merge_sync.SyncStateStore') as mock_store:
+        store = mock_store.return_value
+        store.get_checkpoint.return_value = None
+        store.get_watermark.return_value = None
+        run_merge_sync(manager, "candidates", "user", "org", batch_size=3)
+
+    cursors = [call.args[2] for call in store.save_checkpoint.call_args_list]
+    assert cursors == [f"{MERGE_BASE_URL}/candidates?cursor=1", f"{MERGE_BASE_URL}/candidates?cursor=2"]
+    store.clear_checkpoint.assert_called_once_with("org", "candidates")
+    store.set_watermark.assert_called_once()
+
+
+def test_interrupted_sync_resumes_from_checkpoint():
+    """A saved checkpoint is resumed with the interrupted run's watermark and start time."""
+    manager = make_manager({"inserted": 1, "updated": 0, "failed": 0})
+    checkpoint = {
+        "cursor": f"{MERGE_BASE_URL}/candidates?cursor=42",
+        "started_at": "2024-02-01T00:00:00+00:00",
+        "modified_after": "2024-01-01T00:00:00+00:00"
+    }
+
+    with patch('merge_sync.SyncStateStore') as mock_store:
+        store = mock_store.return_value
+        store.get_checkpoint.return_value = checkpoint
+        results = run_merge_sync(manager, "candidates", "user", "org")
+
+    kwargs = manager.iter_merge_candidates.call_args.kwargs
+    assert kwargs["cursor"] == checkpoint["cursor"]
+    assert kwargs["modified_after"] == checkpoint["modified_after"]
+    assert results["resumed"]
+    store.get_watermark.assert_not_called()
+    store.set_watermark.assert_called_once_with("org", "candidates", checkpoint["started_at"])
+
+
+
+def test_rejected_checkpoint_restarts_from_watermark():
+    """A checkpoint cursor Merge rejects with a 4xx is dropped and the sync starts over from the watermark."""
+    manager = make_manager({"inserted": 1, "updated": 0, "failed": 0})
+    checkpoint = {
+        "cursor": f"{MERGE_BASE_URL}/candidates?cursor=expired",
+        "started_at": "2024-02-01T00:00:00+00:00",
+        "modified_after": "2024-01-01T00:00:00+00:00"
+    }
+
+    def stale_pages():
+        raise MergeAPIError("400 Client Error", resume_url=checkpoint["cursor"], status_code=400)
+        yield
+
+    manager.iter_merge_candidates.side_effect = [stale_pages(), iter([[{"id": "1"}]])]
+
+    with patch('merge_sync.SyncStateStore') as mock_store:
+        store = mock_store.return_value
+        store.get_checkpoint.return_value = checkpoint
+        store.get_watermark.return_value = "2024-01-15T00:00:00+00:00"
+        results = run_merge_sync(manager, "candidates", "user", "org")
+
+    kwargs = manager.iter_merge_candidates.call_args.kwargs
+    assert kwargs["cursor"] is None
+    assert kwargs["modified_after"] == "2024-01-15T00:00:00+00:00"
+    assert results["inserted"] == 1
+    assert not results["resumed"]
+    assert store.clear_checkpoint.call_count == 2
+    store.set_watermark.assert_called_once()
+    assert store.set_watermark.call_args.args[2] != checkpoint["started_at"]
+
+
+def test_transient_error_keeps_checkpoint():
+    """A resumed sync that fails with a retryable error keeps its checkpoint for the next run."""
+    manager = make_manager({"inserted": 1, "updated": 0, "failed": 0})
+
+    def failing_pages():
+        raise MergeAPIError("503 Server Error", status_code=503)
+        yield
+
+    manager.iter_merge_candidates.side_effect = [failing_pages()]
+
+    with patch('merge_sync.SyncStateStore') as mock_store:
+        store = mock_store.return_value
+        store.get_checkpoint.return_value = {
+            "cursor": f"{MERGE_BASE_URL}/candidates?cursor=42",
+            "started_at": None,
+            "modified_after": None
+        }
+        try:
+            run_merge_sync(manager, "candidates", "user", "org")
+            assert False, "expected MergeAPIError"
+        except MergeAPIError:
+            pass
+
+    store.clear_checkpoint.assert_not_called()
+
+
+def test_identical_concurrent_syncs_share_one_run():
+    """A sync requested while an identical one is running waits for it instead of running again."""
+    org_id = str(uuid.uuid4())
+    started = threading.Event()
+    release = threading.Event()
+    manager = make_manager({"inserted": 1, "updated": 0, "failed": 0})
+
+    def pages(*args, **kwargs):
+        started.set()
+        release.wait(5)
+        yield [{"id": str(uuid.uuid4())}]
+
+    manager.iter_merge_candidates.side_effect = pages
+    results = []
+
+    with patch('merge_sync.SyncStateStore') as mock_store:
+        mock_store.return_value.get_checkpoint.return_value = None
+        mock_store.return_value.get_watermark.return_value = None
+
+        first = threading.Thread(target=lambda: results.append(
+            run_coalesced_merge_sync(manager, "candidates", "user-1", org_id)))
+        first.start()
+        assert started.wait(5)
+        # A different user of the same organization joins the running sync
+        second = threading.Thread(target=lambda: results.append(
+            run_coalesced_merge_sync(make_manager({}), "candidates", "user-2", org_id)))
+        second.start()
+        deadline = time.monotonic() + 5
+        while not in_flight_syncs.waiters(sync_key("candidates", org_id)) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        release.set()
+        first.join(5)
+        second.join(5)
+
+        # Other options or another entity are not identical and run on their own
+        run_coalesced_merge_sync(manager, "candidates", "user-1", org_id, full_resync=True)
+
+    assert manager.iter_merge_candidates.call_count == 2
+    assert len(results) == 2 and results[0] is results[1]
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+import time
+import logging
+import threading
+import uuid
+from unittest.mock import MagicMock
+
+from prometheus_client import REGISTRY
+
+import metrics
+from sync_scheduler import SyncScheduler, PRIORITY_NIGHTLY
+from bulk_upsert import bulk_upsert
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def sample(name, **labels):
+    """Return the current value of a series, or 0 if it has none."""
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_scheduler_keeps_queue_gauges_current():
+    """Queued and running jobs are reflected in the gauges, and released when they finish."""
+    scheduler = SyncScheduler(max_workers=1)
+    release = threading.Event()
+    done = threading.Event()
+    queued_before = sample("sync_queue_depth", priority=PRIORITY_NIGHTLY)
+    running_before = sample("sync_jobs_running")
+
+    scheduler.submit("org-a", release.wait, PRIORITY_NIGHTLY)
+    scheduler.submit("org-b", done.set, PRIORITY_NIGHTLY)
+
+    assert sample("sync_queue_depth", priority=PRIORITY_NIGHTLY) == queued_before + 1
+    assert sample("sync_jobs_running") == running_before + 1
+
+    release.set()
+    assert done.wait(5)
+    deadline = time.monotonic() + 5
+    while scheduler.running() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert sample("sync_queue_depth", priority=PRIORITY_NIGHTLY) == queued_before
+    assert sample("sync_jobs_running") == running_before
+
+
+def test_bulk_upsert_records_rows_and_latency():
+    """Writes are counted per entity, without the organization, and each batch is timed."""
+    org_id = str(uuid.uuid4())
+    supabase = MagicMock()
+    supabase.table.return_value.select.return_value.in_.return_value.execute.return_value.data = []
+    batches_before = sample("supabase_upsert_batch_seconds_count", entity="metrics_test")
+    rows_before = sample("sync_rows_total", entity="metrics_test", result="inserted")
+
+    bulk_upsert(supabase, "metrics_test", [
+        {"id": str(uuid.uuid4()), "organization_id": org_id},
+        {"id": str(uuid.uuid4()), "organization_id": org_id}
+    ])
+
+    assert sample("sync_rows_total", entity="metrics_test", result="inserted") == rows_before + 2
+    assert sample("supabase_upsert_batch_seconds_count", entity="metrics_test") == batches_before + 1
+    assert org_id not in metrics.render_metrics().decode("utf-8")
+
+
+def test_metrics_endpoint():
+    """GET /metrics serves the Prometheus text format to loopback callers when no token is set."""
+    from app import app
+
+    response = app.test_client().get('/metrics')
+    body = response.get_data(as_text=True)
+
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain")
+    assert "# TYPE merge_page_fetch_seconds histogram" in body
+    assert "# TYPE sync_rows_total counter" in body
+    assert "id_cache_lookups_total{" in body
+
+
+def test_metrics_endpoint_requires_token():
+    """With METRICS_TOKEN set, only requests bearing it are served, wherever they come from."""
+    from app import app
+
+    original = metrics.METRICS_TOKEN
+    metrics.METRICS_TOKEN = "secret"
+    try:
+        client = app.test_client()
+        assert client.get('/metrics').status_code == 403
+        assert client.get('/metrics', headers={"Authorization": "Bearer wrong"}).status_code == 403
+        response = client.get('/metrics', headers={"Authorization": "Bearer secret"},
+                              environ_base={"REMOTE_ADDR": "10.0.0.5"})
+        assert response.status_code == 200
+    finally:
+        metrics.METRICS_TOKEN = original
+
+
+def test_metrics_endpoint_rejects_remote_callers_without_token():
+    """Without METRICS_TOKEN, requests from other hosts are refused."""
+    from app import app
+
+    response = app.test_client().get('/metrics', environ_base={"REMOTE_ADDR": "10.0.0.5"})
+
+    assert response.status_code == 403
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+import logging
+from unittest.mock import patch, MagicMock
+
+import supabase_client
+from candidates_manager import CandidatesManager
+from applications_manager import ApplicationsManager
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def test_client_created_once():
+    """Repeated lookups reuse one client per URL and key."""
+    supabase_client.reset_supabase_clients()
+    with patch('supabase_client.create_client', side_effect=lambda url, key: MagicMock()) as mock_create:
+        first = supabase_client.get_supabase_client("https://example.supabase.co", "key")
+        second = supabase_client.get_supabase_client("https://example.supabase.co", "key")
+        other = supabase_client.get_supabase_client("https://example.supabase.co", "other-key")
+
+    assert first is second
+    assert other is not first
+    assert mock_create.call_count == 2
+    supabase_client.reset_supabase_clients()
+
+
+def test_client_recreated_after_fork():
+    """A forked worker builds its own client."""
+    supabase_client.reset_supabase_clients()
+    with patch('supabase_client.create_client', side_effect=lambda url, key: MagicMock()):
+        parent = supabase_client.get_supabase_client("https://example.supabase.co", "key")
+        with patch('supabase_client.os.getpid', return_value=-1):
+            child = supabase_client.get_supabase_client("https://example.supabase.co", "key")
+
+    assert child is not parent
+    supabase_client.reset_supabase_clients()
+
+
+def test_managers_share_client():
+    """Managers borrow the same client instead of creating their own."""
+    assert CandidatesManager().supabase is ApplicationsManager().supabase
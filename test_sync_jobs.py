@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+import time
+import logging
+import threading
+import unittest
+from unittest.mock import patch
+
+from app import app
+from sync_jobs import SyncJobRunner, sync_job_runner, JOB_SUCCEEDED, JOB_FAILED
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def wait_for(job, timeout=5.0):
+    """Wait until a job has finished."""
+    deadline = time.monotonic() + timeout
+    while job.to_dict()["finished_at"] is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return job.to_dict()
+
+
+class SyncJobsTestCase(unittest.TestCase):
+    """Test case for background sync jobs."""
+
+    def setUp(self):
+        """Set up test client."""
+        self.app = app.test_client()
+        self.app.testing = True
+
+    def test_job_succeeds_with_progress(self):
+        """A job records its progress counters and result."""
+        runner = SyncJobRunner(max_workers=1)
+
+        def run(job):
+            job.update_progress(stage="upserting", fetched=2)
+            return {"inserted": 2, "updated": 0}
+
+        job = wait_for(runner.submit("candidates", "org", "merge_api", run))
+        self.assertEqual(job["status"], JOB_SUCCEEDED)
+        self.assertEqual(job["progress"]["fetched"], 2)
+        self.assertEqual(job["result"]["inserted"], 2)
+
+    def test_job_failure_is_recorded(self):
+        """Exceptions raised by a job are reported instead of propagated."""
+        runner = SyncJobRunner(max_workers=1)
+
+        def run(job):
+            raise ValueError("Merge unavailable")
+
+        job = wait_for(runner.submit("candidates", "org", "merge_api", run))
+        self.assertEqual(job["status"], JOB_FAILED)
+        self.assertEqual(job["error"], "Merge unavailable")
+
+    def test_history_skips_active_jobs(self):
+        """Finished jobs queued after a long-running one are still evicted once history is full."""
+        runner = SyncJobRunner(max_workers=2, history=2)
+        release = threading.Event()
+        blocker = runner.submit("candidates", "org-a", "merge_api", lambda job: release.wait(5))
+
+        finished = [wait_for(runner.submit("candidates", "org-b", "merge_api", lambda job: {}))
+                    for _ in range(3)]
+        release.set()
+
+        self.assertIsNotNone(runner.get(blocker.id))
+        self.assertIsNone(runner.get(finished[0]["job_id"]))
+        self.assertIsNone(runner.get(finished[1]["job_id"]))
+        self.assertIsNotNone(runner.get(finished[2]["job_id"]))
+
+    def test_identical_jobs_are_coalesced(self):
+        """A job with the same coalesce key as a queued or running job returns that job."""
+        runner = SyncJobRunner(max_workers=1)
+        release = threading.Event()
+        runs = []
+
+        def run(job):
+            runs.append(job.id)
+            release.wait(5)
+            return {"inserted": 1, "updated": 0}
+
+        first = runner.submit("candidates", "org", "merge_api", run, coalesce_key=("candidates", "org"))
+        second = runner.submit("candidates", "org", "merge_api", run, coalesce_key=("candidates", "org"))
+        other = runner.submit("job_postings", "org", "merge_api", run, coalesce_key=("job_postings", "org"))
+        self.assertIs(first, second)
+        self.assertIsNot(first, other)
+
+        release.set()
+        wait_for(first)
+        wait_for(other)
+        self.assertEqual(len(runs), 2)
+
+        # Once finished, the same sync can be queued again
+        third = runner.submit("candidates", "org", "merge_api", run, coalesce_key=("candidates", "org"))
+        self.assertIsNot(third, first)
+        wait_for(third)
+
+    def test_status_endpoint(self):
+        """GET /sync/status/<job_id> returns the job or 404."""
+        job = sync_job_runner.submit("interviews", "org", "csv", lambda job: {"inserted": 1, "updated": 0})
+        wait_for(job)
+
+        response = self.app.get(f'/sync/status/{job.id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["status"], JOB_SUCCEEDED)
+
+        response = self.app.get('/sync/status/unknown-job')
+        self.assertEqual(response.status_code, 404)
+
+
+    def test_status_of_another_worker_is_read_from_the_store(self):
+        """With persistence, job status is recorded and jobs unknown to this worker are looked up."""
+        with patch('sync_jobs.SyncJobStore') as mock_store, patch('sync_jobs.get_supabase_client'):
+            runner = SyncJobRunner(max_workers=1, persist=True)
+            job = wait_for(runner.submit("candidates", "org", "merge_api", lambda job: {"inserted": 1}))
+
+            statuses = [call.args[0]["status"] for call in mock_store.return_value.save.call_args_list]
+            self.assertEqual(statuses, ["queued", "running", JOB_SUCCEEDED])
+            self.assertEqual(runner.get_status(job["job_id"])["status"], JOB_SUCCEEDED)
+            mock_store.return_value.get.assert_not_called()
+
+            mock_store.return_value.get.return_value = {"job_id": "elsewhere", "status": "running"}
+            self.assertEqual(runner.get_status("elsewhere")["status"], "running")
+            mock_store.return_value.get.assert_called_once_with("elsewhere")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+import time
+import logging
+import threading
+import unittest
+
+from app import app
+from sync_scheduler import SyncScheduler, PRIORITY_INTERACTIVE, PRIORITY_NIGHTLY
+from sync_jobs import sync_job_runner, JOB_SUCCEEDED
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def wait_until(condition, timeout=5.0):
+    """Wait until condition() is true."""
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def run_blocked(scheduler, jobs):
+    """Queue jobs behind a blocker holding the only worker, then release it and return the start order.
+
+    Args:
+        scheduler: A SyncScheduler with one worker
+        jobs: (organization_id, name, priority) tuples, queued in order
+    """
+    release = threading.Event()
+    order = []
+    # A nightly blocker leaves the interactive streak at zero
+    scheduler.submit("blocker", release.wait, PRIORITY_NIGHTLY)
+    assert wait_until(lambda: scheduler.running() == 1)
+
+    for organization_id, name, priority in jobs:
+        scheduler.submit(organization_id, lambda name=name: order.append(name), priority)
+    release.set()
+
+    assert wait_until(lambda: len(order) == len(jobs))
+    return order
+
+
+class SyncSchedulerTestCase(unittest.TestCase):
+    """Test case for the multi-tenant sync scheduler."""
+
+    def test_organizations_take_turns(self):
+        """A tenant with many queued syncs does not delay the others by more than one job each."""
+        order = run_blocked(SyncScheduler(max_workers=1), [
+            ("big", "big-1", PRIORITY_INTERACTIVE),
+            ("big", "big-2", PRIORITY_INTERACTIVE),
+            ("big", "big-3", PRIORITY_INTERACTIVE),
+            ("small", "small-1", PRIORITY_INTERACTIVE),
+            ("other", "other-1", PRIORITY_INTERACTIVE),
+        ])
+        self.assertEqual(order, ["big-1", "small-1", "other-1", "big-2", "big-3"])
+
+    def test_interactive_lane_goes_first_without_starving_nightly(self):
+        """Interactive jobs start first, but a waiting nightly job gets every interactive_weight-th worker."""
+        order = run_blocked(SyncScheduler(max_workers=1, interactive_weight=2), [
+            ("a", "nightly-1", PRIORITY_NIGHTLY),
+            ("b", "nightly-2", PRIORITY_NIGHTLY),
+            ("c", "interactive-1", PRIORITY_INTERACTIVE),
+            ("d", "interactive-2", PRIORITY_INTERACTIVE),
+            ("e", "interactive-3", PRIORITY_INTERACTIVE),
+        ])
+        self.assertEqual(order, ["interactive-1", "interactive-2", "nightly-1", "interactive-3", "nightly-2"])
+
+    def test_per_org_and_global_caps(self):
+        """No organization exceeds its limit and the pool never exceeds max_workers."""
+        scheduler = SyncScheduler(max_workers=3, per_org_limit=2)
+        lock = threading.Lock()
+        running = {}
+        peaks = {"total": 0}
+
+        def job(organization_id):
+            with lock:
+                running[organization_id] = running.get(organization_id, 0) + 1
+                peaks[organization_id] = max(peaks.get(organization_id, 0), running[organization_id])
+                peaks["total"] = max(peaks["total"], sum(running.values()))
+            time.sleep(0.02)
+            with lock:
+                running[organization_id] -= 1
+
+        for organization_id in ["a"] * 6 + ["b"] * 3:
+            scheduler.submit(organization_id, lambda organization_id=organization_id: job(organization_id))
+
+        self.assertTrue(wait_until(lambda: scheduler.running() == 0 and not any(scheduler.queue_depths().values())))
+        self.assertEqual(peaks["a"], 2)
+        self.assertEqual(peaks["b"], 2)
+        self.assertEqual(peaks["total"], 3)
+
+    def test_batch_endpoint_queues_a_job_per_sync(self):
+        """POST /sync/batch queues one job per (organization, entity) pair."""
+        client = app.test_client()
+        response = client.post('/sync/batch/', json={
+            "user_id": "user",
+            "priority": PRIORITY_NIGHTLY,
+            "test_mode": True,
+            "syncs": [{"organization_id": "org-1", "entity": "candidates"},
+                      {"organization_id": "org-2", "entity": "unknown"}]
+        })
+        self.assertEqual(response.status_code, 400)
+
+        response = client.post('/sync/batch/', json={
+            "user_id": "user",
+            "test_mode": True,
+            "syncs": [{"organization_id": "org-1", "entity": "candidates"},
+                      {"organization_id": "org-2", "entity": "job_postings"}]
+        })
+        self.assertEqual(response.status_code, 202)
+        jobs = [sync_job_runner.get(job["job_id"]) for job in response.get_json()["jobs"]]
+        self.assertTrue(wait_until(lambda: all(job.to_dict()["finished_at"] for job in jobs)))
+        self.assertEqual([job.to_dict()["priority"] for job in jobs], [PRIORITY_NIGHTLY] * 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+import json
+import time
+import base64
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+
+from token_service import TokenService, jwt_expires_at, parse_expires_at
+from single_flight import SingleFlight
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+USER_JWT = "eyJhbGciOiJIUzI1NiJ9.test.signature"
+
+
+def make_jwt(exp):
+    """Build an unsigned JWT whose payload carries the given exp claim."""
+    payload = base64.urlsafe_b64encode(json.dumps({"exp": exp}).encode()).decode().rstrip("=")
+    return f"eyJhbGciOiJIUzI1NiJ9.{payload}.signature"
+
+
+def make_service():
+    """Build a token service configured for a fake Supabase project."""
+    with patch.dict('os.environ', {"SUPABASE_URL": "https://example.supabase.co", "SUPABASE_KEY": "key"}):
+        return TokenService()
+
+
+def edge_function_response(token, expires_at=None):
+    response = MagicMock()
+    response.json.return_value = {"token": token, "expires_at": expires_at}
+    return response
+
+
+def test_exchanged_token_is_cached():
+    """A second sync with the same JWT does not call the Edge Function again."""
+    service = make_service()
+    expires_at = (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+    session = MagicMock()
+    session.post.return_value = edge_function_response("merge_token", expires_at)
+
+    with patch('token_service.get_session', return_value=session):
+        assert service.get_merge_token(user_token=USER_JWT) == "merge_token"
+        assert service.get_merge_token(user_token=USER_JWT) == "merge_token"
+
+    assert session.post.call_count == 1
+
+
+def test_token_expiring_soon_is_not_reused():
+    """Tokens inside the expiry margin are exchanged again."""
+    service = make_service()
+    expires_at = (datetime.now(timezone.utc) + timedelta(seconds=5)).isoformat()
+    session = MagicMock()
+    session.post.return_value = edge_function_response("merge_token", expires_at)
+
+    with patch('token_service.get_session', return_value=session):
+        service.get_merge_token(user_token=USER_JWT)
+        service.get_merge_token(user_token=USER_JWT)
+
+    assert session.post.call_count == 2
+
+
+def test_concurrent_misses_share_one_exchange():
+    """Threads asking for the same organization's token trigger one RPC."""
+    service = make_service()
+    calls = []
+
+    def exchange():
+        calls.append(1)
+        time.sleep(0.1)
+        return {"token": "org_token", "expires_at": None}
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(service.get_cached_token("org:1", exchange)))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["org_token"] * 5
+    assert len(calls) == 1
+
+
+def test_failed_exchange_reaches_every_waiter():
+    """An exchange error is raised in the caller that ran it and in those waiting on it."""
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    errors = []
+
+    def fail():
+        started.set()
+        release.wait()
+        raise ValueError("exchange failed")
+
+    def call():
+        try:
+            flight.do("org:1", fail)
+        except ValueError as e:
+            errors.append(str(e))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait()
+    follower = threading.Thread(target=call)
+    follower.start()
+    time.sleep(0.05)
+    release.set()
+    leader.join()
+    follower.join()
+
+    assert errors == ["exchange failed", "exchange failed"]
+    assert flight.in_flight() == 0
+
+
+
+def test_token_is_not_reused_past_the_jwt_exp():
+    """A token exchanged for a JWT is dropped when the JWT expires, even if the token lives longer."""
+    service = make_service()
+    expires_at = (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+    jwt = make_jwt(time.time() + 0.05)
+    session = MagicMock()
+    session.post.return_value = edge_function_response("merge_token", expires_at)
+
+    with patch('token_service.get_session', return_value=session):
+        service.get_merge_token(user_token=jwt)
+        service.get_merge_token(user_token=jwt)
+        time.sleep(0.1)
+        service.get_merge_token(user_token=jwt)
+
+    assert session.post.call_count == 2
+    assert jwt_expires_at(USER_JWT) is None
+
+
+def test_refresh_exchanges_a_new_token():
+    """refresh drops the cached token, so a token Merge rejected is not handed out again."""
+    service = make_service()
+    expires_at = (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+    session = MagicMock()
+    session.post.side_effect = [edge_function_response("revoked", expires_at),
+                                edge_function_response("fresh", expires_at)]
+
+    with patch('token_service.get_session', return_value=session):
+        assert service.get_merge_token(user_token=USER_JWT) == "revoked"
+        assert service.get_merge_token(user_token=USER_JWT, refresh=True) == "fresh"
+        assert service.get_merge_token(user_token=USER_JWT) == "fresh"
+
+    assert session.post.call_count == 2
+
+
+def test_parse_expires_at():
+    """ISO strings with or without an offset and Unix timestamps are accepted."""
+    assert parse_expires_at("2030-01-01T00:00:00Z") == datetime(2030, 1, 1, tzinfo=timezone.utc).timestamp()
+    assert parse_expires_at("2030-01-01T00:00:00") == datetime(2030, 1, 1, tzinfo=timezone.utc).timestamp()
+    assert parse_expires_at(1893456000) == 1893456000.0
+    assert parse_expires_at(None) is None
+    assert parse_expires_at("soon") is None
@@ -4,15 +4,78 @@ Token Service for interacting with Supabase Edge Functions.
 
 This module provides a service for exchanging tokens securely using
 Supabase Edge Functions instead of direct database access.
+
+Exchanged tokens are cached per user JWT or organization until shortly before
+their ``expires_at``, and concurrent exchanges for the same key collapse into
+one call, so a sync only pays for the Edge Function or RPC on a cache miss.
+Tokens exchanged for a JWT are never reused past the JWT's own ``exp``, and
+a token Merge rejects is dropped and exchanged again (see ``refresh``).
 """
 
 import os
+import json
+import time
+import base64
+import hashlib
 import logging
+import threading
 import requests
-from typing import Optional
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from http_client import get_session
+from metrics import TOKEN_CACHE_REQUESTS
+from single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
+# Longest time an exchanged token is reused, even if it expires later (0 disables caching)
+MERGE_TOKEN_CACHE_TTL_SECONDS = float(os.environ.get("MERGE_TOKEN_CACHE_TTL_SECONDS", "3600"))
+
+# Tokens are refreshed this many seconds before their expires_at
+MERGE_TOKEN_EXPIRY_MARGIN_SECONDS = float(os.environ.get("MERGE_TOKEN_EXPIRY_MARGIN_SECONDS", "60"))
+
+# Maximum number of cached tokens per worker process
+MERGE_TOKEN_CACHE_MAX_SIZE = int(os.environ.get("MERGE_TOKEN_CACHE_MAX_SIZE", "1000"))
+
+
+def parse_expires_at(value: Any) -> Optional[float]:
+    """Convert an ``expires_at`` value to a Unix timestamp.
+
+    Args:
+        value: An ISO 8601 string, a Unix timestamp, or None
+
+    Returns:
+        The expiry as seconds since the epoch, or None if it is missing or unreadable
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        expires_at = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        logger.warning(f"Ignoring unreadable token expires_at: {value}")
+        return None
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    return expires_at.timestamp()
+
+def jwt_expires_at(token: str) -> Optional[float]:
+    """Return the ``exp`` claim of a JWT as a Unix timestamp, without verifying it.
+
+    The token is only used to bound how long a cached exchange is reused; the
+    Edge Function verifies it.
+    """
+    try:
+        payload = token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        exp = claims.get("exp")
+        return float(exp) if exp is not None else None
+    except (IndexError, ValueError, TypeError, AttributeError):
+        return None
+
 class TokenService:
     """Service for secure token exchange using Supabase Edge Functions."""
     
@@ -24,6 +87,80 @@ class TokenService:
         if not self.supabase_url or not self.supabase_key:
             logger.error("Missing required Supabase configuration")
             # Don't raise here, let specific methods fail with clear error messages
+        
+        # Cached tokens as key -> (expiry timestamp, token), oldest first
+        self._tokens: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._exchanges = SingleFlight()
+    
+    def _cached_token(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._tokens.get(key)
+            if entry is None:
+                return None
+            expires_at, token = entry
+            if expires_at > time.time():
+                return token
+            del self._tokens[key]
+            return None
+    
+    def _store_token(self, key: str, token: str, expires_at: Any, not_after: Optional[float] = None) -> None:
+        now = time.time()
+        valid_until = now + MERGE_TOKEN_CACHE_TTL_SECONDS
+        expiry = parse_expires_at(expires_at)
+        if expiry is not None:
+            valid_until = min(valid_until, expiry - MERGE_TOKEN_EXPIRY_MARGIN_SECONDS)
+        if not_after is not None:
+            valid_until = min(valid_until, not_after)
+        if valid_until <= now:
+            return
+        
+        with self._lock:
+            self._tokens[key] = (valid_until, token)
+            self._tokens.move_to_end(key)
+            while len(self._tokens) > MERGE_TOKEN_CACHE_MAX_SIZE:
+                self._tokens.popitem(last=False)
+    
+    def get_cached_token(self, key: str, exchange: Callable[[], Dict[str, Any]],
+                         not_after: Optional[float] = None) -> str:
+        """Return the cached token for a key, exchanging a new one on a miss.
+        
+        Concurrent misses for the same key share one exchange.
+        
+        Args:
+            key: Identifies whose token this is, e.g. "org:<id>" or "jwt:<hash>"
+            exchange: Fetches a new token and returns a dict with "token" and
+                      an optional "expires_at"
+            not_after: Optional Unix timestamp after which the token is never
+                       reused, whatever its own expires_at
+            
+        Returns:
+            The Merge account token
+        """
+        token = self._cached_token(key)
+        if token:
+            TOKEN_CACHE_REQUESTS.labels(result="hit").inc()
+            return token
+        TOKEN_CACHE_REQUESTS.labels(result="miss").inc()
+        
+        def refresh() -> str:
+            # Another caller may have finished an exchange since the check above
+            cached = self._cached_token(key)
+            if cached:
+                return cached
+            data = exchange()
+            self._store_token(key, data["token"], data.get("expires_at"), not_after)
+            return data["token"]
+        
+        return self._exchanges.do(key, refresh)
+    
+    def invalidate(self, key: Optional[str] = None) -> None:
+        """Drop one cached token, or every cached token when no key is given."""
+        with self._lock:
+            if key is None:
+                self._tokens.clear()
+            else:
+                self._tokens.pop(key, None)
     
     def get_edge_function_url(self, function_name: str) -> str:
         """Get the URL for a Supabase Edge Function.
@@ -37,13 +174,14 @@ class TokenService:
         # Standard Edge Function URL pattern
         return f"{self.supabase_url}/functions/v1/{function_name}"
     
-    def get_merge_token(self, user_token: str = None, test_mode: bool = False) -> Optional[str]:
+    def get_merge_token(self, user_token: str = None, test_mode: bool = False, refresh: bool = False) -> Optional[str]:
         """Get a Merge API token via Supabase Edge Function.
         
         Args:
             user_token: The authenticated user's JWT token from the frontend request
                         OR a Merge account token directly
             test_mode: If True, return a dummy token for testing purposes
+            refresh: If True, drop the cached token first, e.g. after Merge rejected it
             
         Returns:
             The Merge API token or None if there was an error
@@ -67,6 +205,25 @@ class TokenService:
             logger.info("Token appears to be a Merge account token, using it directly")
             return user_token
         
+        # Key on a digest so raw JWTs are not kept around as dictionary keys
+        key = "jwt:" + hashlib.sha256(user_token.encode()).hexdigest()
+        if refresh:
+            self.invalidate(key)
+        return self.get_cached_token(key, lambda: self._exchange_user_token(user_token),
+                                     not_after=jwt_expires_at(user_token))
+    
+    def _exchange_user_token(self, user_token: str) -> Dict[str, Any]:
+        """Exchange a user JWT for a Merge token via the Edge Function.
+        
+        Args:
+            user_token: The authenticated user's JWT token
+            
+        Returns:
+            The Edge Function response with "token" and "expires_at"
+            
+        Raises:
+            ValueError: If there's an issue with the request or response
+        """
         try:
             # Token is a user JWT, so exchange it via Edge Function
             # Construct the Edge Function URL
@@ -81,7 +238,7 @@ class TokenService:
             }
             
             # Call the Edge Function
-            response = requests.post(
+            response = get_session().post(
                 url,
                 headers=headers,
                 json={"action": "get_merge_token"}  # Add clear payload
@@ -100,7 +257,7 @@ class TokenService:
                 raise ValueError("No token returned from Edge Function")
             
             logger.info("Successfully obtained Merge token from Edge Function")
-            return token
+            return data
             
         except requests.exceptions.RequestException as e:
             logger.error(f"HTTP error calling Edge Function: {str(e)}")